@@ -4,44 +4,141 @@ Agent die de MCP server gebruikt met de officiële MCP Python SDK.
 """
 
 import asyncio
+import json
 import os
 import sys
 import traceback
-from typing import Dict, Any, List, Optional
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Any, List, Optional
 
-from dotenv import load_dotenv
-from openai import OpenAI
+from arxiv_client import Paper, format_papers_markdown
+from arxiv_fusion import ResultFusion, assign_fused_results
+from arxiv_paging import format_more_info
 
-# Import MCP client functionaliteit
-from mcp import ClientSession, StdioServerParameters, types
-from mcp.client.stdio import stdio_client
-
-# Load environment variables
-load_dotenv()
+# `openai`, `dotenv` en de `mcp` client worden pas geïmporteerd wanneer ze
+# nodig zijn, zodat het importeren van deze module snel blijft.
 
 # Pad naar de MCP server script
 MCP_SERVER_PATH = os.path.join(os.path.dirname(__file__), "arxiv_mcp_server_sdk.py")
 
+# Tools van de server die voor de agent zelf bedoeld zijn, niet voor het model
+INTERNAL_TOOLS = {"prefetch_arxiv_queries"}
+
+# Tools waarvan de papers samen één gerangschikte lijst vormen; verwante papers
+# houden hun eigen bericht, met de paper waar ze aan verwant zijn
+FUSED_TOOLS = {"search_arxiv_papers"}
+
+# Hoe vaak het model na tool resultaten opnieuw tools mag aanroepen
+MAX_TOOL_ROUNDS = 3
+
 
 class ArxivAgent:
     """Een agent die de Arxiv MCP server gebruikt om papers te vinden."""
 
-    def __init__(self, openai_api_key: str):
-        """Initialiseer de agent met OpenAI client."""
-        self.openai_client = OpenAI(api_key=openai_api_key)
-        self.server_params = StdioServerParameters(
+    def __init__(self, openai_api_key: str, forkserver_socket: Optional[str] = None,
+                 server_url: Optional[str] = None, prefetch: Optional[bool] = None):
+        """
+        Initialiseer de agent.
+
+        Args:
+            openai_api_key: API key voor de OpenAI client.
+            forkserver_socket: Socket van een draaiende fork-server (zie
+                `mcp_forkserver.py`). Standaard `ARXIV_MCP_FORKSERVER`; zonder
+                socket start de agent de MCP server als subprocess.
+            server_url: URL van een gedeelde MCP server, bijv.
+                `http://127.0.0.1:8000/mcp` (streamable HTTP) of een URL die
+                eindigt op `/sse`. Standaard `ARXIV_MCP_URL`.
+            prefetch: Laat de gedeelde server na elk antwoord door het model
+                voorgestelde vervolgzoekopdrachten vooraf ophalen. Standaard
+                `ARXIV_PREFETCH`; werkt alleen met `server_url`.
+        """
+        self.openai_api_key = openai_api_key
+        self.forkserver_socket = forkserver_socket or os.getenv("ARXIV_MCP_FORKSERVER")
+        self.server_url = server_url or os.getenv("ARXIV_MCP_URL")
+        if prefetch is None:
+            from arxiv_prefetch import prefetch_enabled
+            prefetch = prefetch_enabled()
+        self.prefetch = prefetch
+        self._background_tasks = set()
+        self._openai_client = None
+
+    @property
+    def openai_client(self):
+        """De OpenAI client, aangemaakt bij het eerste gebruik."""
+        if self._openai_client is None:
+            from openai import OpenAI
+            from arxiv_replay import openai_http_client
+
+            # Met een cassette (ARXIV_CASSETTE) wordt OpenAI verkeer opgenomen of afgespeeld
+            self._openai_client = OpenAI(api_key=self.openai_api_key,
+                                         http_client=openai_http_client())
+        return self._openai_client
+
+    def _server_transport(self):
+        """Geef de MCP client transport: een gedeelde server, fork-server worker of subprocess."""
+        if self.server_url:
+            return _http_client(self.server_url)
+
+        if self.forkserver_socket:
+            from mcp_forkserver import forkserver_client
+            return forkserver_client(self.forkserver_socket)
+
+        from mcp import StdioServerParameters
+        from mcp.client.stdio import stdio_client
+
+        server_params = StdioServerParameters(
             command=sys.executable,  # Python executable
             args=[MCP_SERVER_PATH],  # MCP server script
             env=os.environ.copy(),  # Geef huidige environment door
         )
+        return stdio_client(server_params)
+
+    async def prefetch_followups(self, user_question: str, answer: str) -> None:
+        """Laat de gedeelde server voorgestelde vervolgzoekopdrachten vooraf ophalen."""
+        from arxiv_prefetch import suggest_followup_queries
+        from mcp import ClientSession
+
+        try:
+            queries = await asyncio.to_thread(
+                suggest_followup_queries, self.openai_client, user_question, answer)
+            if not queries:
+                return
+            async with _http_client(self.server_url) as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    await session.call_tool("prefetch_arxiv_queries", arguments={"queries": queries})
+        except Exception as e:
+            print(f"Error prefetching follow-up queries: {e}", file=sys.stderr)
+
+    def schedule_followup_prefetch(self, user_question: str, answer: str) -> None:
+        """Start `prefetch_followups` op de achtergrond, zonder op het resultaat te wachten."""
+        if not (self.prefetch and self.server_url):
+            return
+        task = asyncio.get_running_loop().create_task(self.prefetch_followups(user_question, answer))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
 
-    async def run_conversation(self, user_question: str) -> str:
+    async def run_conversation(self, user_question: str, profile_id: Optional[str] = None,
+                               on_papers: Optional[Callable[[List[Paper]], None]] = None,
+                               raise_errors: bool = False,
+                               on_tool_error: Optional[Callable[[str], None]] = None) -> str:
         """
         Voer een gesprek met de gebruiker, gebruik makend van de MCP server voor tools.
+
+        Met een `profile_id` worden de tool calls in de MCP server geprofileerd
+        (zie `request_profiler.py`); het id gaat mee in de `_meta` van het request.
+        `on_papers` krijgt de papers van elke zoekopdracht zodra die binnen
+        zijn, nog voor het definitieve antwoord (voor de web app).
+        Met `raise_errors` geeft een mislukt gesprek de exception in plaats van
+        een melding als antwoord, zodat die niet als antwoord gecachet wordt.
+        `on_tool_error` krijgt de foutmelding van elke mislukte tool call
+        (`isError` in het resultaat); het model antwoordt dan nog wel.
         """
         try:
+            from mcp import ClientSession
+
             # Start de MCP client
-            async with stdio_client(self.server_params) as (read_stream, write_stream):
+            async with self._server_transport() as (read_stream, write_stream):
                 # Maak een client sessie
                 async with ClientSession(read_stream, write_stream) as session:
                     # Initialiseer de verbinding
@@ -57,24 +154,11 @@ class ArxivAgent:
                             "function": {
                                 "name": tool.name,
                                 "description": tool.description or "",
-                                "parameters": {
-                                    "type": "object",
-                                    "properties": {
-                                        param.name: {
-                                            "type": param.type,
-                                            "description": param.description or "",
-                                        }
-                                        for param in tool.parameters
-                                    },
-                                    "required": [
-                                        param.name
-                                        for param in tool.parameters
-                                        if param.required
-                                    ],
-                                },
+                                "parameters": tool.inputSchema,
                             },
                         }
-                        for tool in tools
+                        for tool in tools.tools
+                        if tool.name not in INTERNAL_TOOLS
                     ]
 
                     # Creëer de berichten voor de OpenAI API
@@ -86,40 +170,45 @@ class ArxivAgent:
                         {"role": "user", "content": user_question},
                     ]
 
-                    # Maak de API call naar OpenAI
-                    response = self.openai_client.chat.completions.create(
-                        model="gpt-4-turbo",
-                        messages=messages,
-                        tools=openai_tools,
-                        tool_choice="auto",
-                    )
+                    # Het model kan na de resultaten verder zoeken, bijvoorbeeld
+                    # met een cursor; na MAX_TOOL_ROUNDS rondes moet het antwoorden
+                    used_tools = False
+                    for tool_round in range(MAX_TOOL_ROUNDS + 1):
+                        # Maak de API call naar OpenAI
+                        request = {"model": "gpt-4-turbo", "messages": messages}
+                        if tool_round < MAX_TOOL_ROUNDS:
+                            request.update(tools=openai_tools, tool_choice="auto")
+                        response = self.openai_client.chat.completions.create(**request)
 
-                    # Verwerk het antwoord
-                    assistant_message = response.choices[0].message
+                        # Verwerk het antwoord
+                        assistant_message = response.choices[0].message
+                        if not assistant_message.tool_calls:
+                            break
+                        used_tools = True
 
-                    # Voeg het assistant bericht toe met tool_calls
-                    messages.append(
-                        {
-                            "role": "assistant",
-                            "content": assistant_message.content or "",
-                            "tool_calls": [
-                                {
-                                    "id": tc.id,
-                                    "type": "function",
-                                    "function": {
-                                        "name": tc.function.name,
-                                        "arguments": tc.function.arguments,
-                                    },
-                                }
-                                for tc in (assistant_message.tool_calls or [])
-                            ]
-                            if assistant_message.tool_calls
-                            else None,
-                        }
-                    )
+                        # Voeg het assistant bericht toe met tool_calls
+                        messages.append(
+                            {
+                                "role": "assistant",
+                                "content": assistant_message.content or "",
+                                "tool_calls": [
+                                    {
+                                        "id": tc.id,
+                                        "type": "function",
+                                        "function": {
+                                            "name": tc.function.name,
+                                            "arguments": tc.function.arguments,
+                                        },
+                                    }
+                                    for tc in assistant_message.tool_calls
+                                ],
+                            }
+                        )
 
-                    # Verwerk tool calls indien aanwezig
-                    if assistant_message.tool_calls:
+                        # Papers uit alle zoekopdrachten van deze ronde worden samengevoegd tot één lijst
+                        fusion = ResultFusion()
+                        queries = []
+                        tool_messages = []
                         for tool_call in assistant_message.tool_calls:
                             # Haal de tool parameters op
                             function_name = tool_call.function.name
@@ -127,34 +216,85 @@ class ArxivAgent:
 
                             # Roep de tool aan via de MCP client
                             tool_result = await session.call_tool(
-                                function_name, arguments=arguments
+                                function_name, arguments=arguments,
+                                meta={"profile_id": profile_id} if profile_id else None,
                             )
 
+                            # Papers uit zoekopdrachten gaan naar de fusie;
+                            # het tool bericht wordt daarna ingevuld
+                            structured = tool_result.structuredContent or {}
+                            papers = [Paper.from_dict(paper) for paper in structured.get("papers", [])]
+                            if on_papers is not None and papers:
+                                on_papers(papers)
+                            if papers and function_name in FUSED_TOOLS:
+                                fusion.add(papers)
+                                fusion.add_note(format_more_info(papers, structured))
+                                # Een vervolgpagina via een cursor heeft geen eigen query
+                                if arguments.get("query"):
+                                    queries.append(arguments["query"])
+                                content = None
+                            else:
+                                content = "\n".join(
+                                    content.text
+                                    for content in tool_result.content
+                                    if content.type == "text"
+                                )
+                                if tool_result.isError and on_tool_error is not None:
+                                    on_tool_error(content)
+
                             # Voeg het resultaat toe aan de berichten
-                            messages.append(
+                            tool_messages.append(
                                 {
                                     "role": "tool",
                                     "tool_call_id": tool_call.id,
-                                    "content": tool_result,
+                                    "content": content,
                                 }
                             )
 
-                        # Vraag OpenAI om een definitief antwoord
-                        second_response = self.openai_client.chat.completions.create(
-                            model="gpt-4-turbo", messages=messages
+                        assign_fused_results(
+                            tool_messages,
+                            fusion,
+                            lambda papers: format_papers_markdown(", ".join(queries) or "meer resultaten", papers),
                         )
+                        messages.extend(tool_messages)
 
-                        return second_response.choices[0].message.content
-
-                    # Als er geen tool calls zijn, retourneer het originele antwoord
-                    return assistant_message.content or "No response from assistant"
+                    answer = assistant_message.content
+                    if not answer:
+                        if raise_errors:
+                            raise RuntimeError("No response from assistant")
+                        return "No response from assistant"
+                    if used_tools:
+                        self.schedule_followup_prefetch(user_question, answer)
+                    return answer
 
         except Exception as e:
+            if raise_errors:
+                # De MCP client verpakt fouten in een exception group van één exception
+                while len(getattr(e, "exceptions", ())) == 1:
+                    e = e.exceptions[0]
+                raise e
             return f"Error running agent: {str(e)}"
 
 
+@asynccontextmanager
+async def _http_client(url: str):
+    """MCP client transport voor een gedeelde server via SSE of streamable HTTP."""
+    if url.rstrip("/").endswith("/sse"):
+        from mcp.client.sse import sse_client
+
+        async with sse_client(url) as (read_stream, write_stream):
+            yield read_stream, write_stream
+    else:
+        from mcp.client.streamable_http import streamablehttp_client
+
+        async with streamablehttp_client(url) as (read_stream, write_stream, _):
+            yield read_stream, write_stream
+
+
 async def main():
     """Hoofdfunctie die de agent start en een vraag verwerkt."""
+    from dotenv import load_dotenv
+
     # Laad environment variables
     load_dotenv()
 
@@ -185,7 +325,5 @@ async def main():
 
 
 if __name__ == "__main__":
-    import json  # Voeg json import toe voor argumenten parsing
-    
     # Start de main functie
     asyncio.run(main())
\ No newline at end of file
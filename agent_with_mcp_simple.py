@@ -8,34 +8,102 @@ import json
 import os
 import subprocess
 import sys
+import tempfile
 import traceback
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
-from dotenv import load_dotenv
-from openai import OpenAI
+from arxiv_client import Paper, format_papers
+from arxiv_fusion import ResultFusion, assign_fused_results
+from arxiv_paging import format_more_info
 
-# Load environment variables
-load_dotenv()
+# `openai` en `dotenv` worden pas geïmporteerd wanneer ze nodig zijn, zodat
+# het importeren van deze module (bijv. door de web app) snel blijft.
 
 # Pad naar de MCP server script
 MCP_SERVER_PATH = os.path.join(os.path.dirname(
     __file__), "arxiv_mcp_server_simple.py")
 
+# Hoe vaak het model na tool resultaten opnieuw tools mag aanroepen
+MAX_TOOL_ROUNDS = 3
+
 
 class ArxivAgent:
     """Een agent die de Arxiv MCP server gebruikt om papers te vinden."""
 
-    def __init__(self, openai_api_key: str):
-        """Initialiseer de agent met OpenAI client."""
-        self.openai_client = OpenAI(api_key=openai_api_key)
+    def __init__(self, openai_api_key: str, forkserver_socket: Optional[str] = None,
+                 transport: Optional[str] = None, serializer: Optional[str] = None,
+                 server_url: Optional[str] = None, prefetch: Optional[bool] = None):
+        """
+        Initialiseer de agent.
+
+        Args:
+            openai_api_key: API key voor de OpenAI client.
+            forkserver_socket: Socket van een draaiende fork-server (zie
+                `mcp_forkserver.py`). Standaard `ARXIV_MCP_FORKSERVER`; zonder
+                socket start de agent de MCP server als subprocess.
+            transport: "stdio" (JSON-regels via pipes) of "unix" (frames over
+                een Unix socket, zie `mcp_transport.py`). Standaard
+                `ARXIV_MCP_TRANSPORT`, anders "stdio".
+            serializer: Serializer voor de socket transports: json, orjson of
+                msgpack. Standaard `ARXIV_MCP_SERIALIZER`, anders "json".
+            server_url: URL van een gedeelde, al draaiende MCP server
+                (`tcp://host:poort` of `unix:///pad`). Standaard
+                `ARXIV_MCP_URL`; dan start de agent zelf geen server.
+            prefetch: Laat de gedeelde server na elk antwoord door het model
+                voorgestelde vervolgzoekopdrachten vooraf ophalen. Standaard
+                `ARXIV_PREFETCH`; werkt alleen met `server_url`.
+        """
+        self.openai_api_key = openai_api_key
+        self.forkserver_socket = forkserver_socket or os.getenv("ARXIV_MCP_FORKSERVER")
+        self.transport = transport or os.getenv("ARXIV_MCP_TRANSPORT", "stdio")
+        self.serializer = serializer or os.getenv("ARXIV_MCP_SERIALIZER", "json")
+        self.server_url = server_url or os.getenv("ARXIV_MCP_URL")
+        if prefetch is None:
+            from arxiv_prefetch import prefetch_enabled
+            prefetch = prefetch_enabled()
+        self.prefetch = prefetch
+        self._background_tasks = set()
+        if self.transport not in ("stdio", "unix"):
+            raise ValueError(f"Unsupported transport: {self.transport}")
+        self._openai_client = None
         self.mcp_server_process = None
 
+    @property
+    def openai_client(self):
+        """De OpenAI client, aangemaakt bij het eerste gebruik."""
+        if self._openai_client is None:
+            from openai import OpenAI
+            from arxiv_replay import openai_http_client
+
+            # Met een cassette (ARXIV_CASSETTE) wordt OpenAI verkeer opgenomen of afgespeeld
+            self._openai_client = OpenAI(api_key=self.openai_api_key,
+                                         http_client=openai_http_client())
+        return self._openai_client
+
     async def start_mcp_server(self) -> subprocess.Popen:
         """Start de MCP server als een subprocess en retourneer het process handle."""
+        if self.server_url:
+            # Verbind met de gedeelde server in plaats van een eigen server te starten
+            from mcp_transport import FramedServerProcess, open_connection
+            connection = await open_connection(self.server_url, self.serializer)
+            process = FramedServerProcess(None, connection)
+            self.mcp_server_process = process
+            return process
+
+        if self.forkserver_socket:
+            # Laat de fork-server een voorverwarmde worker afsplitsen
+            from mcp_forkserver import connect_forked_server
+            process = connect_forked_server(self.forkserver_socket)
+            self.mcp_server_process = process
+            return process
+
         # Zorg ervoor dat het script uitvoerbaar is
         if not os.access(MCP_SERVER_PATH, os.X_OK):
             os.chmod(MCP_SERVER_PATH, 0o755)
 
+        if self.transport == "unix":
+            return await self.start_mcp_server_unix()
+
         # Start de server als een subprocess
         process = subprocess.Popen(
             [sys.executable, MCP_SERVER_PATH],
@@ -48,8 +116,39 @@ class ArxivAgent:
         self.mcp_server_process = process
         return process
 
+    async def start_mcp_server_unix(self):
+        """Start de MCP server met een Unix socket en maak verbinding met de socket."""
+        from mcp_transport import FramedServerProcess, open_unix_connection
+
+        socket_dir = tempfile.mkdtemp(prefix="arxiv-mcp-")
+        socket_path = os.path.join(socket_dir, "server.sock")
+        process = subprocess.Popen(
+            [sys.executable, MCP_SERVER_PATH, "--transport", "unix",
+             "--socket", socket_path, "--serializer", self.serializer],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=sys.stderr,
+            text=True,
+        )
+
+        # Wacht tot de server meldt dat de socket klaar is
+        ready_line = await asyncio.get_event_loop().run_in_executor(None, process.stdout.readline)
+        if not ready_line:
+            process.kill()
+            raise RuntimeError("MCP server exited before opening its socket")
+
+        connection = await open_unix_connection(socket_path, self.serializer)
+        process = FramedServerProcess(process, connection, socket_dir)
+        self.mcp_server_process = process
+        return process
+
     async def send_receive_message(self, process: subprocess.Popen, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Stuur een bericht naar de MCP server en wacht op een antwoord."""
+        # Socket transport: één frame heen, één frame terug
+        connection = getattr(process, "connection", None)
+        if connection is not None:
+            return await connection.request(message)
+
         # Stuur het bericht
         json_message = json.dumps(message) + "\n"
         if process.stdin is None:
@@ -103,9 +202,89 @@ class ArxivAgent:
         else:
             return "Unknown response from MCP server"
 
-    async def run_conversation(self, user_question: str) -> str:
+    async def call_tool_structured(self, process: subprocess.Popen, tool_name: str,
+                                   parameters: Dict[str, Any],
+                                   profile_id: Optional[str] = None) -> Tuple[Optional[str], List[Paper], str, bool]:
+        """
+        Roep een tool aan en vraag de gevonden papers zelf op in plaats van tekst.
+
+        Retourneert (None, papers, meer, False) als de server papers
+        teruggeeft, met in `meer` de cursor regel voor volgende resultaten (of
+        ""), anders (tekst, [], "", mislukt) met de foutmelding of de "geen
+        resultaten" tekst; `mislukt` is True als de tool call een fout gaf.
+        Stuurt de server bij de papers ook tekst mee (verwante papers), dan
+        (tekst, papers, "", False): die papers horen niet bij de
+        zoekresultaten. Met een `profile_id` profileert de server de tool
+        call onder dat id.
+        """
+        message = {
+            "type": "tool_call",
+            "tool_call": {
+                "name": tool_name,
+                "parameters": parameters,
+                "structured": True
+            }
+        }
+        if profile_id:
+            message["tool_call"]["profile_id"] = profile_id
+
+        response = await self.send_receive_message(process, message)
+
+        if response and response.get("type") == "tool_result":
+            tool_result = response.get("tool_result", {})
+            if "papers" in tool_result:
+                papers = [Paper.from_dict(paper) for paper in tool_result["papers"]]
+                if "content" in tool_result:
+                    return tool_result["content"], papers, "", False
+                return None, papers, format_more_info(papers, tool_result), False
+            return (tool_result.get("content", "No content returned"), [], "",
+                    bool(tool_result.get("is_error")))
+        elif response and response.get("type") == "error":
+            return f"Error: {response.get('error', {}).get('message', 'Unknown error')}", [], "", True
+        else:
+            return "Unknown response from MCP server", [], "", True
+
+    async def prefetch_followups(self, user_question: str, answer: str) -> None:
+        """Laat de gedeelde server voorgestelde vervolgzoekopdrachten vooraf ophalen."""
+        from arxiv_prefetch import suggest_followup_queries
+        from mcp_transport import open_connection
+
+        try:
+            queries = await asyncio.to_thread(
+                suggest_followup_queries, self.openai_client, user_question, answer)
+            if not queries:
+                return
+            connection = await open_connection(self.server_url, self.serializer)
+            try:
+                await connection.request({"type": "prefetch", "prefetch": {"queries": queries}})
+            finally:
+                connection.close()
+        except Exception as e:
+            print(f"Error prefetching follow-up queries: {e}", file=sys.stderr)
+
+    def schedule_followup_prefetch(self, user_question: str, answer: str) -> None:
+        """Start `prefetch_followups` op de achtergrond, zonder op het resultaat te wachten."""
+        if not (self.prefetch and self.server_url):
+            return
+        task = asyncio.get_running_loop().create_task(self.prefetch_followups(user_question, answer))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def run_conversation(self, user_question: str, profile_id: Optional[str] = None,
+                               on_papers: Optional[Callable[[List[Paper]], None]] = None,
+                               raise_errors: bool = False,
+                               on_tool_error: Optional[Callable[[str], None]] = None) -> str:
         """
         Voer een gesprek met de gebruiker, gebruik makend van de MCP server voor tools.
+
+        Met een `profile_id` worden de tool calls in de MCP server geprofileerd
+        (zie `request_profiler.py`).
+        `on_papers` krijgt de papers van elke zoekopdracht zodra die binnen
+        zijn, nog voor het definitieve antwoord (voor de web app).
+        Met `raise_errors` geeft een mislukt gesprek een RuntimeError in plaats
+        van een melding als antwoord, zodat die niet als antwoord gecachet wordt.
+        `on_tool_error` krijgt de foutmelding van elke mislukte tool call; het
+        model antwoordt dan nog wel, maar met minder of geen papers.
         """
         # Start de MCP server
         process = await self.start_mcp_server()
@@ -114,6 +293,8 @@ class ArxivAgent:
             # Haal server capabilities op
             tools = await self.get_server_capabilities(process)
             if not tools:
+                if raise_errors:
+                    raise RuntimeError("Failed to get MCP server capabilities")
                 return "Failed to get MCP server capabilities"
 
             # Creëer de berichten voor de OpenAI API
@@ -122,60 +303,76 @@ class ArxivAgent:
                 {"role": "user", "content": user_question}
             ]
 
-            # Maak de API call naar OpenAI
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=messages,
-                tools=tools,
-                tool_choice="auto"
-            )
-
-            # Verwerk het antwoord
-            assistant_message = response.choices[0].message
-
-            # Voeg het assistant bericht toe met tool_calls
-            assistant_msg = {"role": "assistant", "content": assistant_message.content or ""}
-            if assistant_message.tool_calls:
-                assistant_msg["tool_calls"] = [
-                    {
-                        "id": tc.id,
-                        "type": "function",
-                        "function": {
-                            "name": tc.function.name,
-                            "arguments": tc.function.arguments
-                        }
-                    } for tc in assistant_message.tool_calls
-                ]
-
-            messages.append(assistant_msg)
-
-            # Verwerk tool calls indien aanwezig
-            if assistant_message.tool_calls:
+            # Het model kan na de resultaten verder zoeken, bijvoorbeeld met
+            # een cursor; na MAX_TOOL_ROUNDS rondes moet het antwoorden
+            used_tools = False
+            for tool_round in range(MAX_TOOL_ROUNDS + 1):
+                # Maak de API call naar OpenAI
+                request = {"model": "gpt-4-turbo", "messages": messages}
+                if tool_round < MAX_TOOL_ROUNDS:
+                    request.update(tools=tools, tool_choice="auto")
+                response = self.openai_client.chat.completions.create(**request)
+
+                # Verwerk het antwoord
+                assistant_message = response.choices[0].message
+                if not assistant_message.tool_calls:
+                    break
+                used_tools = True
+
+                # Voeg het assistant bericht toe met tool_calls
+                messages.append({
+                    "role": "assistant",
+                    "content": assistant_message.content or "",
+                    "tool_calls": [
+                        {
+                            "id": tc.id,
+                            "type": "function",
+                            "function": {
+                                "name": tc.function.name,
+                                "arguments": tc.function.arguments
+                            }
+                        } for tc in assistant_message.tool_calls
+                    ]
+                })
+
+                # Papers uit alle zoekopdrachten van deze ronde worden samengevoegd tot één lijst
+                fusion = ResultFusion()
+                tool_messages = []
                 for tool_call in assistant_message.tool_calls:
                     # Haal de tool parameters op
                     function_name = tool_call.function.name
                     arguments = json.loads(tool_call.function.arguments)
 
                     # Roep de tool aan
-                    tool_result = await self.call_tool(process, function_name, arguments)
-
-                    # Voeg het resultaat toe aan de berichten
-                    messages.append({
+                    tool_result, papers, more, failed = await self.call_tool_structured(
+                        process, function_name, arguments, profile_id)
+                    if failed and on_tool_error is not None:
+                        on_tool_error(tool_result)
+                    if tool_result is None:
+                        fusion.add(papers)
+                        fusion.add_note(more)
+                    if on_papers is not None and papers:
+                        on_papers(papers)
+
+                    # Voeg het resultaat toe aan de berichten; zonder tekst
+                    # wordt het ingevuld met de samengevoegde papers
+                    tool_messages.append({
                         "role": "tool",
                         "tool_call_id": tool_call.id,
                         "content": tool_result
                     })
 
-                # Vraag OpenAI om een definitief antwoord
-                second_response = self.openai_client.chat.completions.create(
-                    model="gpt-4-turbo",
-                    messages=messages
-                )
+                assign_fused_results(tool_messages, fusion, format_papers)
+                messages.extend(tool_messages)
 
-                return second_response.choices[0].message.content
-
-            # Als er geen tool calls zijn, retourneer het originele antwoord
-            return assistant_message.content or "No response from assistant"
+            answer = assistant_message.content
+            if not answer:
+                if raise_errors:
+                    raise RuntimeError("No response from assistant")
+                return "No response from assistant"
+            if used_tools:
+                self.schedule_followup_prefetch(user_question, answer)
+            return answer
 
         finally:
             # Sluit de MCP server af
@@ -189,6 +386,8 @@ class ArxivAgent:
 
 async def main():
     """Hoofdfunctie die de agent start en een vraag verwerkt."""
+    from dotenv import load_dotenv
+
     # Laad environment variables
     load_dotenv()
 
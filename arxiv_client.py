@@ -1,57 +1,556 @@
-import requests
-import xml.etree.ElementTree as ET
+import io
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
 
-ARXIV_API_URL = "http://export.arxiv.org/api/query"
+# `requests` and `xml.etree` are imported on first use so that starting an
+# MCP server does not pay for them up front.
 
-def fetch_arxiv_papers(query: str, max_results: int = 3) -> str:
+# Overridable so load tests can point at a local stand-in (see stub_services.py)
+ARXIV_API_URL = os.getenv("ARXIV_API_URL", "http://export.arxiv.org/api/query")
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+OPENSEARCH_NS = "{http://a9.com/-/spec/opensearch/1.1/}"
+_WHITESPACE = re.compile(r"\s+")
+_ID_VERSION = re.compile(r"v(\d+)$")
+# Queries that already use Arxiv's field syntax (e.g. `cat:cs.LG`, `au:"..."`,
+# or a group like `(all:x) AND cat:cs.LG`)
+_FIELD_QUERY = re.compile(r"^\(*(ti|au|abs|co|jr|cat|rn|id|all):")
+# Bytes per read from the network while a response is parsed
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+class Paper:
     """
-    Fetches paper summaries from the Arxiv API based on a query.
+    Compact record for one Arxiv paper.
 
-    Args:
-        query: The search term for Arxiv.
-        max_results: The maximum number of results to return.
+    Uses `__slots__` instead of a per-instance dict; author names and
+    categories are interned, so papers that share them share one string.
+    `tldr` is a short summary of the abstract, when one is cached (see
+    paper_summaries.py).
+    """
 
-    Returns:
-        A formatted string containing the titles and summaries of the papers,
-        or an error message if the request fails or no papers are found.
+    __slots__ = ("arxiv_id", "version", "title", "summary", "authors",
+                 "categories", "published", "pdf_url", "tldr")
+
+    def __init__(self, arxiv_id: str, version: int, title: str, summary: str,
+                 authors: Tuple[str, ...] = (), categories: Tuple[str, ...] = (),
+                 published: str = "", pdf_url: str = "", tldr: str = ""):
+        self.arxiv_id = arxiv_id
+        self.version = version
+        self.title = title
+        self.summary = summary
+        self.authors = authors
+        self.categories = categories
+        self.published = published
+        self.pdf_url = pdf_url
+        self.tldr = tldr
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        """Identity of this paper: (arxiv id, version)."""
+        return (self.arxiv_id, self.version)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict for JSON/msgpack transport."""
+        return {
+            "arxiv_id": self.arxiv_id,
+            "version": self.version,
+            "title": self.title,
+            "summary": self.summary,
+            "authors": list(self.authors),
+            "categories": list(self.categories),
+            "published": self.published,
+            "pdf_url": self.pdf_url,
+            "tldr": self.tldr,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Paper":
+        """Inverse of `to_dict`; interns authors and categories again."""
+        return cls(
+            arxiv_id=data["arxiv_id"],
+            version=int(data.get("version", 1)),
+            title=data.get("title", ""),
+            summary=data.get("summary", ""),
+            authors=tuple(sys.intern(name) for name in data.get("authors", ())),
+            categories=tuple(sys.intern(term) for term in data.get("categories", ())),
+            published=data.get("published", ""),
+            pdf_url=data.get("pdf_url", ""),
+            tldr=data.get("tldr", ""),
+        )
+
+    def __repr__(self) -> str:
+        return f"Paper({self.arxiv_id}v{self.version}: {self.title[:40]!r})"
+
+
+def clean_text(text: Optional[str]) -> str:
+    """Collapse all whitespace runs into single spaces in one regex pass."""
+    if not text:
+        return ""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _split_id(entry_id: str) -> Tuple[str, int]:
+    """Split an entry id like `http://arxiv.org/abs/2301.01234v2` into id and version."""
+    arxiv_id = entry_id.rsplit("/abs/", 1)[-1]
+    match = _ID_VERSION.search(arxiv_id)
+    if not match:
+        return arxiv_id, 1
+    return arxiv_id[:match.start()], int(match.group(1))
+
+
+def _parse_entry(entry) -> Paper:
+    """Build a `Paper` from an Atom `<entry>` element."""
+    arxiv_id, version = _split_id((entry.findtext(ATOM_NS + "id") or "").strip())
+    pdf_url = ""
+    for link in entry.iterfind(ATOM_NS + "link"):
+        if link.get("title") == "pdf":
+            pdf_url = link.get("href", "")
+            break
+    return Paper(
+        arxiv_id=arxiv_id,
+        version=version,
+        title=clean_text(entry.findtext(ATOM_NS + "title")),
+        summary=clean_text(entry.findtext(ATOM_NS + "summary")),
+        authors=tuple(
+            sys.intern(clean_text(name.text))
+            for name in entry.iterfind(f"{ATOM_NS}author/{ATOM_NS}name")
+        ),
+        categories=tuple(
+            sys.intern(category.get("term", ""))
+            for category in entry.iterfind(ATOM_NS + "category")
+        ),
+        published=(entry.findtext(ATOM_NS + "published") or "").strip(),
+        pdf_url=pdf_url,
+    )
+
+
+def parse_feed(content: bytes) -> List[Paper]:
+    """
+    Parses an Arxiv Atom feed into `Paper` records.
+
+    Entries are parsed incrementally and dropped from the tree once they
+    have been converted, so the full element tree never exists in memory.
+    `content` is raw XML or a compressed payload from `fetch_feed`.
+    """
+    return parse_feed_page(content)[0]
+
+
+def parse_feed_page(content: bytes) -> Tuple[List[Paper], Optional[int]]:
+    """
+    Like `parse_feed`, but also returns the feed's `opensearch:totalResults`
+    (the number of matches for the whole query), or None if it is missing.
+    """
+    from feed_codec import open_payload
+
+    # Cached feeds are compressed and are decompressed while they are parsed
+    return _parse_feed_stream(open_payload(content))
+
+
+def _parse_feed_stream(stream) -> Tuple[List[Paper], Optional[int]]:
+    """`parse_feed_page` for a binary file object with the feed's XML."""
+    import xml.etree.ElementTree as ET
+
+    papers = []
+    total = None
+    root = None
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if root is None:
+            root = elem
+        elif event != "end":
+            continue
+        elif elem.tag == ATOM_NS + "entry":
+            papers.append(_parse_entry(elem))
+            root.remove(elem)
+        elif elem.tag == OPENSEARCH_NS + "totalResults":
+            try:
+                total = int(elem.text or "")
+            except ValueError:
+                pass
+    return papers, total
+
+
+def format_papers(papers: List[Paper]) -> str:
+    """
+    Formats papers as the plain text tool result of the simple MCP server.
+
+    Papers with a cached short summary get that instead of the full abstract.
+    """
+    out = io.StringIO()
+    for i, paper in enumerate(papers, 1):
+        if i > 1:
+            out.write("\n\n")
+        if paper.tldr:
+            out.write(f"Paper {i}: {paper.title}\nSummary: {paper.tldr}")
+        else:
+            out.write(f"Paper {i}: {paper.title}\nAbstract: {paper.summary}")
+    return out.getvalue()
+
+
+def format_papers_markdown(query: str, papers: List[Paper]) -> str:
+    """Formats papers as the markdown tool result of the SDK MCP server."""
+    out = io.StringIO()
+    out.write(f"# Zoekresultaten voor: '{query}'\n\n")
+    for i, paper in enumerate(papers, 1):
+        if i > 1:
+            out.write("\n\n")
+        out.write(f"### {i}. {paper.title}\n")
+        out.write(f"**Auteurs:** {', '.join(paper.authors)}\n")
+        out.write(f"**Publicatiedatum:** {paper.published[:10]}\n")
+        out.write(f"**Link:** {paper.pdf_url}\n")
+        if paper.tldr:
+            out.write(f"**Samenvatting:** {paper.tldr}\n")
+        else:
+            out.write(f"**Abstract:** {paper.summary}\n")
+    return out.getvalue()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache with a time-to-live for Arxiv API responses
+    (compressed by `fetch_feed`).
+
+    One cache lives in each server process, so a single shared MCP server
+    answers repeated queries from all of its agents without new API calls.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RateLimiter:
+    """
+    Token bucket that throttles requests to the Arxiv API.
+
+    Allows short bursts of `burst` requests and `rate` requests per second
+    on average (Arxiv asks for at most one request every three seconds).
+    """
+
+    def __init__(self, rate: float = 1 / 3, burst: int = 4):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, reserve: int = 0) -> bool:
+        """
+        Take a token if one is available, without waiting.
+
+        With `reserve`, a token is only taken if `reserve` tokens remain
+        afterwards, so background work never eats into the foreground budget.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1 + reserve:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        """Take a token, waiting until one is available."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("ARXIV_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("ARXIV_CACHE_TTL", "3600")),
+)
+rate_limiter = RateLimiter(
+    rate=float(os.getenv("ARXIV_RATE_LIMIT", str(1 / 3))),
+    burst=int(os.getenv("ARXIV_RATE_BURST", "4")),
+)
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_response_cache():
+    """
+    Cache shared by all processes on this machine, or None.
+
+    Enabled with `ARXIV_SHARED_CACHE=1` (set by `serve_web.py` for its
+    workers); backed by the metadata database, see `metadata_db.py`.
     """
-    params = {
-        "search_query": f"all:{query}",
-        "start": 0,
+    global _shared_cache
+    if os.getenv("ARXIV_SHARED_CACHE", "").lower() not in ("1", "true", "yes"):
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            from metadata_db import SharedResponseCache, get_metadata_db
+            _shared_cache = SharedResponseCache(get_metadata_db(), response_cache.ttl)
+        return _shared_cache
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    The shared `requests.Session` (keeps connections to Arxiv alive).
+
+    When a cassette is configured (see `arxiv_replay.py`), requests are
+    recorded to or replayed from it instead of going only to the live API.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from arxiv_replay import get_cassette, requests_adapter
+
+            session = requests.Session()
+            cassette = get_cassette()
+            if cassette is not None:
+                adapter = requests_adapter(cassette)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def build_search_query(query: str) -> str:
+    """Searches all fields unless the query already uses Arxiv's field syntax."""
+    if _FIELD_QUERY.match(query):
+        return query
+    return f"all:{query}"
+
+
+def build_params(query: str, max_results: int = 3, start: int = 0) -> Dict[str, Any]:
+    """Builds the Arxiv API query parameters for a search."""
+    return {
+        "search_query": build_search_query(query),
+        "start": start,
         "max_results": max_results
     }
+
+
+def cache_key(params: Dict[str, Any]) -> Hashable:
+    """The `response_cache` key for a set of query parameters."""
+    return (params["search_query"], params["start"], params["max_results"])
+
+
+class _RecordingReader(io.RawIOBase):
+    """A file object over the chunks of a response that keeps every chunk it hands out."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = b""
+        self._received: List[bytes] = []
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._received.append(chunk)
+            self._buffer = chunk
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def body(self) -> bytes:
+        """The whole response, including anything after the point where parsing stopped."""
+        self._received.extend(self._chunks)
+        return b"".join(self._received)
+
+
+def _cached_feed(key: Hashable) -> Optional[bytes]:
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+    shared = shared_response_cache()
+    if shared is not None:
+        cached = shared.get(key)
+        if cached is not None:
+            response_cache.put(key, cached)
+    return cached
+
+
+def _cache_feed(key: Hashable, payload: bytes) -> None:
+    response_cache.put(key, payload)
+    shared = shared_response_cache()
+    if shared is not None:
+        shared.put(key, payload)
+
+
+def _request_feed(params: Dict[str, Any], throttle: bool):
+    """
+    Sends the Arxiv request without reading the body.
+
+    requests negotiates gzip transfer encoding; `iter_content` decodes the
+    body chunk by chunk while it arrives.
+    """
+    if throttle:
+        rate_limiter.acquire()
+    response = get_session().get(ARXIV_API_URL, params=params, timeout=10, stream=True)
     try:
-        response = requests.get(ARXIV_API_URL, params=params, timeout=10) # Added timeout
         response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+    except Exception:
+        response.close()
+        raise
+    return response
+
+
+def fetch_feed(params: Dict[str, Any], throttle: bool = True) -> bytes:
+    """
+    Fetches the Atom feed for the given query parameters.
+
+    Responses are served from `response_cache`, then from the shared cache of
+    all processes when enabled; new requests go through `rate_limiter` first
+    unless the caller already holds a token (`throttle=False`).
 
-        root = ET.fromstring(response.content)
-        namespace = {'atom': 'http://www.w3.org/2005/Atom'} # Atom feed namespace
-        entries = root.findall('atom:entry', namespace)
+    Always returns a payload from `feed_codec.encode`, the same bytes that
+    are cached: compressed, or the raw XML when compression does not pay off.
+    `parse_feed` reads it directly; `feed_codec.decode` gives the XML. To
+    parse a new response while it downloads, use `fetch_feed_page`.
+    """
+    from feed_codec import encode
 
-        if not entries:
-            return "No papers found on Arxiv for this query."
+    key = cache_key(params)
+    cached = _cached_feed(key)
+    if cached is not None:
+        return cached
+    with _request_feed(params, throttle) as response:
+        payload = encode(b"".join(response.iter_content(STREAM_CHUNK_SIZE)))
+    _cache_feed(key, payload)
+    return payload
 
-        output_lines = []
-        for i, entry in enumerate(entries):
-            title = entry.find('atom:title', namespace).text.strip()
-            summary = entry.find('atom:summary', namespace).text.strip()
-            # Clean up whitespace and newlines in title and summary
-            cleaned_title = ' '.join(title.split())
-            cleaned_summary = ' '.join(summary.split())
-            output_lines.append(f"Paper {i+1}: {cleaned_title}\nAbstract: {cleaned_summary}")
 
-        return "\n\n".join(output_lines)
+def fetch_feed_page(params: Dict[str, Any], throttle: bool = True) -> Tuple[List[Paper], Optional[int]]:
+    """
+    Like `parse_feed_page(fetch_feed(params))`, but a response that is not
+    cached yet is parsed while it streams in, instead of after the download.
 
+    The body is kept as it is read and cached (encoded) once it has been
+    parsed; a feed that fails to parse is not cached.
+    """
+    from feed_codec import encode
+
+    key = cache_key(params)
+    cached = _cached_feed(key)
+    if cached is not None:
+        return parse_feed_page(cached)
+    with _request_feed(params, throttle) as response:
+        reader = _RecordingReader(response.iter_content(STREAM_CHUNK_SIZE))
+        result = _parse_feed_stream(io.BufferedReader(reader, STREAM_CHUNK_SIZE))
+        payload = encode(reader.body())
+    _cache_feed(key, payload)
+    return result
+
+
+def search_papers(query: str, max_results: int = 3, start: int = 0) -> List[Paper]:
+    """
+    Searches Arxiv and returns the matching papers.
+
+    Raises the underlying `requests` or XML parse exception on failure.
+    """
+    return fetch_feed_page(build_params(query, max_results, start))[0]
+
+
+def try_search_papers(query: str, max_results: int = 3) -> Tuple[List[Paper], Optional[str]]:
+    """
+    Like `search_papers`, but returns `(papers, error_message)` instead of raising.
+    """
+    return try_search(search_papers, query, max_results)
+
+
+def try_search(search: Callable[..., List[Paper]], *args) -> Tuple[List[Paper], Optional[str]]:
+    """
+    Runs `search(*args)` and returns `(papers, error_message)` instead of raising.
+    """
+    import requests
+    import xml.etree.ElementTree as ET
+
+    try:
+        return search(*args), None
     except requests.exceptions.RequestException as e:
-        print(f"Error during Arxiv API request: {e}")
-        return f"Error fetching data from Arxiv: {e}"
+        print(f"Error during Arxiv API request: {e}", file=sys.stderr)
+        return [], f"Error fetching data from Arxiv: {e}"
     except ET.ParseError as e:
-        print(f"Error parsing Arxiv XML response: {e}")
-        return "Error parsing the response from Arxiv."
+        print(f"Error parsing Arxiv XML response: {e}", file=sys.stderr)
+        return [], "Error parsing the response from Arxiv."
     except Exception as e:
         # Catch any other unexpected errors
-        print(f"An unexpected error occurred in fetch_arxiv_papers: {e}")
-        return "An unexpected error occurred while fetching from Arxiv."
+        print(f"An unexpected error occurred in fetch_arxiv_papers: {e}", file=sys.stderr)
+        return [], "An unexpected error occurred while fetching from Arxiv."
+
+
+class ArxivClient:
+    """Async wrapper around the Arxiv API for use inside an event loop."""
+
+    async def search_papers(self, query: str, max_results: int = 10, start: int = 0) -> List[Paper]:
+        """Searches Arxiv in a worker thread so the event loop stays responsive."""
+        import asyncio
+        return await asyncio.to_thread(search_papers, query, max_results, start)
+
+
+def fetch_arxiv_papers(query: str, max_results: int = 3) -> str:
+    """
+    Fetches paper summaries from the Arxiv API based on a query.
+
+    Args:
+        query: The search term for Arxiv.
+        max_results: The maximum number of results to return.
+
+    Returns:
+        A formatted string containing the titles and summaries of the papers,
+        or an error message if the request fails or no papers are found.
+    """
+    papers, error = try_search_papers(query, max_results)
+    if error:
+        return error
+    if not papers:
+        return "No papers found on Arxiv for this query."
+    return format_papers(papers)
 
 # Example usage (for testing this module directly)
 if __name__ == '__main__':
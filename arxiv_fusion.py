@@ -0,0 +1,87 @@
+"""
+Samenvoegen van zoekresultaten uit meerdere zoekopdrachten en bronnen.
+
+Als het model in één beurt meerdere keren `search_arxiv_papers` aanroept,
+overlappen de resultaten vaak. `ResultFusion` voegt alle gerangschikte lijsten
+(zoekresultaten, en later ook lokale index- en semantische treffers) samen
+met reciprocal rank fusion tot één lijst zonder dubbele papers, zodat elke
+paper maar één keer naar het taalmodel gaat.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence
+
+from arxiv_client import Paper
+
+# Constante k uit de oorspronkelijke RRF paper (Cormack et al., 2009)
+RRF_K = 60
+
+MERGED_RESULT_NOTE = (
+    "The results of this search were merged into the combined, deduplicated "
+    "list of papers in the first search result above."
+)
+
+
+class ResultFusion:
+    """
+    Reciprocal rank fusion over gerangschikte lijsten van papers.
+
+    Een paper krijgt per lijst `weight / (k + rang)`; de scores worden per
+    arXiv id opgeteld. Komt een paper in meerdere versies voor, dan wordt de
+    nieuwste versie getoond.
+    """
+
+    def __init__(self, k: int = RRF_K):
+        self.k = k
+        self._scores: Dict[str, float] = {}
+        self._papers: Dict[str, Paper] = {}
+        self._order: Dict[str, int] = {}
+        # Regels die onder de samengevoegde lijst komen, zoals cursors voor meer resultaten
+        self.notes: List[str] = []
+
+    def add(self, papers: Sequence[Paper], weight: float = 1.0) -> None:
+        """Voeg één gerangschikte lijst toe (beste paper eerst)."""
+        for rank, paper in enumerate(papers, 1):
+            key = paper.arxiv_id
+            self._scores[key] = self._scores.get(key, 0.0) + weight / (self.k + rank)
+            current = self._papers.get(key)
+            if current is None:
+                self._order[key] = len(self._order)
+                self._papers[key] = paper
+            elif paper.version > current.version:
+                self._papers[key] = paper
+
+    def add_note(self, note: str) -> None:
+        """Een regel onder de samengevoegde lijst; lege regels worden overgeslagen."""
+        if note:
+            self.notes.append(note)
+
+    def ranked(self, limit: Optional[int] = None) -> List[Paper]:
+        """De samengevoegde lijst, hoogste score eerst; bij gelijke score de eerst geziene."""
+        keys = sorted(self._papers, key=lambda key: (-self._scores[key], self._order[key]))
+        if limit is not None:
+            keys = keys[:limit]
+        return [self._papers[key] for key in keys]
+
+    def __len__(self) -> int:
+        return len(self._papers)
+
+
+def assign_fused_results(tool_messages: List[Dict], fusion: ResultFusion,
+                         formatter: Callable[[List[Paper]], str]) -> None:
+    """
+    Vul de tool berichten zonder inhoud met het samengevoegde resultaat.
+
+    Het eerste zoekresultaat krijgt de volledige samengevoegde lijst, met de
+    notities van de fusie (bijvoorbeeld cursors) eronder; de overige
+    verwijzen ernaar. Elk tool bericht moet inhoud hebben, omdat de
+    OpenAI API op elke tool call een antwoord verwacht.
+    """
+    pending = [message for message in tool_messages if message["content"] is None]
+    if not pending:
+        return
+    content = formatter(fusion.ranked())
+    if fusion.notes:
+        content += "\n\n" + "\n".join(fusion.notes)
+    pending[0]["content"] = content
+    for message in pending[1:]:
+        message["content"] = MERGED_RESULT_NOTE
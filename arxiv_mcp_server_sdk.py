@@ -1,59 +1,195 @@
 #!/usr/bin/env python3
 """
 Arxiv MCP server implementatie met de officiële MCP Python SDK.
+
+Standaard communiceert de server via stdio met één agent. Met
+`--transport streamable-http` (of `sse`) draait de server als langlevende
+netwerkservice die veel agents tegelijk bedient, met één gedeelde cache en
+rate limiter:
+
+    python arxiv_mcp_server_sdk.py --transport streamable-http --port 8000
+    ARXIV_MCP_URL=http://127.0.0.1:8000/mcp python agent_with_mcp_sdk.py
 """
 
+import argparse
 import asyncio
-import os
-from typing import Dict, Any, List
+from typing import Optional
 
-from mcp.server.fastmcp import FastMCP
-from mcp.server.fastmcp import Context
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.types import CallToolResult, TextContent
 
-from arxiv_client import ArxivClient
+from request_profiler import profiled_to_thread, server_profile_id
 
 # Maak een MCP server instance
 mcp = FastMCP("Arxiv Knowledge")
 
+# Standaard aantal resultaten van search_arxiv_papers
+DEFAULT_MAX_RESULTS = 10
+
+# Prefetcher voor vervolgzoekopdrachten; wordt gezet met --prefetch
+prefetcher = None
+
+# Samenvattingen van abstracts (zie paper_summaries.py); wordt gezet met --summaries
+summarizer = None
+
+# Lopende achtergrondtaken (wegschrijven naar de metadata database)
+_background_tasks = set()
+
 
 @mcp.tool()
-async def search_arxiv_papers(query: str, max_results: int = 10) -> str:
+async def search_arxiv_papers(ctx: Context, query: str = "",
+                              max_results: Optional[int] = None,
+                              cursor: Optional[str] = None,
+                              categories: Optional[list[str]] = None,
+                              authors: Optional[list[str]] = None,
+                              published_from: Optional[str] = None,
+                              published_to: Optional[str] = None) -> CallToolResult:
     """
     Zoek naar wetenschappelijke papers op Arxiv.
     
     Args:
+        ctx: MCP request context; een `profile_id` in de `_meta` van het
+            request zet profileren aan (zie `request_profiler.py`)
         query: De zoekopdracht (keywords, auteurs, categorie, etc.)
-        max_results: Maximum aantal resultaten om terug te geven
+        max_results: Maximum aantal resultaten om terug te geven (standaard 10);
+            passen de resultaten van een kleine eerste pagina niet meer bij
+            de zoekopdracht, dan komt alleen die pagina terug, met een cursor
+            voor de rest
+        cursor: De `next_cursor` van een eerder resultaat, voor de volgende
+            resultaten van die zoekopdracht (query en filters worden dan genegeerd)
+        categories: Alleen papers in een van deze Arxiv categorieën (bijv. cs.LG, quant-ph)
+        authors: Alleen papers van een van deze auteurs
+        published_from: Alleen papers gepubliceerd in of na deze maand (YYYY-MM)
+        published_to: Alleen papers gepubliceerd in of voor deze maand (YYYY-MM)
     
     Returns:
-        Een geformatteerde lijst van relevante papers
+        Een geformatteerde lijst van relevante papers, met de papers zelf en
+        de cursor voor meer resultaten als structured content (voor het
+        samenvoegen van resultaten in de agent)
     """
     try:
-        # Maak een Arxiv client
-        client = ArxivClient()
-        
-        # Zoek papers
-        papers = await client.search_papers(query, max_results=max_results)
+        # Pas bij de eerste tool call importeren; de server start zo sneller
+        from arxiv_client import format_papers_markdown
+        from arxiv_paging import decode_cursor, format_more, page_info, parse_max_results, search_arxiv
+        from metadata_db import save_papers, saving_enabled
+        from paper_store import get_paper_store, parse_facets
+
+        if not query and not cursor:
+            return _text_result("Geef een zoekopdracht of een cursor op.")
+        if cursor:
+            query = decode_cursor(cursor)[0]
+        elif max_results is None:
+            max_results = DEFAULT_MAX_RESULTS
+        if max_results is not None:
+            max_results = parse_max_results(max_results)
+
+        # Zoek papers in een worker thread, geprofileerd als daarom gevraagd is;
+        # met filters eerst in de lokale store, anders een kleine eerste pagina
+        # en een cursor (zie arxiv_paging.py)
+        profile_id = server_profile_id(getattr(ctx.request_context.meta, "profile_id", None))
+        facets = parse_facets(categories, authors, published_from, published_to)
+        page = await profiled_to_thread(profile_id, "server", search_arxiv,
+                                        query, max_results, facets, cursor)
+        papers = page.papers
         
         # Geen resultaten?
         if not papers:
-            return f"Geen papers gevonden voor de zoekopdracht: '{query}'"
-        
-        # Formatteer de resultaten
-        results = []
-        for i, paper in enumerate(papers, 1):
-            paper_info = f"### {i}. {paper['title']}\n"
-            paper_info += f"**Auteurs:** {paper['authors']}\n"
-            paper_info += f"**Publicatiedatum:** {paper['published']}\n"
-            paper_info += f"**Link:** {paper['pdf_url']}\n"
-            paper_info += f"**Abstract:** {paper['summary']}\n"
-            results.append(paper_info)
+            return _text_result(f"Geen papers gevonden voor de zoekopdracht: '{query}'")
+
+        get_paper_store().add(papers)
+        # Ook voor andere processen, zonder op het schrijven te wachten
+        if saving_enabled():
+            task = asyncio.get_running_loop().create_task(asyncio.to_thread(save_papers, papers))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+
+        # Plan verwante categorieën en auteurs in voor prefetching
+        if prefetcher is not None:
+            prefetcher.schedule_related(papers)
+
+        # Gecachte korte samenvattingen in plaats van de abstracts
+        if summarizer is not None:
+            await asyncio.to_thread(summarizer.attach, papers)
         
-        header = f"# Zoekresultaten voor: '{query}'\n\n"
-        return header + "\n\n".join(results)
+        text = format_papers_markdown(query, papers)
+        more = format_more(page)
+        if more:
+            text = f"{text}\n\n{more}"
+        return CallToolResult(
+            content=[TextContent(type="text", text=text)],
+            structuredContent={"papers": [paper.to_dict() for paper in papers], **page_info(page)},
+        )
     
     except Exception as e:
-        return f"Error bij het zoeken naar papers: {str(e)}"
+        return _error_result(f"Error bij het zoeken naar papers: {str(e)}")
+
+
+@mcp.tool()
+async def find_related_papers(arxiv_id: str, ctx: Context, max_results: int = 5) -> CallToolResult:
+    """
+    Vind papers die verwant zijn aan een Arxiv paper (gedeelde auteurs,
+    vergelijkbare inhoud, gedeelde categorieën).
+    
+    Args:
+        arxiv_id: Het Arxiv id van de paper, bijv. 2301.01234, of de abs URL
+        ctx: MCP request context (voor profileren, zie `request_profiler.py`)
+        max_results: Maximum aantal verwante papers om terug te geven
+    
+    Returns:
+        Een geformatteerde lijst van verwante papers, met de papers zelf als
+        structured content
+    """
+    try:
+        from arxiv_client import format_papers_markdown
+        from paper_graph import find_related_papers as find_related
+
+        # Buren komen uit de voorberekende lokale graaf (zie paper_graph.py)
+        profile_id = server_profile_id(getattr(ctx.request_context.meta, "profile_id", None))
+        paper, related = await profiled_to_thread(profile_id, "server", find_related, arxiv_id, max_results)
+
+        if paper is None:
+            return _text_result(f"Paper {arxiv_id} niet gevonden op Arxiv")
+        if not related:
+            return _text_result(f"Nog geen verwante papers bekend voor {arxiv_id}; "
+                                "gebruik search_arxiv_papers met het onderwerp")
+        if summarizer is not None:
+            await asyncio.to_thread(summarizer.attach, related)
+
+        return CallToolResult(
+            content=[TextContent(type="text", text=format_papers_markdown(f"verwant aan {paper.title}", related))],
+            structuredContent={"papers": [paper.to_dict() for paper in related]},
+        )
+
+    except Exception as e:
+        return _error_result(f"Error bij het zoeken naar verwante papers: {str(e)}")
+
+
+def _text_result(text: str) -> CallToolResult:
+    """Een tool resultaat met alleen tekst."""
+    return CallToolResult(content=[TextContent(type="text", text=text)])
+
+
+def _error_result(text: str) -> CallToolResult:
+    """Een mislukte tool call; de agent cachet het antwoord dan niet."""
+    return CallToolResult(content=[TextContent(type="text", text=text)], isError=True)
+
+
+@mcp.tool()
+async def prefetch_arxiv_queries(queries: list[str]) -> str:
+    """
+    Plan vervolgzoekopdrachten in om op de achtergrond in de cache te laden.
+
+    Bedoeld voor de agent zelf, niet voor het taalmodel.
+    
+    Args:
+        queries: Zoekopdrachten die de gebruiker waarschijnlijk hierna stelt
+    
+    Returns:
+        Het aantal ingeplande zoekopdrachten
+    """
+    if prefetcher is None:
+        return "0"
+    return str(sum(1 for query in queries if query and prefetcher.schedule(query)))
 
 
 @mcp.resource("arxiv://help")
@@ -74,7 +210,19 @@ def arxiv_help() -> str:
     
     Parameters:
     - query: Zoekopdracht (keywords, auteurs, categorieën, etc.)
-    - max_results: Maximum aantal resultaten (standaard 10)
+    - max_results: Maximum aantal resultaten (standaard 10); de server haalt
+      eerst een kleine pagina op en haalt de rest alleen op als die pagina
+      relevant blijft; anders volgt de rest via de cursor
+    - cursor: `next_cursor` van een eerder resultaat, voor de volgende resultaten
+    - categories, authors, published_from, published_to: optionele filters
+    
+    ### find_related_papers
+    
+    Geeft papers die verwant zijn aan een bekende paper, uit een lokale graaf.
+    
+    Parameters:
+    - arxiv_id: Arxiv id van de paper (bijv. 2301.01234)
+    - max_results: Maximum aantal resultaten (standaard 5)
     
     Voorbeeld gebruik:
     ```
@@ -90,5 +238,33 @@ def arxiv_help() -> str:
     return help_text
 
 
+def main():
+    """Start de MCP server via stdio of als netwerkservice."""
+    from arxiv_paging import FIRST_PAGE
+    from arxiv_prefetch import get_prefetcher, prefetch_enabled
+    from paper_summaries import get_summarizer, summaries_enabled
+
+    parser = argparse.ArgumentParser(description="Arxiv MCP server (MCP Python SDK)")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio",
+                        help="stdio voor één agent; sse of streamable-http voor een gedeelde server")
+    parser.add_argument("--host", default=mcp.settings.host, help="Host voor sse/streamable-http")
+    parser.add_argument("--port", type=int, default=mcp.settings.port, help="Poort voor sse/streamable-http")
+    parser.add_argument("--prefetch", action="store_true", default=prefetch_enabled(),
+                        help="Haal verwante zoekopdrachten op de achtergrond op (ook: ARXIV_PREFETCH=1)")
+    parser.add_argument("--summaries", action="store_true", default=summaries_enabled(),
+                        help="Geef korte, gecachte samenvattingen in plaats van abstracts (ook: ARXIV_SUMMARIES=1)")
+    args = parser.parse_args()
+
+    global prefetcher, summarizer
+    if args.prefetch:
+        prefetcher = get_prefetcher(max_results=FIRST_PAGE)
+    if args.summaries:
+        summarizer = get_summarizer()
+
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    mcp.run(transport=args.transport)
+
+
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    main()
\ No newline at end of file
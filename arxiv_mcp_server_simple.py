@@ -1,19 +1,58 @@
 #!/usr/bin/env python3
+import argparse
 import asyncio
 import json
 import sys
 import traceback
 from typing import Dict, List, Any, Optional
 
-from arxiv_client import fetch_arxiv_papers
+from arxiv_client import format_papers, try_search
+from arxiv_paging import decode_cursor, format_more, page_info, parse_max_results, search_arxiv
+from paper_graph import find_related_papers
+from paper_store import get_paper_store, parse_facets
+from request_profiler import profiled_to_thread, server_profile_id
 
 class ArxivMCPServerStdio:
     """
     Een vereenvoudigde MCP server die communiceert via stdin/stdout.
     Implementeert het MCP protocol zonder afhankelijkheid van de mcp module.
+
+    Met `transport="unix"` luistert de server in plaats daarvan op een Unix
+    socket en wisselt berichten uit als length-prefixed frames (zie
+    `mcp_transport.py`). Met `transport="tcp"` draait de server als
+    langlevende netwerkservice die veel agents tegelijk bedient, met één
+    gedeelde cache en rate limiter. Met `prefetch=True` haalt de server na elke
+    zoekopdracht verwante zoekopdrachten op de achtergrond op (zie
+    `arxiv_prefetch.py`). Met `summaries=True` bevatten tool resultaten korte,
+    gecachte samenvattingen in plaats van de volledige abstracts (zie
+    `paper_summaries.py`).
     """
     
-    def __init__(self):
+    def __init__(self, transport: str = "stdio", socket_path: Optional[str] = None,
+                 serializer: str = "json", host: str = "127.0.0.1", port: int = 8765,
+                 prefetch: bool = False, summaries: bool = False):
+        if transport not in ("stdio", "unix", "tcp"):
+            raise ValueError(f"Unsupported transport: {transport}")
+        if transport == "unix" and not socket_path:
+            raise ValueError("socket_path is required for the unix transport")
+        self.transport = transport
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.serializer = None
+        if transport != "stdio":
+            from mcp_transport import get_serializer
+            self.serializer = get_serializer(serializer)
+        self.prefetcher = None
+        if prefetch:
+            from arxiv_paging import FIRST_PAGE
+            from arxiv_prefetch import get_prefetcher
+            self.prefetcher = get_prefetcher(max_results=FIRST_PAGE)
+        self.summarizer = None
+        if summaries:
+            from paper_summaries import get_summarizer
+            self.summarizer = get_summarizer()
+        self._background_tasks = set()
         self.tools = {
             "search_arxiv_papers": {
                 "type": "function",
@@ -29,13 +68,57 @@ class ArxivMCPServerStdio:
                             },
                             "max_results": {
                                 "type": "integer",
-                                "description": "Maximum number of results to return",
+                                "description": "Maximum number of results to return; a small first page is returned if later results stop matching the query, with a cursor for the rest",
                                 "default": 3
+                            },
+                            "cursor": {
+                                "type": "string",
+                                "description": "The cursor from a previous result, to get the next results of that search (query and filters are then ignored)"
+                            },
+                            "categories": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Only papers in one of these Arxiv categories, e.g. cs.LG or quant-ph"
+                            },
+                            "authors": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Only papers by one of these authors"
+                            },
+                            "published_from": {
+                                "type": "string",
+                                "description": "Only papers published in or after this month (YYYY-MM)"
+                            },
+                            "published_to": {
+                                "type": "string",
+                                "description": "Only papers published in or before this month (YYYY-MM)"
                             }
                         },
                         "required": ["query"]
                     }
                 }
+            },
+            "find_related_papers": {
+                "type": "function",
+                "function": {
+                    "name": "find_related_papers",
+                    "description": "Find papers related to a given Arxiv paper (shared authors, similar content, shared categories)",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "arxiv_id": {
+                                "type": "string",
+                                "description": "The Arxiv id of the paper, e.g. 2301.01234, or its abs URL"
+                            },
+                            "max_results": {
+                                "type": "integer",
+                                "description": "Maximum number of related papers to return",
+                                "default": 5
+                            }
+                        },
+                        "required": ["arxiv_id"]
+                    }
+                }
             }
         }
     
@@ -48,6 +131,8 @@ class ArxivMCPServerStdio:
                 return self.handle_capabilities()
             elif message.get("type") == "tool_call":
                 return await self.handle_tool_call(message)
+            elif message.get("type") == "prefetch":
+                return self.handle_prefetch(message)
             else:
                 return {
                     "type": "error",
@@ -75,6 +160,21 @@ class ArxivMCPServerStdio:
             }
         }
     
+    def handle_prefetch(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Plant door het model voorgestelde vervolgzoekopdrachten in voor prefetching.
+        """
+        queries = message.get("prefetch", {}).get("queries", [])
+        scheduled = 0
+        if self.prefetcher is not None:
+            scheduled = sum(1 for query in queries if query and self.prefetcher.schedule(query))
+        return {
+            "type": "prefetch_result",
+            "prefetch_result": {
+                "scheduled": scheduled
+            }
+        }
+
     async def handle_tool_call(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """
         Verwerkt een tool_call bericht en voert de gevraagde functie uit.
@@ -82,6 +182,8 @@ class ArxivMCPServerStdio:
         tool_call = message.get("tool_call", {})
         tool_name = tool_call.get("name")
         
+        if tool_name == "find_related_papers":
+            return await self.handle_related_papers(tool_call)
         if tool_name != "search_arxiv_papers":
             return {
                 "type": "error",
@@ -93,25 +195,59 @@ class ArxivMCPServerStdio:
         # Haal parameters op
         params = tool_call.get("parameters", {})
         query = params.get("query")
-        max_results = params.get("max_results", 3)
+        cursor = params.get("cursor")
+        # Met een cursor standaard het maximum van de eerste aanroep
+        max_results = params.get("max_results", None if cursor else 3)
         
-        if not query:
+        if not query and not cursor:
             return {
                 "type": "error",
                 "error": {
                     "message": "Missing required parameter: query"
                 }
             }
-        
-        # Voer de zoekopdracht uit
         try:
-            papers = fetch_arxiv_papers(query, max_results)
+            facets = parse_facets(params.get("categories"), params.get("authors"),
+                                  params.get("published_from"), params.get("published_to"))
+            if cursor:
+                decode_cursor(cursor)
+            if max_results is not None:
+                max_results = parse_max_results(max_results)
+        except ValueError as e:
             return {
-                "type": "tool_result",
-                "tool_result": {
-                    "content": papers
+                "type": "error",
+                "error": {
+                    "message": str(e)
                 }
             }
+        
+        # Voer de zoekopdracht uit in een thread, zodat andere verbindingen
+        # bediend blijven worden terwijl de Arxiv API antwoordt; met een
+        # "profile_id" (of ARXIV_PROFILE=1) wordt die thread geprofileerd
+        try:
+            profile_id = server_profile_id(tool_call.get("profile_id"))
+            # Met filters eerst de lokale store (zie paper_store.py); zonder
+            # filters een kleine eerste pagina en een cursor (zie arxiv_paging.py)
+            page, error = await profiled_to_thread(profile_id, "server", try_search, search_arxiv,
+                                                   query, max_results, facets, cursor)
+            if error:
+                return self._tool_result(error, is_error=True)
+            if not page.papers:
+                return self._tool_result("No papers found on Arxiv for this query.")
+            papers = page.papers
+
+            get_paper_store().add(papers)
+            self._save_papers(papers)
+
+            if self.prefetcher is not None:
+                self.prefetcher.schedule_related(papers)
+            if self.summarizer is not None:
+                await asyncio.to_thread(self.summarizer.attach, papers)
+            content = format_papers(papers)
+            more = format_more(page)
+            if more:
+                content = f"{content}\n\n{more}"
+            return self._papers_result(tool_call, content, papers, page_info(page))
         except Exception as e:
             traceback.print_exc()
             return {
@@ -120,7 +256,80 @@ class ArxivMCPServerStdio:
                     "message": f"Error searching Arxiv: {str(e)}"
                 }
             }
+
+    async def handle_related_papers(self, tool_call: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Zoekt verwante papers in de lokale graaf (zie paper_graph.py).
+        """
+        params = tool_call.get("parameters", {})
+        arxiv_id = params.get("arxiv_id")
+        max_results = params.get("max_results", 5)
+
+        if not arxiv_id:
+            return {
+                "type": "error",
+                "error": {
+                    "message": "Missing required parameter: arxiv_id"
+                }
+            }
+
+        try:
+            profile_id = server_profile_id(tool_call.get("profile_id"))
+            paper, related = await profiled_to_thread(profile_id, "server", find_related_papers,
+                                                      arxiv_id, max_results)
+        except Exception as e:
+            traceback.print_exc()
+            return {
+                "type": "error",
+                "error": {
+                    "message": f"Error finding related papers: {str(e)}"
+                }
+            }
+        if paper is None:
+            return self._tool_result(f"Paper {arxiv_id} was not found on Arxiv.")
+        if not related:
+            return self._tool_result(
+                f"No related papers known yet for {arxiv_id}; use search_arxiv_papers with its topic.")
+        if self.summarizer is not None:
+            await asyncio.to_thread(self.summarizer.attach, related)
+        content = f"Papers related to {paper.arxiv_id} ({paper.title}):\n\n{format_papers(related)}"
+        # De tekst gaat ook structured mee: verwante papers zijn geen zoekresultaten
+        # en worden door de agent niet met die samengevoegd
+        return self._papers_result(tool_call, content, related, {"content": content})
+
+    def _save_papers(self, papers) -> None:
+        """Schrijf papers op de achtergrond weg naar de gedeelde metadata database."""
+        from metadata_db import save_papers, saving_enabled
+
+        if not saving_enabled():
+            return
+        task = asyncio.get_running_loop().create_task(asyncio.to_thread(save_papers, papers))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _papers_result(self, tool_call: Dict[str, Any], content: str, papers,
+                       info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # Met "structured" krijgt de client de papers zelf in plaats van tekst
+        if tool_call.get("structured"):
+            return {
+                "type": "tool_result",
+                "tool_result": {
+                    "papers": [paper.to_dict() for paper in papers],
+                    **(info or {})
+                }
+            }
+        return self._tool_result(content)
     
+    def _tool_result(self, content: str, is_error: bool = False) -> Dict[str, Any]:
+        # "is_error": de zoekopdracht zelf is mislukt (zoals `isError` in MCP)
+        tool_result = {"content": content}
+        if is_error:
+            tool_result["is_error"] = True
+        return {
+            "type": "tool_result",
+            "tool_result": tool_result
+        }
+
     async def read_message(self) -> Optional[Dict[str, Any]]:
         """
         Leest een JSON bericht van stdin.
@@ -141,12 +350,53 @@ class ArxivMCPServerStdio:
         json_str = json.dumps(message)
         print(json_str, flush=True)
     
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Verwerkt berichten van één socket verbinding totdat de client deze sluit.
+        """
+        from mcp_transport import FramedConnection
+
+        connection = FramedConnection(reader, writer, self.serializer)
+        try:
+            while True:
+                message = await connection.receive()
+                if message is None:
+                    break
+                response = await self.handle_message(message)
+                await connection.send(response)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"Error in MCP connection: {str(e)}", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+        finally:
+            connection.close()
+
+    async def serve_socket(self) -> None:
+        """
+        Luistert op de Unix of TCP socket; meldt via stdout wanneer de socket klaar is.
+        """
+        if self.transport == "unix":
+            server = await asyncio.start_unix_server(self.handle_connection, path=self.socket_path)
+            self.write_message({"type": "ready", "socket": self.socket_path})
+        else:
+            server = await asyncio.start_server(self.handle_connection, host=self.host, port=self.port)
+            host, port = server.sockets[0].getsockname()[:2]
+            print(f"Arxiv MCP server listening on tcp://{host}:{port}", file=sys.stderr)
+            self.write_message({"type": "ready", "host": host, "port": port})
+        async with server:
+            await server.serve_forever()
+
     async def run(self) -> None:
         """
         Start de MCP server en verwerkt berichten totdat een afsluitsignaal wordt ontvangen.
         """
         print("Arxiv MCP server starting...", file=sys.stderr)
         try:
+            if self.transport != "stdio":
+                await self.serve_socket()
+                return
+
             while True:
                 message = await self.read_message()
                 if message is None:
@@ -159,7 +409,28 @@ class ArxivMCPServerStdio:
             traceback.print_exc(file=sys.stderr)
 
 async def main():
-    server = ArxivMCPServerStdio()
+    from arxiv_prefetch import prefetch_enabled
+    from paper_summaries import summaries_enabled
+
+    parser = argparse.ArgumentParser(description="Vereenvoudigde Arxiv MCP server")
+    parser.add_argument("--transport", choices=["stdio", "unix", "tcp"], default="stdio",
+                        help="stdio: JSON-regels over stdin/stdout; unix/tcp: frames over een socket")
+    parser.add_argument("--socket", help="Pad van de Unix socket (bij --transport unix)")
+    parser.add_argument("--host", default="127.0.0.1", help="Host voor --transport tcp")
+    parser.add_argument("--port", type=int, default=8765, help="Poort voor --transport tcp")
+    parser.add_argument("--serializer", default="json",
+                        help="Serializer voor de frames: json, orjson of msgpack")
+    parser.add_argument("--prefetch", action="store_true",
+                        default=prefetch_enabled(),
+                        help="Haal verwante zoekopdrachten op de achtergrond op (ook: ARXIV_PREFETCH=1)")
+    parser.add_argument("--summaries", action="store_true",
+                        default=summaries_enabled(),
+                        help="Geef korte, gecachte samenvattingen in plaats van abstracts (ook: ARXIV_SUMMARIES=1)")
+    args = parser.parse_args()
+
+    server = ArxivMCPServerStdio(transport=args.transport, socket_path=args.socket,
+                                 serializer=args.serializer, host=args.host, port=args.port,
+                                 prefetch=args.prefetch, summaries=args.summaries)
     await server.run()
 
 if __name__ == "__main__":
@@ -0,0 +1,163 @@
+"""
+Zoeken in pagina's, met vroeg stoppen en cursors om verder te zoeken.
+
+Het taalmodel vraagt vaak om meer resultaten dan het leest. In plaats van
+meteen `max_results` papers op te halen (en te parsen en te versturen) haalt
+`search_page` eerst een kleine pagina van `FIRST_PAGE` papers op. Alleen als
+de laatste paper daarvan nog goed bij de zoektermen past, haalt een tweede
+request de rest op, tot `max_results`; zo kost een zoekopdracht hooguit twee
+requests.
+
+Zijn er daarna nog meer resultaten, dan krijgt het tool resultaat een cursor
+(`next_cursor`) mee; de volgende `max_results` papers haalt de client met één
+request op via `search_arxiv_papers(cursor=...)`. De cursor bevat de
+zoekopdracht en de positie, zodat de server er zelf niets voor hoeft te
+onthouden.
+"""
+
+import base64
+import binascii
+import json
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from arxiv_client import Paper, build_params, fetch_feed_page
+
+# Grootte van de eerste pagina; volgende pagina's hebben `max_results` papers
+FIRST_PAGE = int(os.getenv("ARXIV_FIRST_PAGE", "3"))
+# Minimaal aandeel van de zoektermen in de laatste paper om door te zoeken
+RELEVANCE_THRESHOLD = 0.5
+
+MAX_CURSOR_LENGTH = 2048
+
+_FIELD_PREFIX = re.compile(r"\b(ti|au|abs|co|jr|cat|rn|id|all):", re.IGNORECASE)
+_WORD = re.compile(r"[a-z0-9][a-z0-9-]{2,}")
+_OPERATORS = frozenset(("and", "andnot"))
+
+
+class Page(NamedTuple):
+    papers: List[Paper]
+    # Positie van de eerste paper in alle resultaten van de zoekopdracht
+    start: int
+    # opensearch:totalResults, of None als Arxiv het niet meegaf
+    total: Optional[int]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(query: str, start: int, max_results: int) -> str:
+    """Een cursor voor de resultaten van `query` vanaf positie `start`."""
+    data = json.dumps({"q": query, "s": start, "m": max_results}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, int]:
+    """(query, start, max_results) uit een cursor; ValueError als die ongeldig is."""
+    if not isinstance(cursor, str) or len(cursor) > MAX_CURSOR_LENGTH:
+        raise ValueError("Invalid cursor")
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        query, start, max_results = data["q"], data["s"], data["m"]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor") from None
+    if not (isinstance(query, str) and query and isinstance(start, int) and start >= 0
+            and isinstance(max_results, int) and max_results > 0):
+        raise ValueError("Invalid cursor")
+    return query, start, max_results
+
+
+def parse_max_results(value: Any) -> int:
+    """`max_results` uit een tool call als positief getal (ook als string); anders ValueError."""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise ValueError(f"Invalid max_results: {value!r} (expected a positive integer)")
+    return value
+
+
+def query_terms(query: str) -> set:
+    """De woorden uit een zoekopdracht, zonder Arxiv veldnamen en operatoren."""
+    words = _WORD.findall(_FIELD_PREFIX.sub(" ", query.lower()))
+    return {word for word in words if word not in _OPERATORS}
+
+
+def relevance(paper: Paper, terms: set) -> float:
+    """Het aandeel van `terms` dat in de titel, abstract of auteurs van `paper` voorkomt."""
+    if not terms:
+        return 0.0
+    text = " ".join((paper.title, paper.summary, " ".join(paper.authors))).lower()
+    return sum(1 for term in terms if term in text) / len(terms)
+
+
+def _fetch_page(query: str, start: int, size: int, max_results: int) -> Page:
+    # Eén request; de cursor onthoudt `max_results` voor de volgende pagina
+    papers, total = fetch_feed_page(build_params(query, size, start))
+    position = start + len(papers)
+    exhausted = len(papers) < size or (total is not None and position >= total)
+    next_cursor = None if exhausted else encode_cursor(query, position, max_results)
+    return Page(papers, start, total, next_cursor)
+
+
+def search_page(query: str, max_results: int) -> Page:
+    """
+    De eerste resultaten van `query`, tot `max_results` papers.
+
+    Eerst `FIRST_PAGE` papers; de rest alleen als de laatste daarvan nog
+    relevant is (`RELEVANCE_THRESHOLD`), met één extra request. Raises de
+    onderliggende `requests` of XML parse exception bij fouten.
+    """
+    page = _fetch_page(query, 0, min(max_results, FIRST_PAGE), max_results)
+    remaining = max_results - len(page.papers)
+    if (page.next_cursor is None or remaining <= 0
+            or relevance(page.papers[-1], query_terms(query)) < RELEVANCE_THRESHOLD):
+        return page
+    rest = _fetch_page(query, len(page.papers), remaining, max_results)
+    total = page.total if rest.total is None else rest.total
+    return Page(page.papers + rest.papers, 0, total, rest.next_cursor)
+
+
+def continue_search(cursor: str, max_results: Optional[int] = None) -> Page:
+    """De volgende pagina voor een cursor; `max_results` vervangt die van de eerste aanroep."""
+    query, start, cursor_max = decode_cursor(cursor)
+    max_results = max_results or cursor_max
+    return _fetch_page(query, start, max_results, max_results)
+
+
+def search_arxiv(query: str, max_results: int, facets=None, cursor: Optional[str] = None) -> Page:
+    """
+    De zoekopdracht achter de `search_arxiv_papers` tool van beide servers.
+
+    Met een cursor wordt een eerdere zoekopdracht voortgezet (`query` en
+    filters worden dan genegeerd). Zoekopdrachten met filters lopen via de
+    lokale store (zie `paper_store.py`) en geven geen cursor.
+    """
+    if cursor:
+        return continue_search(cursor, max_results)
+    if facets is not None and facets.active:
+        from paper_store import search_with_facets
+
+        return Page(search_with_facets(query, max_results, facets), 0, None, None)
+    return search_page(query, max_results)
+
+
+def page_info(page: Page) -> Dict[str, Any]:
+    """De paginagegevens voor structured tool resultaten."""
+    return {"start": page.start, "total_results": page.total, "next_cursor": page.next_cursor}
+
+
+def format_more(page: Page) -> str:
+    """Een regel voor tekstuele tool resultaten over de resultaten na deze pagina."""
+    if page.next_cursor is None:
+        return ""
+    shown = f"Showing results {page.start + 1}-{page.start + len(page.papers)}"
+    if page.total is not None:
+        shown += f" of {page.total}"
+    return f'{shown}. For more, call search_arxiv_papers with cursor="{page.next_cursor}".'
+
+
+def format_more_info(papers: List[Paper], info: Dict[str, Any]) -> str:
+    """Als `format_more`, voor een structured tool resultaat (de velden van `page_info`)."""
+    if not info.get("next_cursor"):
+        return ""
+    return format_more(Page(papers, info.get("start") or 0, info.get("total_results"),
+                            info["next_cursor"]))
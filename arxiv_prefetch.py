@@ -0,0 +1,162 @@
+"""
+Speculatief vooraf ophalen van waarschijnlijke vervolgvragen.
+
+Na een zoekopdracht vragen gebruikers vaak door op verwante categorieën of
+de auteurs van de beste papers. De `Prefetcher` zet zulke zoekopdrachten in
+een wachtrij met lage prioriteit en haalt ze in een achtergrondthread op in
+de `response_cache` van `arxiv_client`, de lokale `PaperStore` en de gedeelde
+metadata database. Dat gebeurt alleen met ongebruikt
+rate-limit budget (`RateLimiter.try_acquire(reserve=...)`), zodat gewone
+zoekopdrachten nooit hoeven te wachten.
+
+Prefetchen loont alleen als de cache langer leeft dan één gesprek, dus bij een
+gedeelde MCP server (`--transport tcp` / `streamable-http`). Aanzetten met
+`ARXIV_PREFETCH=1` of `--prefetch`.
+"""
+
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+import arxiv_client
+from arxiv_client import Paper
+from metadata_db import save_papers
+from paper_store import get_paper_store
+
+# Lagere waarde = eerder opgehaald
+PRIORITY_FOLLOWUP = 0
+PRIORITY_CATEGORY = 1
+PRIORITY_AUTHOR = 2
+
+
+class Prefetcher:
+    """Haalt geplande zoekopdrachten op de achtergrond op met spare rate-limit budget."""
+
+    def __init__(self, max_results: int = 3, reserve: int = 2, max_pending: int = 32,
+                 max_age: float = 600.0):
+        """
+        Args:
+            max_results: Aantal resultaten per zoekopdracht; gelijk aan de
+                standaard van de tool, zodat latere aanroepen de cache raken.
+            reserve: Aantal rate-limit tokens dat vrij blijft voor gewone zoekopdrachten.
+            max_pending: Maximaal aantal zoekopdrachten in de wachtrij.
+            max_age: Zoekopdrachten die langer dan dit (in seconden) wachten vervallen.
+        """
+        self.max_results = max_results
+        self.reserve = reserve
+        self.max_pending = max_pending
+        self.max_age = max_age
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._pending = set()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, query: str, priority: int = PRIORITY_FOLLOWUP,
+                 max_results: Optional[int] = None) -> bool:
+        """Plan een zoekopdracht; retourneert False als die al gepland of gecachet is."""
+        params = arxiv_client.build_params(query, max_results or self.max_results)
+        key = arxiv_client.cache_key(params)
+        with self._lock:
+            if key in self._pending or len(self._pending) >= self.max_pending:
+                return False
+            if arxiv_client.response_cache.get(key) is not None:
+                return False
+            self._pending.add(key)
+            self._queue.put((priority, next(self._counter), time.monotonic(), params))
+            self._ensure_worker()
+        return True
+
+    def schedule_related(self, papers: List[Paper], top: int = 3) -> None:
+        """Plan de primaire categorieën en eerste auteurs van de `top` beste papers."""
+        categories = Counter(paper.categories[0] for paper in papers[:top] if paper.categories)
+        for category, _ in categories.most_common():
+            self.schedule(f"cat:{category}", PRIORITY_CATEGORY)
+        for paper in papers[:top]:
+            if paper.authors:
+                self.schedule(f'au:"{paper.authors[0]}"', PRIORITY_AUTHOR)
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="arxiv-prefetch", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        limiter = arxiv_client.rate_limiter
+        while True:
+            item = self._queue.get()
+            priority, _, scheduled_at, params = item
+            key = arxiv_client.cache_key(params)
+
+            if time.monotonic() - scheduled_at > self.max_age:
+                self._done(key)
+                continue
+            if not limiter.try_acquire(reserve=self.reserve):
+                # Geen spare budget: terugzetten en wachten op een nieuw token
+                self._queue.put(item)
+                time.sleep(1 / limiter.rate)
+                continue
+
+            try:
+                papers, _ = arxiv_client.fetch_feed_page(params, throttle=False)
+                # Ook de lokale store groeit mee, voor zoekopdrachten met filters
+                get_paper_store().add(papers)
+                save_papers(papers)
+            except Exception as e:
+                print(f"Prefetch of '{params['search_query']}' failed: {e}", file=sys.stderr)
+            finally:
+                self._done(key)
+
+    def _done(self, key) -> None:
+        with self._lock:
+            self._pending.discard(key)
+
+
+_prefetcher: Optional[Prefetcher] = None
+
+
+def prefetch_enabled() -> bool:
+    """Of prefetchen via `ARXIV_PREFETCH` is aangezet."""
+    return os.getenv("ARXIV_PREFETCH", "").lower() in ("1", "true", "yes")
+
+
+def get_prefetcher(max_results: int = 3) -> Prefetcher:
+    """Geef de prefetcher van dit proces (één per server)."""
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = Prefetcher(
+            max_results=max_results,
+            reserve=int(os.getenv("ARXIV_PREFETCH_RESERVE", "2")),
+        )
+    return _prefetcher
+
+
+FOLLOWUP_PROMPT = (
+    "Given a user's question about scientific papers and the answer they received, "
+    "suggest up to 3 short Arxiv search queries they are likely to ask about next. "
+    'Reply with a JSON object of the form {"queries": ["..."]}.'
+)
+
+
+def suggest_followup_queries(openai_client, user_question: str, answer: str,
+                             limit: int = 3) -> List[str]:
+    """Vraag het model om waarschijnlijke vervolgzoekopdrachten (blokkerend)."""
+    response = openai_client.chat.completions.create(
+        model="gpt-4-turbo",
+        messages=[
+            {"role": "system", "content": FOLLOWUP_PROMPT},
+            {"role": "user", "content": f"Question: {user_question}\n\nAnswer: {answer}"},
+        ],
+        response_format={"type": "json_object"},
+    )
+    try:
+        queries = json.loads(response.choices[0].message.content or "{}").get("queries", [])
+    except (json.JSONDecodeError, AttributeError):
+        return []
+    return [query for query in queries if isinstance(query, str) and query.strip()][:limit]
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Opnemen en afspelen van verkeer naar Arxiv en OpenAI.
+
+Met een cassette worden alle upstream requests (Arxiv API via `requests`,
+OpenAI via `httpx`) samen met hun responstijd opgeslagen, en later zonder
+netwerk afgespeeld op echte of versnelde snelheid. Zo zijn productie
+vertragingen te reproduceren en load tests deterministisch.
+
+De cassette is een map met per proces een gzip-bestand met JSON-regels,
+zodat agent en MCP servers (aparte processen) tegelijk kunnen opnemen.
+Configuratie via environment variables, die ook door de MCP server
+subprocesses worden overgenomen:
+
+    ARXIV_CASSETTE=/pad/naar/cassette     # map van de cassette
+    ARXIV_CASSETTE_MODE=record|replay      # standaard replay
+    ARXIV_REPLAY_SPEED=1.0                 # 0 = zonder vertraging, 10 = 10x sneller
+
+    python arxiv_replay.py info /pad/naar/cassette
+"""
+
+import argparse
+import base64
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Headers die na het decoderen van de body niet meer kloppen
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def request_key(method: str, url: str, body: Optional[bytes] = None) -> str:
+    """Sleutel waarmee een opgenomen response bij een request wordt gezocht."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    key = f"{method.upper()} {urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))}"
+    if body:
+        key += " " + hashlib.sha1(body).hexdigest()[:16]
+    return key
+
+
+def _kept_headers(headers) -> Dict[str, str]:
+    return {name: value for name, value in headers.items() if name.lower() not in _DROPPED_HEADERS}
+
+
+class Cassette:
+    """Een map met opgenomen request/response paren."""
+
+    def __init__(self, path: str, mode: str = "replay", speed: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unsupported cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._writer = None
+        self._entries: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._positions: Dict[Tuple[str, str], int] = {}
+        if mode == "replay":
+            for entry in load_entries(path):
+                self._entries.setdefault((entry["service"], entry["key"]), []).append(entry)
+
+    def record(self, service: str, key: str, status: int, headers: Dict[str, str],
+               body: bytes, elapsed: float) -> None:
+        """Voeg een request/response paar toe aan de cassette."""
+        entry = {"service": service, "key": key, "status": status, "headers": headers,
+                 "elapsed": round(elapsed, 4), "at": round(time.time(), 3)}
+        try:
+            entry["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["body_b64"] = base64.b64encode(body).decode("ascii")
+
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._writer is None:
+                os.makedirs(self.path, exist_ok=True)
+                filename = os.path.join(self.path, f"{os.getpid()}-{int(time.time())}.jsonl.gz")
+                self._writer = gzip.open(filename, "at", encoding="utf-8")
+            self._writer.write(line)
+            # Per regel flushen: het proces kan zonder nette afsluiting stoppen
+            self._writer.flush()
+
+    def lookup(self, service: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Zoek de opgenomen response voor een request.
+
+        Herhaalde identieke requests krijgen de opnames in volgorde; daarna
+        begint de reeks opnieuw, zodat een load test langer kan lopen dan de opname.
+        """
+        with self._lock:
+            entries = self._entries.get((service, key))
+            if not entries:
+                return None
+            position = self._positions.get((service, key), 0)
+            self._positions[(service, key)] = position + 1
+            return entries[position % len(entries)]
+
+    def wait(self, entry: Dict[str, Any]) -> None:
+        """Wacht de opgenomen responstijd, gedeeld door de afspeelsnelheid."""
+        if self.speed > 0:
+            time.sleep(entry.get("elapsed", 0) / self.speed)
+
+
+def entry_body(entry: Dict[str, Any]) -> bytes:
+    if "body_b64" in entry:
+        return base64.b64decode(entry["body_b64"])
+    return entry.get("body", "").encode("utf-8")
+
+
+def load_entries(path: str) -> List[Dict[str, Any]]:
+    """Lees alle opnames uit een cassette map, ook van afgebroken processen."""
+    entries = []
+    for filename in sorted(glob.glob(os.path.join(path, "*.jsonl.gz"))):
+        try:
+            with gzip.open(filename, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entries.append(json.loads(line))
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError):
+            # Bestand van een proces dat niet netjes afsloot; de regels
+            # tot dat punt zijn wel gelezen
+            continue
+    return entries
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """De cassette uit `ARXIV_CASSETTE`, of None als opnemen/afspelen uit staat."""
+    global _cassette
+    path = os.getenv("ARXIV_CASSETTE")
+    if not path:
+        return None
+    with _cassette_lock:
+        if _cassette is None or _cassette.path != path:
+            _cassette = Cassette(
+                path,
+                mode=os.getenv("ARXIV_CASSETTE_MODE", "replay"),
+                speed=float(os.getenv("ARXIV_REPLAY_SPEED", "1.0")),
+            )
+        return _cassette
+
+
+def requests_adapter(cassette: Cassette, service: str = "arxiv"):
+    """Een `requests` transport adapter die opneemt of afspeelt via `cassette`."""
+    import requests
+    from requests.adapters import BaseAdapter, HTTPAdapter
+
+    class RecordingAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            start = time.perf_counter()
+            response = super().send(request, **kwargs)
+            body = response.content
+            cassette.record(service, request_key(request.method, request.url, request.body),
+                            response.status_code, _kept_headers(response.headers), body,
+                            time.perf_counter() - start)
+            return response
+
+    class ReplayAdapter(BaseAdapter):
+        def send(self, request, **kwargs):
+            key = request_key(request.method, request.url, request.body)
+            entry = cassette.lookup(service, key)
+            if entry is None:
+                raise requests.exceptions.ConnectionError(f"No recorded response for {key}")
+            cassette.wait(entry)
+            response = requests.Response()
+            response.status_code = entry["status"]
+            response.headers.update(entry.get("headers", {}))
+            response._content = entry_body(entry)
+            # Zonder `raw`: ook `iter_content` (gestreamd lezen) geeft dan deze body
+            response._content_consumed = True
+            response.url = request.url
+            response.request = request
+            response.reason = "Replayed"
+            return response
+
+        def close(self):
+            pass
+
+    return RecordingAdapter() if cassette.mode == "record" else ReplayAdapter()
+
+
+def httpx_transport(cassette: Cassette, service: str = "openai"):
+    """Een `httpx` transport dat opneemt of afspeelt via `cassette` (voor de OpenAI client)."""
+    import httpx
+
+    class CassetteTransport(httpx.BaseTransport):
+        def __init__(self):
+            self._inner = httpx.HTTPTransport() if cassette.mode == "record" else None
+
+        def handle_request(self, request):
+            body = request.read()
+            key = request_key(request.method, str(request.url), body)
+            if self._inner is not None:
+                start = time.perf_counter()
+                response = self._inner.handle_request(request)
+                content = response.read()
+                response.close()
+                headers = _kept_headers(response.headers)
+                cassette.record(service, key, response.status_code, headers, content,
+                                time.perf_counter() - start)
+                return httpx.Response(response.status_code, headers=headers, content=content,
+                                      request=request)
+
+            entry = cassette.lookup(service, key)
+            if entry is None:
+                raise httpx.ConnectError(f"No recorded response for {key}", request=request)
+            cassette.wait(entry)
+            return httpx.Response(entry["status"], headers=entry.get("headers", {}),
+                                  content=entry_body(entry), request=request)
+
+        def close(self):
+            if self._inner is not None:
+                self._inner.close()
+
+    return CassetteTransport()
+
+
+def openai_http_client():
+    """Een `httpx.Client` voor de OpenAI client als er een cassette actief is, anders None."""
+    cassette = get_cassette()
+    if cassette is None:
+        return None
+    import httpx
+    return httpx.Client(transport=httpx_transport(cassette))
+
+
+def _info(args) -> None:
+    entries = load_entries(args.path)
+    if not entries:
+        print(f"No recordings in {args.path}")
+        return
+    services: Dict[str, List[float]] = {}
+    for entry in entries:
+        services.setdefault(entry["service"], []).append(entry.get("elapsed", 0))
+    for service, elapsed in sorted(services.items()):
+        elapsed.sort()
+        print(f"{service:<8} {len(elapsed):>6} requests  "
+              f"median {elapsed[len(elapsed) // 2] * 1000:.0f} ms  "
+              f"max {elapsed[-1] * 1000:.0f} ms  total {sum(elapsed):.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arxiv/OpenAI cassettes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    info = subparsers.add_parser("info", help="Toon een overzicht van een cassette")
+    info.add_argument("path", help="Map van de cassette")
+    info.set_defaults(run=_info)
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Benchmarks voor de Arxiv Knowledge Agent.
+
+    python benchmark.py startup              # import-tijd per module
+    python benchmark.py startup --forkserver # plus MCP server starttijd
+    python benchmark.py memory --papers 1000 # piekgeheugen van parsen en formatteren
+    python benchmark.py facets --papers 100000 # gefilterd zoeken in de lokale store
+    python benchmark.py db --processes 1,4,8   # lezen uit de metadata database door meerdere processen
+    python benchmark.py codec --papers 10      # grootte en snelheid van gecomprimeerde feeds
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STARTUP_MODULES = [
+    "arxiv_client",
+    "arxiv_mcp_server_simple",
+    "arxiv_mcp_server_sdk",
+    "agent_with_mcp_simple",
+    "agent_with_mcp_sdk",
+]
+
+
+def _import_time(module: str) -> tuple:
+    """Importeer `module` in een vers proces; retourneer (wall ms, cumulatieve import µs)."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        return wall_ms, None
+
+    # Regels hebben de vorm: "import time:   self |  cumulative | module"
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return wall_ms, int(parts[1])
+    return wall_ms, None
+
+
+def _first_response_ms(forkserver_socket=None) -> float:
+    """Meet de tijd tot het eerste capabilities antwoord van de simple MCP server."""
+    import asyncio
+    from agent_with_mcp_simple import ArxivAgent
+
+    agent = ArxivAgent(openai_api_key="")
+    agent.forkserver_socket = forkserver_socket
+
+    async def start_and_query():
+        process = await agent.start_mcp_server()
+        try:
+            return await agent.get_server_capabilities(process)
+        finally:
+            process.terminate()
+            process.wait(timeout=2)
+
+    start = time.perf_counter()
+    tools = asyncio.run(start_and_query())
+    elapsed = (time.perf_counter() - start) * 1000
+    if not tools:
+        raise RuntimeError("MCP server returned no capabilities")
+    return elapsed
+
+
+def bench_startup(args) -> dict:
+    report = {"imports": {}, "server_start_ms": {}}
+    for module in STARTUP_MODULES:
+        samples = [_import_time(module) for _ in range(args.repeat)]
+        wall = statistics.median(sample[0] for sample in samples)
+        cumulative = [sample[1] for sample in samples if sample[1] is not None]
+        report["imports"][module] = {
+            "wall_ms": round(wall, 1),
+            "import_ms": round(statistics.median(cumulative) / 1000, 1) if cumulative else None,
+        }
+
+    report["server_start_ms"]["subprocess"] = round(statistics.median(
+        _first_response_ms() for _ in range(args.repeat)), 1)
+
+    if args.forkserver:
+        socket_path = os.path.join(tempfile.mkdtemp(), "forkserver.sock")
+        forkserver = subprocess.Popen(
+            [sys.executable, os.path.join(BASE_DIR, "mcp_forkserver.py"),
+             "--server", "simple", "--socket", socket_path],
+            cwd=BASE_DIR, stderr=subprocess.DEVNULL,
+        )
+        try:
+            deadline = time.monotonic() + 30
+            while not os.path.exists(socket_path):
+                if time.monotonic() > deadline:
+                    raise RuntimeError("fork-server did not start")
+                time.sleep(0.05)
+            report["server_start_ms"]["forkserver"] = round(statistics.median(
+                _first_response_ms(socket_path) for _ in range(args.repeat)), 1)
+        finally:
+            forkserver.terminate()
+            forkserver.wait(timeout=5)
+    return report
+
+
+def _print_startup(report: dict) -> None:
+    print(f"{'module':<28}{'wall ms':>10}{'import ms':>12}")
+    for module, row in report["imports"].items():
+        import_ms = "-" if row["import_ms"] is None else f"{row['import_ms']:.1f}"
+        print(f"{module:<28}{row['wall_ms']:>10.1f}{import_ms:>12}")
+    print()
+    for mode, value in report["server_start_ms"].items():
+        print(f"server start ({mode}): {value:.1f} ms")
+
+
+def synthetic_feed(papers: int) -> bytes:
+    """Bouw een Atom feed met `papers` realistische entries."""
+    authors = [f"Author {chr(65 + i % 26)}. Name{i}" for i in range(50)]
+    categories = ["cs.LG", "cs.AI", "quant-ph", "stat.ML", "cs.CL", "physics.comp-ph"]
+    sentence = "We study   the problem of\n  learning representations with quantum circuits. "
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">']
+    for i in range(papers):
+        entry_authors = "".join(
+            f"<author><name>{authors[(i + j) % len(authors)]}</name></author>" for j in range(4))
+        entry_categories = "".join(
+            f'<category term="{categories[(i + j) % len(categories)]}"/>' for j in range(2))
+        parts.append(
+            f"<entry><id>http://arxiv.org/abs/2401.{i:05d}v{1 + i % 3}</id>"
+            f"<published>2024-01-{1 + i % 28:02d}T00:00:00Z</published>"
+            f"<title>A Study of\n  Topic {i} in\n  Quantum Learning</title>"
+            f"<summary>\n  {sentence * 15}\n</summary>{entry_authors}{entry_categories}"
+            f'<link title="pdf" href="http://arxiv.org/pdf/2401.{i:05d}v1"/></entry>')
+    parts.append("</feed>")
+    return "".join(parts).encode("utf-8")
+
+
+def _legacy_format(content: bytes) -> str:
+    """De oorspronkelijke aanpak: volledige tree, split/join en string concatenatie."""
+    import xml.etree.ElementTree as ET
+
+    root = ET.fromstring(content)
+    namespace = {'atom': 'http://www.w3.org/2005/Atom'}
+    output_lines = []
+    for i, entry in enumerate(root.findall('atom:entry', namespace)):
+        title = ' '.join(entry.find('atom:title', namespace).text.strip().split())
+        summary = ' '.join(entry.find('atom:summary', namespace).text.strip().split())
+        output_lines.append(f"Paper {i+1}: {title}\nAbstract: {summary}")
+    return "\n\n".join(output_lines)
+
+
+def _current_format(content: bytes) -> str:
+    from arxiv_client import format_papers, parse_feed
+    return format_papers(parse_feed(content))
+
+
+def _peak_kib(func, content: bytes) -> tuple:
+    import tracemalloc
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(content)
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 1024, 1), round(elapsed, 1), len(result)
+
+
+def bench_memory(args) -> dict:
+    content = synthetic_feed(args.papers)
+    report = {"papers": args.papers, "feed_kib": round(len(content) / 1024, 1), "results": {}}
+    for name, func in (("legacy", _legacy_format), ("current", _current_format)):
+        peak, elapsed, size = _peak_kib(func, content)
+        report["results"][name] = {"peak_kib": peak, "ms": elapsed, "output_chars": size}
+    return report
+
+
+def _print_memory(report: dict) -> None:
+    print(f"{report['papers']} papers, feed {report['feed_kib']} KiB")
+    print(f"{'variant':<10}{'peak KiB':>12}{'ms':>10}")
+    for name, row in report["results"].items():
+        print(f"{name:<10}{row['peak_kib']:>12.1f}{row['ms']:>10.1f}")
+
+
+def synthetic_papers(papers: int) -> list:
+    """Bouw `papers` Paper records met realistisch verdeelde categorieën, auteurs en maanden."""
+    import random
+    from arxiv_client import Paper
+
+    rng = random.Random(42)
+    categories = ["cs.LG", "cs.AI", "quant-ph", "stat.ML", "cs.CL", "hep-th"] + [f"math.X{i}" for i in range(60)]
+    authors = [f"Author {i}" for i in range(max(100, papers // 3))]
+    return [
+        Paper(f"2401.{i:05d}", 1, f"A Study of Topic {i % 500}",
+              "We study graph networks." if i % 4 == 0 else "We study quantum circuits.",
+              tuple(rng.sample(authors, 3)),
+              (rng.choice(categories[:6]), rng.choice(categories)),
+              f"{2019 + i % 6}-{1 + i % 12:02d}-01T00:00:00Z")
+        for i in range(papers)
+    ]
+
+
+def bench_facets(args) -> dict:
+    from paper_store import PaperStore, parse_facets
+
+    store = PaperStore(max_size=args.papers)
+    start = time.perf_counter()
+    store.add(synthetic_papers(args.papers))
+    report = {"papers": args.papers, "index_s": round(time.perf_counter() - start, 2), "filters": {}}
+
+    filters = {
+        "category": parse_facets(["cs.LG"]),
+        "category+month": parse_facets(["cs.LG"], None, "2023-01", "2023-06"),
+        "author": parse_facets(None, ["Author 7"]),
+        "category+author": parse_facets(["quant-ph"], ["Author 7", "Author 8"]),
+    }
+    for name, facets in filters.items():
+        match_us = statistics.median(_time_us(store.match, facets) for _ in range(args.repeat))
+        search_us = statistics.median(_time_us(store.search, "graph", facets, 10) for _ in range(args.repeat))
+        report["filters"][name] = {"matches": store.count(facets), "match_us": round(match_us, 1),
+                                   "search_us": round(search_us, 1)}
+    return report
+
+
+def _time_us(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1e6
+
+
+def _print_facets(report: dict) -> None:
+    print(f"{report['papers']} papers, indexed in {report['index_s']} s")
+    print(f"{'filter':<18}{'matches':>10}{'match µs':>12}{'search µs':>12}")
+    for name, row in report["filters"].items():
+        print(f"{name:<18}{row['matches']:>10}{row['match_us']:>12.1f}{row['search_us']:>12.1f}")
+
+
+def _db_reads(path: str, ids: list, categories: list, seconds: float) -> int:
+    """Lees zo veel mogelijk papers (op id en op categorie) in `seconds`; in een eigen proces."""
+    import random
+    from metadata_db import MetadataDB
+
+    db = MetadataDB(path, pool_size=1)
+    rng = random.Random(os.getpid())
+    reads = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(50):
+            if reads % 10 == 0:
+                db.papers_by_category(rng.choice(categories), "2023-01", "2023-12", 10)
+            else:
+                db.get_paper(rng.choice(ids))
+            reads += 1
+    return reads
+
+
+def bench_db(args) -> dict:
+    from concurrent.futures import ProcessPoolExecutor
+    from metadata_db import MetadataDB
+
+    directory = tempfile.mkdtemp(prefix="arxiv-db-bench-")
+    path = os.path.join(directory, "bench.db")
+    db = MetadataDB(path)
+    papers = synthetic_papers(args.papers)
+    start = time.perf_counter()
+    for i in range(0, len(papers), args.batch):
+        db.upsert_papers(papers[i:i + args.batch])
+    upsert_s = time.perf_counter() - start
+    report = {"papers": args.papers, "batch": args.batch, "upsert_s": round(upsert_s, 2),
+              "upserts_per_s": round(args.papers / upsert_s), "reads": {}}
+
+    ids = [paper.arxiv_id for paper in papers]
+    categories = sorted({paper.categories[0] for paper in papers})
+    for processes in (int(n) for n in args.processes.split(",")):
+        with ProcessPoolExecutor(processes) as pool:
+            counts = list(pool.map(_db_reads, [path] * processes, [ids] * processes,
+                                   [categories] * processes, [args.seconds] * processes))
+        report["reads"][processes] = round(sum(counts) / args.seconds)
+    return report
+
+
+def _print_db(report: dict) -> None:
+    print(f"{report['papers']} papers upserted in batches of {report['batch']}: "
+          f"{report['upsert_s']} s ({report['upserts_per_s']}/s)")
+    print(f"{'processes':>10}{'reads/s':>12}")
+    for processes, reads in report["reads"].items():
+        print(f"{processes:>10}{reads:>12}")
+
+
+def _timed_ms(func, *args, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def bench_codec(args) -> dict:
+    import gzip
+    import feed_codec
+    from arxiv_client import parse_feed
+    from stub_services import stub_feed
+
+    feed = stub_feed("all:graph neural networks", 0, args.papers)
+    abstract = parse_feed(feed)[0].summary.encode("utf-8")
+    report = {"papers": args.papers, "feed_bytes": len(feed), "abstract_bytes": len(abstract),
+              "codecs": {}}
+    report["codecs"]["gzip"] = {"feed_bytes": len(gzip.compress(feed)),
+                                "abstract_bytes": len(gzip.compress(abstract))}
+    codecs = ["zlib", "zstd"] if feed_codec.zstandard is not None else ["zlib"]
+    for name in codecs:
+        payload = feed_codec.encode(feed, name)
+        report["codecs"][name] = {
+            "feed_bytes": len(payload),
+            "abstract_bytes": len(feed_codec.encode(abstract, name)),
+            "encode_ms": round(_timed_ms(feed_codec.encode, feed, name), 3),
+            "decode_ms": round(_timed_ms(feed_codec.decode, payload), 3),
+            "parse_ms": round(_timed_ms(parse_feed, payload), 3),
+        }
+    report["codecs"]["none"] = {"feed_bytes": len(feed), "abstract_bytes": len(abstract),
+                                "parse_ms": round(_timed_ms(parse_feed, feed), 3)}
+    return report
+
+
+def _print_codec(report: dict) -> None:
+    print(f"{report['papers']} papers: feed {report['feed_bytes']} bytes, "
+          f"one abstract {report['abstract_bytes']} bytes")
+    print(f"{'codec':<8}{'feed':>10}{'abstract':>10}{'encode ms':>11}{'decode ms':>11}{'parse ms':>10}")
+    for name, row in report["codecs"].items():
+        print(f"{name:<8}{row['feed_bytes']:>10}{row['abstract_bytes']:>10}"
+              f"{row.get('encode_ms', ''):>11}{row.get('decode_ms', ''):>11}{row.get('parse_ms', ''):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks voor de Arxiv Knowledge Agent")
+    parser.add_argument("--json", action="store_true", help="Schrijf het rapport als JSON")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    startup = subparsers.add_parser("startup", help="Import- en starttijd van servers en agents")
+    startup.add_argument("--repeat", type=int, default=5, help="Aantal herhalingen per meting")
+    startup.add_argument("--forkserver", action="store_true",
+                         help="Meet ook de starttijd via de fork-server")
+    startup.set_defaults(run=bench_startup, show=_print_startup)
+
+    memory = subparsers.add_parser("memory", help="Piekgeheugen van parsen en formatteren")
+    memory.add_argument("--papers", type=int, default=1000, help="Aantal papers in de feed")
+    memory.set_defaults(run=bench_memory, show=_print_memory)
+
+    facets = subparsers.add_parser("facets", help="Gefilterd zoeken in de lokale paper store")
+    facets.add_argument("--papers", type=int, default=100000, help="Aantal papers in de store")
+    facets.add_argument("--repeat", type=int, default=50, help="Aantal herhalingen per meting")
+    facets.set_defaults(run=bench_facets, show=_print_facets)
+
+    db = subparsers.add_parser("db", help="Schrijven naar en lezen uit de metadata database")
+    db.add_argument("--papers", type=int, default=50000, help="Aantal papers in de database")
+    db.add_argument("--batch", type=int, default=100, help="Papers per upsert")
+    db.add_argument("--processes", default="1,2,4,8", help="Aantallen lezende processen")
+    db.add_argument("--seconds", type=float, default=3.0, help="Meetduur per aantal processen")
+    db.set_defaults(run=bench_db, show=_print_db)
+
+    codec = subparsers.add_parser("codec", help="Grootte en snelheid van gecomprimeerde feeds (feed_codec.py)")
+    codec.add_argument("--papers", type=int, default=10, help="Aantal papers in de feed")
+    codec.set_defaults(run=bench_codec, show=_print_codec)
+
+    args = parser.parse_args()
+    report = args.run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        args.show(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""
+pytest configuratie: de tests staan in `tests/`.
+
+`test_agent.py` is een handmatig script dat een echte OpenAI key en het
+netwerk nodig heeft; pytest slaat het over.
+"""
+
+collect_ignore = ["test_agent.py"]
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Load generator voor de web app endpoints.
+
+Stuurt zoekvragen naar `/api/search` (HTTP) of het Socket.IO `search_query`
+event, met een open loop (Poisson aankomsten met een vaste rate, ongeacht
+hoe snel de server antwoordt) of een closed loop (een vast aantal gebruikers
+die elk pas na een antwoord de volgende vraag stellen). Rapporteert de
+latency verdeling, foutpercentages en, met `sweep`, het verzadigingspunt.
+
+    python loadgen.py run --mode open --rate 2 --duration 60 --queries queries.txt
+    python loadgen.py run --interface socketio --mode closed --concurrency 8
+    python loadgen.py sweep --rates 0.5,1,2,4,8 --slo 10
+
+De vragen komen uit een bestand met één vraag per regel, optioneel met een
+gewicht ervoor (`3<TAB>quantum error correction`); regels met `#` worden
+overgeslagen. Voor een hermetische test: start `stub_services.py` en de web
+app met de environment variables die het afdrukt.
+
+Socket.IO vereist `pip install "python-socketio[asyncio_client]"`.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_QUERIES = [
+    "quantum error correction",
+    "diffusion models for image generation",
+    "graph neural networks for molecules",
+    "retrieval augmented generation",
+    "dark matter detection",
+]
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class LoadError(Exception):
+    """Een mislukte zoekvraag; `kind` groepeert fouten in het rapport."""
+
+    def __init__(self, kind: str, message: str = ""):
+        super().__init__(message or kind)
+        self.kind = kind
+
+
+def load_queries(path: Optional[str]) -> Tuple[List[str], List[float]]:
+    """Lees de vragen en hun gewichten uit `path` (of de standaardset zonder bestand)."""
+    if not path:
+        return list(DEFAULT_QUERIES), [1.0] * len(DEFAULT_QUERIES)
+    queries, weights = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            # `gewicht<TAB>vraag`; een regel zonder tab of zonder vraag is zelf de vraag
+            weight, tab, query = line.partition("\t")
+            query = query.strip()
+            try:
+                weight = float(weight) if tab and query else None
+            except ValueError:
+                weight = None
+            if weight is None:
+                weights.append(1.0)
+                queries.append(line)
+            else:
+                weights.append(weight)
+                queries.append(query)
+    if not queries:
+        raise ValueError(f"No queries in {path}")
+    return queries, weights
+
+
+class QueryMix:
+    """
+    Trekt vragen naar gewicht, reproduceerbaar met een seed.
+
+    `random` is de enige random generator van een run: ook de aankomsttijden
+    en denktijden komen eruit, zodat een seed de hele belasting vastlegt.
+    """
+
+    def __init__(self, queries: List[str], weights: List[float], seed: Optional[int] = None):
+        self.queries = queries
+        self.weights = weights
+        self.random = random.Random(seed)
+
+    def next(self) -> str:
+        return self.random.choices(self.queries, self.weights)[0]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentiel volgens de nearest-rank methode."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Results:
+    """Latencies en fouten van één meting."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Counter = Counter()
+        self.issued = 0
+        self.dropped = 0
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    def success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.finished = time.perf_counter()
+
+    def failure(self, kind: str) -> None:
+        self.errors[kind] += 1
+        self.finished = time.perf_counter()
+
+    def summary(self, offered_rate: Optional[float] = None, duration: Optional[float] = None) -> Dict:
+        latencies = sorted(self.latencies)
+        failed = sum(self.errors.values())
+        attempted = len(latencies) + failed
+        elapsed = max(self.finished - self.started, 1e-9)
+        report = {
+            "completed": len(latencies),
+            "failed": failed,
+            "dropped": self.dropped,
+            "error_rate": round(failed / attempted, 4) if attempted else 0.0,
+            "throughput": round(len(latencies) / elapsed, 3),
+            "latency_s": {
+                "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                **{f"p{p}": round(percentile(latencies, p), 3) for p in PERCENTILES},
+                "max": round(latencies[-1], 3) if latencies else 0.0,
+            },
+            "errors": dict(self.errors),
+        }
+        if offered_rate is not None:
+            report["offered_rate"] = offered_rate
+            report["arrival_rate"] = round(self.issued / duration, 3) if duration else 0.0
+        return report
+
+
+class HttpTarget:
+    """Zoekt via `POST /api/search`."""
+
+    def __init__(self, url: str, timeout: float, connections: int):
+        import httpx
+
+        self._httpx = httpx
+        self._client = httpx.AsyncClient(
+            base_url=url, timeout=timeout,
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+        )
+
+    async def start(self) -> None:
+        pass
+
+    async def search(self, query: str) -> None:
+        httpx = self._httpx
+        try:
+            response = await self._client.post("/api/search", json={"query": query})
+        except httpx.TimeoutException as e:
+            raise LoadError("timeout", str(e)) from e
+        except httpx.TransportError as e:
+            raise LoadError("connection", str(e)) from e
+        if response.status_code != 200:
+            raise LoadError(f"http {response.status_code}")
+        if not response.json().get("success"):
+            raise LoadError("app error", response.json().get("error", ""))
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class _SocketIOSession:
+    """Eén Socket.IO verbinding met hooguit één openstaande vraag."""
+
+    def __init__(self, url: str):
+        import socketio
+
+        self.url = url
+        self.client = socketio.AsyncClient(reconnection=False)
+        self.pending: Optional[asyncio.Future] = None
+        self.client.on("search_results", self._on_result)
+        self.client.on("error", self._on_error)
+
+    async def _on_result(self, data):
+        if self.pending is not None and not self.pending.done():
+            self.pending.set_result(data)
+
+    async def _on_error(self, data):
+        if self.pending is not None and not self.pending.done():
+            self.pending.set_exception(LoadError("app error", str(data.get("message", ""))))
+
+    async def connect(self) -> None:
+        await self.client.connect(self.url, transports=["websocket", "polling"])
+
+
+class SocketIOTarget:
+    """
+    Zoekt via het Socket.IO `search_query` event.
+
+    De server koppelt antwoorden niet aan een vraag, dus elke verbinding heeft
+    hooguit één vraag open; `connections` bepaalt het maximale aantal
+    gelijktijdige vragen. Wachten op een vrije verbinding telt mee in de latency.
+    """
+
+    def __init__(self, url: str, timeout: float, connections: int):
+        self.url = url
+        self.timeout = timeout
+        self.connections = connections
+        self._idle: "asyncio.Queue[_SocketIOSession]" = asyncio.Queue()
+        self._sessions: List[_SocketIOSession] = []
+        # Weggegooide verbindingen; ze worden opnieuw gemaakt zodra er geen vrije meer is
+        self._missing = 0
+
+    async def start(self) -> None:
+        for _ in range(self.connections):
+            session = _SocketIOSession(self.url)
+            await session.connect()
+            self._sessions.append(session)
+            self._idle.put_nowait(session)
+
+    async def _acquire(self) -> _SocketIOSession:
+        if self._idle.empty() and self._missing > 0:
+            self._missing -= 1
+            session = _SocketIOSession(self.url)
+            try:
+                await session.connect()
+            except Exception as e:
+                self._missing += 1
+                raise LoadError("connection", str(e)) from e
+            self._sessions.append(session)
+            return session
+        return await self._idle.get()
+
+    async def _discard(self, session: _SocketIOSession) -> None:
+        self._sessions.remove(session)
+        self._missing += 1
+        try:
+            await session.client.disconnect()
+        except Exception:
+            pass
+
+    async def search(self, query: str) -> None:
+        session = await self._acquire()
+        session.pending = asyncio.get_running_loop().create_future()
+        healthy = True
+        try:
+            await session.client.emit("search_query", {"query": query})
+            await asyncio.wait_for(session.pending, self.timeout)
+        except asyncio.TimeoutError as e:
+            # Een laat antwoord zou bij de volgende vraag terechtkomen: weg met deze verbinding
+            healthy = False
+            raise LoadError("timeout") from e
+        except LoadError:
+            raise
+        except Exception as e:
+            healthy = False
+            raise LoadError("connection", str(e)) from e
+        finally:
+            session.pending = None
+            if healthy:
+                self._idle.put_nowait(session)
+            else:
+                await self._discard(session)
+
+    async def close(self) -> None:
+        for session in self._sessions:
+            await session.client.disconnect()
+
+
+def make_target(args):
+    if args.interface == "socketio":
+        return SocketIOTarget(args.url, args.timeout, args.connections)
+    return HttpTarget(args.url, args.timeout, args.connections)
+
+
+async def _timed(target, query: str, issued_at: float, results: Results) -> None:
+    try:
+        await target.search(query)
+    except LoadError as e:
+        results.failure(e.kind)
+    except Exception as e:
+        results.failure(type(e).__name__)
+    else:
+        results.success(time.perf_counter() - issued_at)
+
+
+async def open_loop(target, mix: QueryMix, rate: float, duration: float,
+                    max_inflight: int) -> Results:
+    """
+    Poisson aankomsten met gemiddeld `rate` vragen per seconde.
+
+    De latency loopt vanaf het geplande aankomstmoment, zodat een trage server
+    niet minder zwaar belast wordt (geen coordinated omission). Vragen boven
+    `max_inflight` worden overgeslagen en als `dropped` geteld.
+    """
+    results = Results()
+    tasks = set()
+    arrival = results.started
+    while True:
+        arrival += mix.random.expovariate(rate)
+        if arrival - results.started >= duration:
+            break
+        await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+        if len(tasks) >= max_inflight:
+            results.dropped += 1
+            continue
+        results.issued += 1
+        task = asyncio.create_task(_timed(target, mix.next(), arrival, results))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    return results
+
+
+async def closed_loop(target, mix: QueryMix, concurrency: int, duration: float,
+                      think_time: float) -> Results:
+    """`concurrency` gebruikers die elk na een antwoord (en denktijd) de volgende vraag stellen."""
+    results = Results()
+    deadline = results.started + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            await _timed(target, mix.next(), time.perf_counter(), results)
+            if think_time > 0:
+                await asyncio.sleep(mix.random.expovariate(1 / think_time))
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return results
+
+
+async def _warmup(target, mix: QueryMix, count: int) -> None:
+    for _ in range(count):
+        try:
+            await target.search(mix.next())
+        except Exception as e:
+            print(f"Warmup request failed: {e}", file=sys.stderr)
+
+
+async def _with_target(args, measure):
+    queries, weights = load_queries(args.queries)
+    mix = QueryMix(queries, weights, args.seed)
+    target = make_target(args)
+    await target.start()
+    try:
+        await _warmup(target, mix, args.warmup)
+        return await measure(target, mix)
+    finally:
+        await target.close()
+
+
+def run_load(args) -> Dict:
+    async def measure(target, mix):
+        if args.mode == "open":
+            results = await open_loop(target, mix, args.rate, args.duration, args.max_inflight)
+            return results.summary(offered_rate=args.rate, duration=args.duration)
+        results = await closed_loop(target, mix, args.concurrency, args.duration, args.think)
+        return results.summary()
+
+    report = asyncio.run(_with_target(args, measure))
+    report.update(interface=args.interface, mode=args.mode)
+    return report
+
+
+def is_saturated(step: Dict, slo: float, max_error_rate: float) -> bool:
+    """
+    Een stap is verzadigd als de p95 de SLO of de fouten het budget overschrijden.
+
+    Loopt de server achter, dan groeit de wachtrij en daarmee de latency vanaf
+    het aankomstmoment, dus dat zit al in de p95; overgeslagen vragen tellen ook.
+    """
+    return (step["error_rate"] > max_error_rate
+            or step["latency_s"]["p95"] > slo
+            or step["dropped"] > 0)
+
+
+def run_sweep(args) -> Dict:
+    rates = [float(rate) for rate in args.rates.split(",")]
+
+    async def measure(target, mix):
+        steps = []
+        for rate in rates:
+            results = await open_loop(target, mix, rate, args.step_duration, args.max_inflight)
+            step = results.summary(offered_rate=rate, duration=args.step_duration)
+            step["saturated"] = is_saturated(step, args.slo, args.max_error_rate)
+            steps.append(step)
+            print(f"rate {rate:g}/s: p95 {step['latency_s']['p95']:.2f} s, "
+                  f"errors {step['error_rate']:.1%}, throughput {step['throughput']:.2f}/s",
+                  file=sys.stderr)
+            if step["saturated"]:
+                break
+        return steps
+
+    steps = asyncio.run(_with_target(args, measure))
+    sustainable = [step["offered_rate"] for step in steps if not step["saturated"]]
+    saturated = [step["offered_rate"] for step in steps if step["saturated"]]
+    return {
+        "interface": args.interface,
+        "slo_p95_s": args.slo,
+        "max_error_rate": args.max_error_rate,
+        "steps": steps,
+        "max_sustainable_rate": sustainable[-1] if sustainable else None,
+        "saturation_rate": saturated[0] if saturated else None,
+    }
+
+
+def _print_run(report: Dict) -> None:
+    print(f"{report['interface']} {report['mode']} loop")
+    if "offered_rate" in report:
+        print(f"offered rate:  {report['offered_rate']:g}/s (actual {report['arrival_rate']:.2f}/s)")
+    print(f"throughput:    {report['throughput']:.2f}/s")
+    print(f"completed:     {report['completed']}")
+    print(f"failed:        {report['failed']} ({report['error_rate']:.1%})")
+    if report["dropped"]:
+        print(f"dropped:       {report['dropped']}")
+    for kind, count in sorted(report["errors"].items()):
+        print(f"  {kind}: {count}")
+    print("latency (s):   " + "  ".join(
+        f"{name} {value:.3f}" for name, value in report["latency_s"].items()))
+
+
+def _print_sweep(report: Dict) -> None:
+    print(f"{'rate/s':>8}{'tput/s':>9}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'errors':>9}{'dropped':>9}")
+    for step in report["steps"]:
+        latency = step["latency_s"]
+        marker = "  saturated" if step["saturated"] else ""
+        print(f"{step['offered_rate']:>8g}{step['throughput']:>9.2f}{latency['p50']:>9.2f}"
+              f"{latency['p95']:>9.2f}{latency['p99']:>9.2f}{step['error_rate']:>9.1%}"
+              f"{step['dropped']:>9}{marker}")
+    print()
+    print(f"max sustainable rate: {report['max_sustainable_rate'] or '-'}/s "
+          f"(p95 <= {report['slo_p95_s']:g} s, errors <= {report['max_error_rate']:.1%})")
+    if report["saturation_rate"] is None:
+        print("no saturation reached; try higher rates")
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--url", default="http://127.0.0.1:5000", help="Basis URL van de web app")
+    common.add_argument("--interface", choices=["http", "socketio"], default="http",
+                        help="/api/search of het Socket.IO search_query event")
+    common.add_argument("--queries", help="Bestand met vragen (één per regel, optioneel gewicht<TAB>vraag)")
+    common.add_argument("--timeout", type=float, default=120.0, help="Timeout per vraag in seconden")
+    common.add_argument("--connections", type=int, default=64,
+                        help="Maximaal aantal verbindingen (Socket.IO: gelijktijdige vragen)")
+    common.add_argument("--max-inflight", type=int, default=256,
+                        help="Open loop: maximaal aantal openstaande vragen")
+    common.add_argument("--warmup", type=int, default=0, help="Aantal vragen vooraf, niet gemeten")
+    common.add_argument("--seed", type=int, help="Seed voor de vragen, aankomsttijden en denktijden")
+    common.add_argument("--json", action="store_true", help="Schrijf het rapport als JSON")
+
+    parser = argparse.ArgumentParser(description="Load generator voor de Arxiv Knowledge Agent web app")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", parents=[common], help="Eén meting met vaste belasting")
+    run.add_argument("--mode", choices=["open", "closed"], default="open",
+                     help="open: vaste aankomstrate; closed: vast aantal gebruikers")
+    run.add_argument("--rate", type=float, default=1.0, help="Open loop: vragen per seconde")
+    run.add_argument("--concurrency", type=int, default=4, help="Closed loop: aantal gebruikers")
+    run.add_argument("--think", type=float, default=0.0,
+                     help="Closed loop: gemiddelde denktijd tussen vragen in seconden")
+    run.add_argument("--duration", type=float, default=30.0, help="Duur van de meting in seconden")
+    run.set_defaults(run=run_load, show=_print_run)
+
+    sweep = subparsers.add_parser("sweep", parents=[common],
+                                  help="Open loop met oplopende rates tot verzadiging")
+    sweep.add_argument("--rates", default="0.5,1,2,4,8", help="Komma-gescheiden rates per seconde")
+    sweep.add_argument("--step-duration", type=float, default=30.0, help="Duur per rate in seconden")
+    sweep.add_argument("--slo", type=float, default=10.0, help="Maximale p95 latency in seconden")
+    sweep.add_argument("--max-error-rate", type=float, default=0.01, help="Maximaal foutpercentage")
+    sweep.set_defaults(run=run_sweep, show=_print_sweep)
+
+    args = parser.parse_args()
+    report = args.run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        args.show(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Fork-server voor de Arxiv MCP servers.
+
+Het parent proces importeert de server module en alle zware dependencies
+(`requests`, `xml.etree`, de `mcp` stack) één keer vooraf en luistert op een
+Unix socket. Voor elke verbinding wordt een worker afgesplitst met `fork()`;
+de worker koppelt de verbinding aan stdin/stdout en draait de gewone stdio
+server. Een nieuwe MCP server kost zo een fork in plaats van een volledige
+Python start met alle imports.
+
+Gebruik:
+    python mcp_forkserver.py --server simple --socket /tmp/arxiv-mcp.sock
+    ARXIV_MCP_FORKSERVER=/tmp/arxiv-mcp.sock python agent_with_mcp_simple.py
+"""
+
+import argparse
+import asyncio
+import importlib
+import inspect
+import os
+import signal
+import socket
+import sys
+import traceback
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+# Modules die het parent proces vooraf importeert, per server variant
+PREWARM_MODULES: Dict[str, List[str]] = {
+    "simple": ["arxiv_mcp_server_simple", "requests", "xml.etree.ElementTree"],
+    "sdk": ["arxiv_mcp_server_sdk", "arxiv_client", "requests", "xml.etree.ElementTree"],
+}
+
+
+def prewarm(server: str):
+    """Importeer de server module en zijn dependencies; retourneer de server module."""
+    modules = [importlib.import_module(name) for name in PREWARM_MODULES[server]]
+    return modules[0]
+
+
+def _run_worker(server_module, conn: socket.socket) -> None:
+    """Draai de stdio server van `server_module` op verbinding `conn` (in de child)."""
+    os.dup2(conn.fileno(), 0)
+    os.dup2(conn.fileno(), 1)
+    conn.close()
+    sys.stdin = open(0, "r", encoding="utf-8", closefd=False)
+    sys.stdout = open(1, "w", encoding="utf-8", closefd=False)
+    # De worker draait altijd met de standaardinstellingen (stdio)
+    sys.argv = [sys.argv[0]]
+
+    if inspect.iscoroutinefunction(server_module.main):
+        asyncio.run(server_module.main())
+    else:
+        server_module.main()
+
+
+def serve(server: str, socket_path: str) -> None:
+    """Start de fork-server en splits een worker af voor elke verbinding."""
+    server_module = prewarm(server)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+
+    # Beëindigde workers automatisch opruimen
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    print(f"Arxiv MCP fork-server ({server}) listening on {socket_path}", file=sys.stderr)
+
+    try:
+        while True:
+            conn, _ = listener.accept()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                exit_code = 0
+                try:
+                    listener.close()
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    signal.signal(signal.SIGINT, signal.SIG_DFL)
+                    _run_worker(server_module, conn)
+                except BaseException:
+                    traceback.print_exc(file=sys.stderr)
+                    exit_code = 1
+                finally:
+                    try:
+                        sys.stdout.flush()
+                    except Exception:
+                        pass
+                    os._exit(exit_code)
+            conn.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+class ForkedServerProcess:
+    """
+    Process handle voor een fork-server worker.
+
+    Biedt de delen van `subprocess.Popen` die de agent gebruikt (`stdin`,
+    `stdout`, `poll`, `terminate`, `wait`, `kill`), zodat een worker een
+    gewone subprocess kan vervangen.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self.stdin = sock.makefile("w", encoding="utf-8", newline="\n")
+        self.stdout = sock.makefile("r", encoding="utf-8", newline="\n")
+        self.returncode: Optional[int] = None
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def terminate(self) -> None:
+        """Sluit de verbinding; de worker stopt bij het einde van zijn stdin."""
+        if self.returncode is not None:
+            return
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        for stream in (self.stdin, self.stdout, self._sock):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        self.returncode = 0
+
+    kill = terminate
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[int]:
+        return self.returncode
+
+
+def connect_forked_server(socket_path: str) -> ForkedServerProcess:
+    """Vraag de fork-server om een nieuwe worker en retourneer zijn handle."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socket_path)
+    return ForkedServerProcess(sock)
+
+
+@asynccontextmanager
+async def forkserver_client(socket_path: str):
+    """
+    MCP client transport voor een fork-server worker met de SDK server.
+
+    Tegenhanger van `mcp.client.stdio.stdio_client`: levert een
+    (read_stream, write_stream) paar voor `ClientSession`.
+    """
+    import anyio
+    from mcp import types
+    from mcp.shared.message import SessionMessage
+
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+    stream = await anyio.connect_unix(socket_path)
+
+    async def socket_reader():
+        async with read_stream_writer:
+            buffer = b""
+            async for chunk in stream:
+                lines = (buffer + chunk).split(b"\n")
+                buffer = lines.pop()
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        message = types.JSONRPCMessage.model_validate_json(line)
+                    except Exception as exc:
+                        await read_stream_writer.send(exc)
+                        continue
+                    await read_stream_writer.send(SessionMessage(message))
+
+    async def socket_writer():
+        async with write_stream_reader:
+            async for session_message in write_stream_reader:
+                json_str = session_message.message.model_dump_json(by_alias=True, exclude_none=True)
+                await stream.send((json_str + "\n").encode("utf-8"))
+
+    async with anyio.create_task_group() as tg, stream:
+        tg.start_soon(socket_reader)
+        tg.start_soon(socket_writer)
+        try:
+            yield read_stream, write_stream
+        finally:
+            tg.cancel_scope.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fork-server voor de Arxiv MCP servers")
+    parser.add_argument("--server", choices=sorted(PREWARM_MODULES), default="simple",
+                        help="Welke MCP server de workers draaien")
+    parser.add_argument("--socket", default=os.getenv("ARXIV_MCP_FORKSERVER", "/tmp/arxiv-mcp.sock"),
+                        help="Pad van de Unix socket")
+    args = parser.parse_args()
+    serve(args.server, args.socket)
+
+
+if __name__ == "__main__":
+    main()
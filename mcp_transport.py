@@ -0,0 +1,185 @@
+"""
+Transport met length-prefixed frames voor het vereenvoudigde MCP protocol.
+
+Naast JSON-regels over stdin/stdout kan de simple server berichten uitwisselen
+over een socket: elk bericht is een frame van 4 bytes lengte (big-endian)
+gevolgd door de geserialiseerde payload. Lezen en schrijven gebeurt met
+asyncio streams, dus zonder thread per bericht, en grote resultaten hoeven
+niet regel voor regel door een pipe.
+
+Serializers: `json` (standaard), en optioneel `orjson` of `msgpack` als die
+packages geïnstalleerd zijn.
+"""
+
+import asyncio
+import json
+import shutil
+import struct
+import subprocess
+from typing import Any, Callable, Dict, NamedTuple, Optional
+from urllib.parse import urlparse
+
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+class Serializer(NamedTuple):
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+def _json_serializer() -> Serializer:
+    return Serializer(
+        "json",
+        lambda obj: json.dumps(obj, separators=(",", ":")).encode("utf-8"),
+        json.loads,
+    )
+
+
+def _orjson_serializer() -> Serializer:
+    import orjson
+    return Serializer("orjson", orjson.dumps, orjson.loads)
+
+
+def _msgpack_serializer() -> Serializer:
+    import msgpack
+    return Serializer(
+        "msgpack",
+        lambda obj: msgpack.packb(obj, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False),
+    )
+
+
+SERIALIZERS: Dict[str, Callable[[], Serializer]] = {
+    "json": _json_serializer,
+    "orjson": _orjson_serializer,
+    "msgpack": _msgpack_serializer,
+}
+
+
+def get_serializer(name: str) -> Serializer:
+    """Geef de serializer met naam `name`."""
+    if name not in SERIALIZERS:
+        raise ValueError(f"Unknown serializer: {name} (choose from {', '.join(SERIALIZERS)})")
+    try:
+        return SERIALIZERS[name]()
+    except ImportError as e:
+        raise ValueError(f"Serializer '{name}' is not available: {e}. Install it with: pip install {name}") from e
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """Lees één frame; retourneer None als de verbinding gesloten is."""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame too large: {length} bytes")
+    return await reader.readexactly(length)
+
+
+def write_frame(writer: asyncio.StreamWriter, payload: bytes) -> None:
+    """Schrijf één frame (header en payload zonder ze samen te voegen)."""
+    writer.writelines([FRAME_HEADER.pack(len(payload)), payload])
+
+
+class FramedConnection:
+    """Een verbinding die berichten als frames verstuurt en ontvangt."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 serializer: Serializer):
+        self.reader = reader
+        self.writer = writer
+        self.serializer = serializer
+        self._lock = asyncio.Lock()
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        write_frame(self.writer, self.serializer.dumps(message))
+        await self.writer.drain()
+
+    async def receive(self) -> Optional[Dict[str, Any]]:
+        payload = await read_frame(self.reader)
+        if payload is None:
+            return None
+        return self.serializer.loads(payload)
+
+    async def request(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Stuur een bericht en wacht op het antwoord."""
+        async with self._lock:
+            await self.send(message)
+            return await self.receive()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+async def open_unix_connection(socket_path: str, serializer: str = "json") -> FramedConnection:
+    """Maak een framed verbinding met een server op een Unix socket."""
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    return FramedConnection(reader, writer, get_serializer(serializer))
+
+
+async def open_connection(url: str, serializer: str = "json") -> FramedConnection:
+    """
+    Maak een framed verbinding met een draaiende server.
+
+    Args:
+        url: `unix:///pad/naar/socket` of `tcp://host:poort`.
+        serializer: Naam van de serializer; moet gelijk zijn aan die van de server.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        return await open_unix_connection(parsed.path, serializer)
+    if parsed.scheme == "tcp":
+        if not parsed.hostname or not parsed.port:
+            raise ValueError(f"Invalid server URL: {url} (expected tcp://host:port)")
+        reader, writer = await asyncio.open_connection(parsed.hostname, parsed.port)
+        return FramedConnection(reader, writer, get_serializer(serializer))
+    raise ValueError(f"Unsupported server URL scheme: {url} (use unix:// or tcp://)")
+
+
+class FramedServerProcess:
+    """
+    Process handle voor een MCP server die via een socket communiceert.
+
+    Combineert het subprocess met zijn `FramedConnection`; biedt dezelfde
+    `poll`/`terminate`/`wait`/`kill` methoden als `subprocess.Popen`. Zonder
+    `process` hoort de verbinding bij een gedeelde server: `terminate` sluit
+    dan alleen de verbinding en laat de server doordraaien.
+    """
+
+    def __init__(self, process: Optional[subprocess.Popen], connection: FramedConnection,
+                 socket_dir: Optional[str] = None):
+        self.process = process
+        self.connection = connection
+        self._socket_dir = socket_dir
+        self._closed = False
+
+    def poll(self) -> Optional[int]:
+        if self.process is None:
+            return 0 if self._closed else None
+        return self.process.poll()
+
+    def _cleanup(self) -> None:
+        self.connection.close()
+        self._closed = True
+        if self._socket_dir:
+            shutil.rmtree(self._socket_dir, ignore_errors=True)
+            self._socket_dir = None
+
+    def terminate(self) -> None:
+        self._cleanup()
+        if self.process is not None:
+            self.process.terminate()
+
+    def kill(self) -> None:
+        self._cleanup()
+        if self.process is not None:
+            self.process.kill()
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if self.process is None:
+            return 0
+        return self.process.wait(timeout=timeout)
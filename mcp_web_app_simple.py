@@ -11,11 +11,17 @@ from typing import Dict, Any
 
 # Importeer dependencies met foutafhandeling
 try:
-    from flask import Flask, render_template, request, jsonify
+    from flask import Flask, render_template, request, jsonify, send_file
     from flask_cors import CORS
     import socketio
     from dotenv import load_dotenv
     from agent_with_mcp_simple import ArxivAgent
+    from metadata_db import get_answer_cache
+    from request_profiler import (SORT_KEYS, list_profiles, new_profile_id, profile_flag,
+                                  profile_path, profile_summary, profiled,
+                                  profiling_authorized)
+    from web_common import (paper_card, paper_collector, papers_blueprint, profile_fields,
+                            profiling_allowed, request_profile_id)
 except ImportError as e:
     print(f"Error importing dependencies: {e}")
     print("\nZorg dat alle benodigde packages zijn geïnstalleerd met:")
@@ -54,6 +60,49 @@ def start_background_loop():
 # Start de event loop thread
 threading.Thread(target=start_background_loop, daemon=True).start()
 
+def run_profiled(query, profile_id, on_papers=None):
+    """
+    Voer een zoekvraag geprofileerd uit (zie request_profiler.py).
+
+    cProfile meet per thread en de gedeelde event loop bedient ook andere
+    verzoeken; een geprofileerde vraag krijgt daarom een eigen event loop in
+    de huidige thread. De MCP server profileert de tool calls onder hetzelfde id.
+    """
+    with profiled(profile_id, "agent"):
+        return asyncio.run(arxiv_agent.run_conversation(query, profile_id=profile_id,
+                                                        on_papers=on_papers, raise_errors=True))
+
+# Gedeeld door alle web app processen (zie metadata_db.py); aan met ARXIV_ANSWER_TTL
+answer_cache = get_answer_cache()
+
+def run_query(query, profile_id=None, on_papers=None):
+    """
+    Voer de agent uit met de query, geprofileerd als er een profile id is.
+
+    Een eerder antwoord op dezelfde vraag komt uit de antwoordcache; een
+    geprofileerd verzoek slaat de cache over, anders valt er niets te meten.
+    `on_papers` krijgt de gevonden papers zodra de agent ze heeft, ook bij
+    een antwoord uit de cache. Een mislukt gesprek geeft een exception en
+    wordt dus nooit gecachet; een antwoord na een mislukte tool call ook niet.
+    """
+    found, collect = paper_collector(on_papers)
+    if profile_id:
+        return run_profiled(query, profile_id, collect)
+    cached = answer_cache.get(query)
+    if cached is not None:
+        if on_papers is not None:
+            papers = answer_cache.get_papers(query)
+            if papers:
+                collect(papers)
+        return cached
+    tool_errors = []
+    response = run_async(arxiv_agent.run_conversation(query, on_papers=collect, raise_errors=True,
+                                                      on_tool_error=tool_errors.append))
+    if not tool_errors:
+        answer_cache.put(query, response)
+        answer_cache.put_papers(query, found)
+    return response
+
 # Agent instantie
 try:
     arxiv_agent = ArxivAgent(openai_api_key)
@@ -62,6 +111,10 @@ except Exception as e:
     traceback.print_exc()
     sys.exit(1)
 
+# Streamen en papers ophalen (zie web_common.py); via de module, zodat
+# serve_web.py `run_query` kan vervangen
+app.register_blueprint(papers_blueprint(lambda *args, **kwargs: run_query(*args, **kwargs)))
+
 @app.route('/')
 def index():
     """Render de hoofdpagina."""
@@ -71,10 +124,13 @@ def index():
 def search():
     """
     API endpoint voor het zoeken naar papers op Arxiv.
-    Verwacht een JSON body met een 'query' veld.
+    Verwacht een JSON body met een 'query' veld. Met `?profile=1` of de header
+    `X-Profile: 1` wordt het verzoek geprofileerd, als de client mag
+    profileren (zie request_profiler.py).
     """
     data = request.json
     query = data.get('query', '')
+    profile_id = request_profile_id()
     
     if not query:
         return jsonify({
@@ -84,11 +140,12 @@ def search():
     
     try:
         # Voer de agent uit met de query
-        response = run_async(arxiv_agent.run_conversation(query))
+        response = run_query(query, profile_id)
         
         return jsonify({
             'success': True,
-            'result': response
+            'result': response,
+            **profile_fields(profile_id)
         })
     except Exception as e:
         print(f"Error processing query: {e}")
@@ -96,9 +153,44 @@ def search():
         
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': str(e),
+            **profile_fields(profile_id)
         }), 500
 
+@app.route('/api/profiles/<profile_id>')
+def get_profile(profile_id):
+    """
+    Overzicht van de profielen van één verzoek, met per component de duurste
+    functies. Optioneel `?sort=tottime` en `?limit=50`. Alleen voor clients
+    die mogen profileren.
+    """
+    components = list_profiles(profile_id) if profiling_allowed() else []
+    if not components:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in SORT_KEYS:
+        return jsonify({'success': False, 'error': f'Unsupported sort key: {sort}'}), 400
+    limit = request.args.get('limit', 25, type=int)
+
+    return jsonify({
+        'success': True,
+        'profile_id': profile_id,
+        'profiles': [{
+            'component': component,
+            'download_url': f'/api/profiles/{profile_id}/{component}',
+            'summary': profile_summary(profile_id, component, sort, limit)
+        } for component in components]
+    })
+
+@app.route('/api/profiles/<profile_id>/<component>')
+def download_profile(profile_id, component):
+    """Download een profiel als .prof bestand (te openen met pstats of snakeviz)."""
+    path = profile_path(profile_id, component) if profiling_allowed() else None
+    if path is None:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'{profile_id}.{component}.prof')
+
 # Socket.IO events
 @sio.event
 def connect(sid, environ):
@@ -119,12 +211,16 @@ def search_query(sid, data):
     if not query:
         sio.emit('error', {'message': 'Missing query parameter'}, room=sid)
         return
+    profile_id = None
+    if profile_flag(str(data.get('profile', ''))) and profiling_authorized(data.get('profile_token')):
+        profile_id = new_profile_id()
     
     def run_search():
         try:
-            # Voer de agent uit met de query
-            response = run_async(arxiv_agent.run_conversation(query))
-            sio.emit('search_results', {'result': response}, room=sid)
+            # Voer de agent uit met de query; papers gaan al vooruit naar de client
+            response = run_query(query, profile_id, on_papers=lambda papers: sio.emit(
+                'papers', {'query': query, 'papers': [paper_card(paper) for paper in papers]}, room=sid))
+            sio.emit('search_results', {'result': response, **profile_fields(profile_id)}, room=sid)
         except Exception as e:
             print(f"Error processing query: {e}")
             traceback.print_exc()
@@ -0,0 +1,494 @@
+"""
+Lokale metadata database (SQLite in WAL modus), gedeeld door alle processen.
+
+Papers, samenvattingen, gecachte antwoorden en (met `ARXIV_SHARED_CACHE=1`)
+Arxiv responses die langer moeten leven dan één
+proces staan in één SQLite bestand (`ARXIV_DB`, standaard in de tempdir). Alle
+MCP servers, de fork-server workers en de web app openen hetzelfde bestand.
+
+- WAL modus: lezers blokkeren schrijvers niet en andersom; veel processen
+  kunnen tegelijk lezen. Er is per proces één schrijfverbinding (achter een
+  lock) en een pool van leesverbindingen, één per gelijktijdige thread.
+- Schrijven gebeurt in batches: `upsert_papers` schrijft een hele feed in één
+  transactie met `executemany`.
+- De SQL staat in vaste strings, zodat `sqlite3` per verbinding de
+  voorbereide statements hergebruikt (`cached_statements`).
+- Opzoeken op id is één primary key lookup (`WITHOUT ROWID` tabellen). Op
+  categorie en datum loopt een index op (categorie,) datum en id, gevolgd
+  door één primary key lookup per gevonden paper.
+- Abstracts en Arxiv responses staan gecomprimeerd in de database (zie
+  `feed_codec.py`); oudere, ongecomprimeerde rijen blijven gewoon leesbaar.
+  Abstracts altijd met zlib, zodat ook processen zonder `zstandard` ze lezen.
+- Vanuit een event loop geeft `get_async_metadata_db()` dezelfde methodes als
+  coroutines, uitgevoerd in een worker thread.
+
+Gevonden papers worden alleen weggeschreven zolang `ARXIV_SAVE_PAPERS` niet
+op 0 staat; de antwoordcache staat pas aan met `ARXIV_ANSWER_TTL`.
+"""
+
+import asyncio
+import json
+import os
+import queue
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from arxiv_client import Paper
+from feed_codec import decode_text, encode_text, readable
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    arxiv_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    authors TEXT NOT NULL,
+    categories TEXT NOT NULL,
+    published TEXT NOT NULL,
+    pdf_url TEXT NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS papers_by_published ON papers (published, arxiv_id);
+
+CREATE TABLE IF NOT EXISTS paper_categories (
+    category TEXT NOT NULL,
+    published TEXT NOT NULL,
+    arxiv_id TEXT NOT NULL,
+    PRIMARY KEY (category, published, arxiv_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS paper_categories_by_id ON paper_categories (arxiv_id);
+
+CREATE TABLE IF NOT EXISTS summaries (
+    arxiv_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (arxiv_id, version)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+"""
+
+_PAPER_COLUMNS = "arxiv_id, version, title, summary, authors, categories, published, pdf_url"
+
+_UPSERT_PAPER = f"""
+INSERT INTO papers ({_PAPER_COLUMNS}, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (arxiv_id) DO UPDATE SET
+    version = excluded.version, title = excluded.title, summary = excluded.summary,
+    authors = excluded.authors, categories = excluded.categories,
+    published = excluded.published, pdf_url = excluded.pdf_url, updated_at = excluded.updated_at
+WHERE excluded.version >= papers.version
+"""
+_DELETE_CATEGORIES = "DELETE FROM paper_categories WHERE arxiv_id = ?"
+_INSERT_CATEGORY = "INSERT OR IGNORE INTO paper_categories (category, published, arxiv_id) VALUES (?, ?, ?)"
+_SELECT_PAPER = f"SELECT {_PAPER_COLUMNS} FROM papers WHERE arxiv_id = ?"
+_SELECT_VERSION = "SELECT version FROM papers WHERE arxiv_id = ?"
+_SELECT_BY_CATEGORY = f"""
+SELECT {_PAPER_COLUMNS} FROM papers WHERE arxiv_id IN (
+    SELECT arxiv_id FROM paper_categories
+    WHERE category = ? AND published >= ? AND published < ?
+    ORDER BY published DESC LIMIT ?
+) ORDER BY published DESC
+"""
+_SELECT_BY_PUBLISHED = f"""
+SELECT {_PAPER_COLUMNS} FROM papers
+WHERE published >= ? AND published < ? ORDER BY published DESC LIMIT ?
+"""
+_SELECT_SUMMARY = "SELECT summary FROM summaries WHERE arxiv_id = ? AND version = ?"
+_UPSERT_SUMMARY = "INSERT OR REPLACE INTO summaries (arxiv_id, version, summary) VALUES (?, ?, ?)"
+_SELECT_CACHE = "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?"
+_UPSERT_CACHE = "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)"
+_PRUNE_CACHE = "DELETE FROM cache WHERE expires_at <= ?"
+
+# Ondergrens en bovengrens voor datums in ISO formaat
+_MIN_DATE, _MAX_DATE = "0000", "9999"
+# Achter een prefix geplakt: alles wat met de prefix begint is kleiner
+_DATE_END = "\uffff"
+_SPACES = re.compile(r"\s+")
+
+# Hoe vaak (in seconden) een schrijvend proces verlopen cache regels opruimt
+PRUNE_INTERVAL = 600.0
+
+
+def db_path() -> str:
+    """Pad van de database; gedeeld met de MCP servers via de environment."""
+    return os.getenv("ARXIV_DB") or os.path.join(tempfile.gettempdir(), "arxiv-metadata.db")
+
+
+def _paper_row(paper: Paper, now: float) -> tuple:
+    return (paper.arxiv_id, paper.version, paper.title, encode_text(paper.summary),
+            json.dumps(paper.authors, ensure_ascii=False), json.dumps(paper.categories),
+            paper.published, paper.pdf_url, now)
+
+
+def _row_paper(row: tuple) -> Optional[Paper]:
+    arxiv_id, version, title, summary, authors, categories, published, pdf_url = row
+    try:
+        summary = decode_text(summary)
+    except ValueError:
+        # Een zstd abstract uit een oudere versie, in een proces zonder zstandard:
+        # telt als niet gevonden, en de paper wordt bij de volgende zoekopdracht overschreven
+        return None
+    return Paper.from_dict({
+        "arxiv_id": arxiv_id, "version": version, "title": title, "summary": summary,
+        "authors": json.loads(authors), "categories": json.loads(categories),
+        "published": published, "pdf_url": pdf_url,
+    })
+
+
+def _row_papers(rows: Iterable[tuple]) -> List[Paper]:
+    papers = (_row_paper(row) for row in rows)
+    return [paper for paper in papers if paper is not None]
+
+
+class MetadataDB:
+    """
+    Thread-safe toegang tot de database, met een pool van leesverbindingen.
+
+    Na een `fork` (fork-server, meerdere web workers) maakt het child proces
+    eigen verbindingen; SQLite verbindingen mogen niet over een fork heen
+    gedeeld worden.
+    """
+
+    def __init__(self, path: Optional[str] = None, pool_size: int = 8, timeout: float = 10.0):
+        """
+        Args:
+            path: Pad van het databasebestand; standaard `db_path()`.
+            pool_size: Maximaal aantal leesverbindingen in de pool. Meer
+                gelijktijdige lezers krijgen een tijdelijke verbinding.
+            timeout: Hoe lang (in seconden) een schrijver wacht op de
+                schrijflock van een ander proces.
+        """
+        self.path = path or db_path()
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._pruned_at = 0.0
+        self._reset()
+        conn = self._connect()
+        try:
+            # `executescript` beheert zijn eigen transactie; CREATE ... IF NOT
+            # EXISTS maakt gelijktijdig starten door meerdere processen veilig
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                conn.executescript(SCHEMA)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        finally:
+            conn.close()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._write_lock = threading.Lock()
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._open_readers = 0
+        self._pool_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+
+    def _check_fork(self) -> None:
+        if os.getpid() != self._pid:
+            # Verbindingen van de parent niet sluiten: dat zou ook zijn bestandslocks raken
+            self._reset()
+
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        # isolation_level=None: transacties expliciet met BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=128)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA mmap_size = 268435456")
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def reading(self) -> Iterator[sqlite3.Connection]:
+        """Een leesverbinding uit de pool (of een nieuwe als de pool leeg is)."""
+        self._check_fork()
+        pooled = True
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                pooled = self._open_readers < self.pool_size
+                if pooled:
+                    self._open_readers += 1
+            conn = self._connect(readonly=True)
+        try:
+            yield conn
+        finally:
+            if pooled:
+                self._readers.put(conn)
+            else:
+                conn.close()
+
+    @contextmanager
+    def _writing(self) -> Iterator[sqlite3.Connection]:
+        """De schrijfverbinding van dit proces, binnen één transactie."""
+        self._check_fork()
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            # IMMEDIATE: de schrijflock direct nemen in plaats van halverwege
+            # de transactie te moeten upgraden (en dan SQLITE_BUSY te krijgen)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        self._check_fork()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+        self._reset()
+
+    # Papers
+
+    def upsert_papers(self, papers: Sequence[Paper]) -> int:
+        """
+        Voeg papers toe of werk ze bij, in één transactie.
+
+        Een oudere versie overschrijft nooit een nieuwere. Retourneert het
+        aantal papers dat is toegevoegd of bijgewerkt.
+        """
+        if not papers:
+            return 0
+        now = time.time()
+        with self._writing() as conn:
+            newer = []
+            for paper in papers:
+                row = conn.execute(_SELECT_VERSION, (paper.arxiv_id,)).fetchone()
+                if row is None or paper.version >= row[0]:
+                    newer.append(paper)
+            conn.executemany(_UPSERT_PAPER, [_paper_row(paper, now) for paper in newer])
+            conn.executemany(_DELETE_CATEGORIES, [(paper.arxiv_id,) for paper in newer])
+            conn.executemany(_INSERT_CATEGORY, [
+                (category, paper.published, paper.arxiv_id)
+                for paper in newer for category in set(paper.categories)
+            ])
+        return len(newer)
+
+    def get_paper(self, arxiv_id: str) -> Optional[Paper]:
+        with self.reading() as conn:
+            row = conn.execute(_SELECT_PAPER, (arxiv_id,)).fetchone()
+        return None if row is None else _row_paper(row)
+
+    def get_papers(self, arxiv_ids: Iterable[str]) -> Dict[str, Paper]:
+        with self.reading() as conn:
+            rows = [conn.execute(_SELECT_PAPER, (arxiv_id,)).fetchone() for arxiv_id in arxiv_ids]
+        papers = (_row_paper(row) for row in rows if row is not None)
+        return {paper.arxiv_id: paper for paper in papers if paper is not None}
+
+    def papers_by_category(self, category: str, published_from: Optional[str] = None,
+                           published_to: Optional[str] = None, limit: int = 50) -> List[Paper]:
+        """
+        De nieuwste papers in `category`, optioneel binnen een periode.
+
+        `published_from` en `published_to` zijn ISO datums of prefixen
+        daarvan (`2023`, `2023-06`); beide inclusief.
+        """
+        low, high = published_from or _MIN_DATE, (published_to or _MAX_DATE) + _DATE_END
+        with self.reading() as conn:
+            rows = conn.execute(_SELECT_BY_CATEGORY, (category, low, high, limit)).fetchall()
+        return _row_papers(rows)
+
+    def papers_by_published(self, published_from: Optional[str] = None,
+                            published_to: Optional[str] = None, limit: int = 50) -> List[Paper]:
+        """De nieuwste papers binnen een periode (zie `papers_by_category`)."""
+        low, high = published_from or _MIN_DATE, (published_to or _MAX_DATE) + _DATE_END
+        with self.reading() as conn:
+            rows = conn.execute(_SELECT_BY_PUBLISHED, (low, high, limit)).fetchall()
+        return _row_papers(rows)
+
+    # Samenvattingen
+
+    def get_summaries(self, keys: Iterable[Tuple[str, int]]) -> Dict[Tuple[str, int], str]:
+        with self.reading() as conn:
+            found = {key: conn.execute(_SELECT_SUMMARY, key).fetchone() for key in keys}
+        return {key: row[0] for key, row in found.items() if row is not None}
+
+    def put_summaries(self, summaries: Dict[Tuple[str, int], str]) -> None:
+        if not summaries:
+            return
+        with self._writing() as conn:
+            conn.executemany(_UPSERT_SUMMARY, [(key[0], key[1], summary)
+                                               for key, summary in summaries.items()])
+
+    # Cache met verlooptijd
+
+    def cache_get(self, namespace: str, key: str) -> Optional[Any]:
+        with self.reading() as conn:
+            row = conn.execute(_SELECT_CACHE, (namespace, key, time.time())).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def cache_put(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        with self._writing() as conn:
+            conn.execute(_UPSERT_CACHE, (namespace, key, json.dumps(value), time.time() + ttl))
+            self._maybe_prune(conn)
+
+    def blob_get(self, namespace: str, key: str) -> Optional[bytes]:
+        """Als `cache_get`, voor ruwe bytes in plaats van JSON."""
+        with self.reading() as conn:
+            row = conn.execute(_SELECT_CACHE, (namespace, key, time.time())).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def blob_put(self, namespace: str, key: str, value: bytes, ttl: float) -> None:
+        with self._writing() as conn:
+            conn.execute(_UPSERT_CACHE, (namespace, key, sqlite3.Binary(value), time.time() + ttl))
+            self._maybe_prune(conn)
+
+    def _maybe_prune(self, conn: sqlite3.Connection) -> None:
+        now = time.time()
+        if now - self._pruned_at > PRUNE_INTERVAL:
+            self._pruned_at = now
+            conn.execute(_PRUNE_CACHE, (now,))
+
+
+class AsyncMetadataDB:
+    """De methodes van `MetadataDB` als coroutines, uitgevoerd in een worker thread."""
+
+    def __init__(self, db: MetadataDB):
+        self.db = db
+
+    def __getattr__(self, name: str):
+        method = getattr(self.db, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        call.__name__ = name
+        call.__doc__ = method.__doc__
+        return call
+
+
+class AnswerCache:
+    """
+    Antwoorden van de agent per vraag, gedeeld door alle web app processen.
+
+    Vragen die alleen in hoofdletters of witruimte verschillen delen een antwoord.
+    """
+
+    namespace = "answers"
+    papers_namespace = "answer_papers"
+
+    def __init__(self, db: MetadataDB, ttl: float):
+        self.db = db
+        self.ttl = ttl
+
+    @staticmethod
+    def key(query: str) -> str:
+        return _SPACES.sub(" ", query).strip().lower()
+
+    def get(self, query: str) -> Optional[str]:
+        if self.ttl <= 0:
+            return None
+        return self.db.cache_get(self.namespace, self.key(query))
+
+    def put(self, query: str, answer: str) -> None:
+        if self.ttl > 0 and answer:
+            self.db.cache_put(self.namespace, self.key(query), answer, self.ttl)
+
+    def get_papers(self, query: str) -> List[Paper]:
+        """De papers die bij het gecachte antwoord op `query` hoorden, uit de papers tabel."""
+        if self.ttl <= 0:
+            return []
+        arxiv_ids = self.db.cache_get(self.papers_namespace, self.key(query)) or []
+        found = self.db.get_papers(arxiv_ids)
+        return [found[arxiv_id] for arxiv_id in arxiv_ids if arxiv_id in found]
+
+    def put_papers(self, query: str, papers: Sequence[Paper]) -> None:
+        """Bewaar alleen de ids; de papers zelf staan al in de papers tabel."""
+        if self.ttl > 0 and papers:
+            self.db.cache_put(self.papers_namespace, self.key(query),
+                              [paper.arxiv_id for paper in papers], self.ttl)
+
+
+class SharedResponseCache:
+    """
+    Arxiv responses voor alle processen, als tweede niveau achter de
+    `response_cache` van `arxiv_client` (zie `arxiv_client.shared_response_cache`).
+    """
+
+    namespace = "arxiv"
+
+    def __init__(self, db: MetadataDB, ttl: float):
+        self.db = db
+        self.ttl = ttl
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        try:
+            value = self.db.blob_get(self.namespace, repr(key))
+        except sqlite3.Error:
+            return None
+        # Een proces met zstd kan hem geschreven hebben; dan telt hij hier als niet gevonden
+        return value if value is None or readable(value) else None
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        try:
+            self.db.blob_put(self.namespace, repr(key), value, self.ttl)
+        except sqlite3.Error as e:
+            print(f"Sharing an Arxiv response failed: {e}", file=sys.stderr)
+
+
+def saving_enabled() -> bool:
+    """Of gevonden papers naar de database gaan; `ARXIV_SAVE_PAPERS=0` zet het uit."""
+    return os.getenv("ARXIV_SAVE_PAPERS", "1").lower() not in ("0", "false", "no")
+
+
+def save_papers(papers: Sequence[Paper]) -> None:
+    """
+    Schrijf papers weg voor andere processen; een fout wordt alleen gemeld.
+
+    Doet niets als `saving_enabled()` False is.
+    """
+    if not papers or not saving_enabled():
+        return
+    try:
+        get_metadata_db().upsert_papers(papers)
+    except sqlite3.Error as e:
+        print(f"Saving {len(papers)} papers failed: {e}", file=sys.stderr)
+
+
+_db: Optional[MetadataDB] = None
+_db_lock = threading.Lock()
+
+
+def get_metadata_db() -> MetadataDB:
+    """De database van dit proces, in `db_path()`."""
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = MetadataDB(pool_size=int(os.getenv("ARXIV_DB_POOL", "8")))
+        return _db
+
+
+def get_async_metadata_db() -> AsyncMetadataDB:
+    return AsyncMetadataDB(get_metadata_db())
+
+
+def get_answer_cache() -> AnswerCache:
+    """Antwoorden blijven `ARXIV_ANSWER_TTL` seconden geldig (standaard 0: geen cache)."""
+    return AnswerCache(get_metadata_db(), float(os.getenv("ARXIV_ANSWER_TTL", "0")))
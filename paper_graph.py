@@ -0,0 +1,271 @@
+"""
+Graaf van verwante papers met voorberekende buren.
+
+Een veelgestelde vervolgvraag is "wat is er nog meer verwant aan deze paper".
+In plaats van nieuwe zoekopdrachten op Arxiv bouwt `RelatedIndex` op de
+achtergrond een graaf over de papers in de lokale `PaperStore`, met kanten voor:
+
+- gedeelde auteurs;
+- inhoudelijke gelijkenis: overlap van kenmerkende termen uit titel en
+  abstract, gewogen met IDF (een lichte, lokale vervanger voor embeddings);
+- gedeelde categorieën (kleine bonus, en aanvulling als er weinig buren zijn).
+
+Per paper worden de `k` beste buren vooraf berekend en opgeslagen in CSR vorm
+(`indptr`, `indices`, `weights` als compacte arrays), zodat opzoeken één slice
+is. Papers die na de laatste opbouw zijn toegevoegd krijgen hun buren op het
+moment van opvragen, tot de volgende opbouw.
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from arxiv_client import Paper
+from paper_store import PaperStore, get_paper_store, normalize_author
+
+AUTHOR_WEIGHT = 1.0
+TEXT_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.1
+
+# Termen of auteurs in meer papers dan dit onderscheiden niet en maken de
+# kandidatenlijst alleen groter
+MAX_DF = 50
+SUMMARY_TERMS = 8
+
+_TERM = re.compile(r"[a-z][a-z0-9-]{2,}")
+STOPWORDS = frozenset("""
+    about above across after also among an and any approach are based been being between both
+    but can could does each for from further has have here however into its large method methods
+    model models more most new not novel our over paper problem propose proposed results show
+    shows such than that the their them then there these this those through two under use used
+    using via was we were which while with within without work
+""".split())
+
+
+def normalize_arxiv_id(value: str) -> str:
+    """`2301.01234v2`, `arXiv:2301.01234` of een abs/pdf URL naar `2301.01234`."""
+    value = value.strip().rsplit("/abs/", 1)[-1].rsplit("/pdf/", 1)[-1]
+    if value.lower().startswith("arxiv:"):
+        value = value[6:]
+    return re.sub(r"(v\d+)?(\.pdf)?$", "", value)
+
+
+def salient_terms(paper: Paper) -> Tuple[str, ...]:
+    """De termen uit de titel plus de vaakst gebruikte termen uit de abstract."""
+    title = {term for term in _TERM.findall(paper.title.lower()) if term not in STOPWORDS}
+    summary = Counter(term for term in _TERM.findall(paper.summary.lower())
+                      if term not in STOPWORDS and term not in title)
+    return tuple(title) + tuple(term for term, _ in summary.most_common(SUMMARY_TERMS))
+
+
+class NeighbourFinder:
+    """Postings over een vaste set papers, waarmee de buren van een paper te berekenen zijn."""
+
+    def __init__(self, papers: Sequence[Paper], max_df: int = MAX_DF, fill: int = 10):
+        self.papers = list(papers)
+        self.max_df = max_df
+        self.rows: Dict[str, int] = {paper.arxiv_id: row for row, paper in enumerate(self.papers)}
+        self.author_postings: Dict[str, List[int]] = defaultdict(list)
+        self.term_postings: Dict[str, List[int]] = defaultdict(list)
+        by_category: Dict[str, List[int]] = defaultdict(list)
+
+        for row, paper in enumerate(self.papers):
+            for author in {normalize_author(name) for name in paper.authors}:
+                self.author_postings[author].append(row)
+            for term in salient_terms(paper):
+                self.term_postings[term].append(row)
+            if paper.categories:
+                by_category[paper.categories[0]].append(row)
+
+        count = len(self.papers) + 1
+        self.idf = {term: math.log(count / len(rows)) for term, rows in self.term_postings.items()}
+        # Per primaire categorie de nieuwste papers, om dunne buurten aan te vullen
+        self.recent_by_category = {
+            category: heapq.nlargest(fill, rows, key=lambda row: self.papers[row].published)
+            for category, rows in by_category.items()
+        }
+
+    def neighbours(self, paper: Paper, k: int) -> List[Tuple[int, float]]:
+        """De `k` beste buren van `paper` als (rij, score), beste eerst."""
+        scores: Dict[int, float] = defaultdict(float)
+        for author in {normalize_author(name) for name in paper.authors}:
+            rows = self.author_postings.get(author, ())
+            if len(rows) <= self.max_df:
+                for row in rows:
+                    scores[row] += AUTHOR_WEIGHT
+
+        terms = [term for term in salient_terms(paper)
+                 if 0 < len(self.term_postings.get(term, ())) <= self.max_df]
+        norm = sum(self.idf[term] for term in terms) or 1.0
+        for term in terms:
+            weight = TEXT_WEIGHT * self.idf[term] / norm
+            for row in self.term_postings[term]:
+                scores[row] += weight
+
+        categories = set(paper.categories)
+        if len(scores) <= k and paper.categories:
+            for row in self.recent_by_category.get(paper.categories[0], ()):
+                scores.setdefault(row, 0.0)
+        for row in scores:
+            shared = categories.intersection(self.papers[row].categories)
+            scores[row] += CATEGORY_WEIGHT * len(shared)
+
+        scores.pop(self.rows.get(paper.arxiv_id, -1), None)
+        return heapq.nlargest(k, scores.items(), key=itemgetter(1))
+
+
+class RelatedGraph:
+    """
+    De top-k buren van elke paper in CSR vorm.
+
+    Rij `i` staat in `indices[indptr[i]:indptr[i + 1]]`, met de bijbehorende
+    scores in `weights`; beste buur eerst.
+    """
+
+    def __init__(self, finder: NeighbourFinder, k: int, precompute: bool = True):
+        """
+        Args:
+            finder: Postings over de papers van deze graaf.
+            k: Aantal buren per paper.
+            precompute: Zonder voorberekening worden alle buren bij het
+                opvragen berekend (direct bruikbaar, maar trager per lookup).
+        """
+        self.finder = finder
+        self.k = k
+        self.precomputed = precompute
+        self.indptr = array("I", [0])
+        self.indices = array("I")
+        self.weights = array("f")
+        if precompute:
+            for paper in finder.papers:
+                for row, score in finder.neighbours(paper, k):
+                    self.indices.append(row)
+                    self.weights.append(score)
+                self.indptr.append(len(self.indices))
+
+    @classmethod
+    def build(cls, papers: Sequence[Paper], k: int = 10) -> "RelatedGraph":
+        return cls(NeighbourFinder(papers), k)
+
+    def __len__(self) -> int:
+        return len(self.finder.papers)
+
+    def neighbours(self, paper: Paper, limit: int) -> List[Tuple[Paper, float]]:
+        """Voorberekende buren als de paper in de graaf zit, anders nu berekend."""
+        row = self.finder.rows.get(paper.arxiv_id)
+        papers = self.finder.papers
+        if row is None or not self.precomputed:
+            return [(papers[other], score) for other, score in self.finder.neighbours(paper, limit)]
+        start, end = self.indptr[row], min(self.indptr[row + 1], self.indptr[row] + limit)
+        return [(papers[self.indices[i]], self.weights[i]) for i in range(start, end)]
+
+
+class RelatedIndex:
+    """
+    Houdt een `RelatedGraph` bij over de papers in een `PaperStore`.
+
+    Is de store sinds de laatste opbouw met meer dan `growth` gegroeid, dan
+    wordt de graaf op de achtergrond opnieuw opgebouwd (hooguit eens per
+    `min_interval` seconden); tot die tijd blijft de vorige graaf in gebruik.
+    """
+
+    def __init__(self, store: PaperStore, k: int = 10, growth: float = 0.1, min_interval: float = 30.0):
+        self.store = store
+        self.k = k
+        self.growth = growth
+        self.min_interval = min_interval
+        self._graph: Optional[RelatedGraph] = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self._building = False
+
+    def graph(self) -> RelatedGraph:
+        """
+        De huidige graaf.
+
+        De eerste keer worden alleen de postings synchroon opgebouwd (snel),
+        zodat er direct antwoord is; de buren worden op de achtergrond vooraf berekend.
+        """
+        if self._graph is None:
+            with self._lock:
+                if self._graph is None:
+                    finder = NeighbourFinder(self.store.snapshot())
+                    self._graph = RelatedGraph(finder, self.k, precompute=False)
+        if self._stale():
+            self._start_rebuild()
+        return self._graph
+
+    def _stale(self) -> bool:
+        graph = self._graph
+        if not graph.precomputed:
+            return True
+        return (len(self.store) > len(graph) * (1 + self.growth)
+                and time.monotonic() - self._built_at > self.min_interval)
+
+    def _start_rebuild(self) -> None:
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._rebuild, name="related-graph", daemon=True).start()
+
+    def _rebuild(self) -> None:
+        try:
+            graph = RelatedGraph.build(self.store.snapshot(), self.k)
+            self._graph, self._built_at = graph, time.monotonic()
+        finally:
+            self._building = False
+
+    def related(self, arxiv_id: str, limit: int = 5) -> Optional[List[Tuple[Paper, float]]]:
+        """Verwante papers van `arxiv_id`, of None als de paper niet lokaal bekend is."""
+        paper = self.store.get(arxiv_id)
+        if paper is None:
+            return None
+        return self.graph().neighbours(paper, limit)
+
+
+def find_related_papers(arxiv_id: str, max_results: int = 5) -> Tuple[Optional[Paper], List[Paper]]:
+    """
+    De paper zelf en zijn verwante papers.
+
+    Staat de paper nog niet in de lokale store, dan wordt die ene paper uit de
+    metadata database gehaald, of anders bij Arxiv; de buren komen altijd uit
+    de lokale graaf.
+    """
+    from arxiv_client import search_papers
+    from metadata_db import get_metadata_db, save_papers
+
+    arxiv_id = normalize_arxiv_id(arxiv_id)
+    index = get_related_index()
+    related = index.related(arxiv_id, max_results)
+    if related is None:
+        paper = get_metadata_db().get_paper(arxiv_id)
+        if paper is not None:
+            found = [paper]
+        else:
+            found = [paper for paper in search_papers(f"id:{arxiv_id}", 1) if paper.arxiv_id == arxiv_id]
+            if not found:
+                return None, []
+            save_papers(found)
+        index.store.add(found)
+        related = index.related(arxiv_id, max_results) or []
+    return index.store.get(arxiv_id), [paper for paper, _ in related]
+
+
+_index: Optional[RelatedIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_related_index() -> RelatedIndex:
+    """De graaf van dit proces, over `get_paper_store()`."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = RelatedIndex(get_paper_store())
+        return _index
@@ -0,0 +1,373 @@
+"""
+Lokale opslag van gevonden papers met facet-indexen.
+
+Elke paper die een server vindt of prefetcht komt in de `PaperStore` en krijgt
+een document nummer. Per categorie, auteur en publicatiemaand houdt de store
+bij welke documenten erbij horen. Een zoekopdracht met filters (bijvoorbeeld
+`categories=["cs.LG"]`, `published_from="2023-01"`) snijdt die verzamelingen
+eerst door en rangschikt daarna alleen de overgebleven papers.
+
+Postings zijn, net als in roaring bitmaps, adaptief: een waarde met weinig
+documenten (de meeste auteurs) is een `set`; een waarde die vaak voorkomt
+(categorieën, maanden) wordt een bitmap in één Python `int`, waarvan `&` en `|`
+in C over machinewoorden lopen.
+"""
+
+import heapq
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+from arxiv_client import Paper, build_search_query, search_papers
+
+_MONTH = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+# Arxiv categorieën zoals `cs.LG`, `hep-th` en `cond-mat.stat-mech`
+_CATEGORY = re.compile(r"^[A-Za-z][A-Za-z-]*(\.[A-Za-z-]+)?$")
+_WORD = re.compile(r"\w+")
+_SPACES = re.compile(r"\s+")
+
+# Een set of een bitmap (bit i staat voor document i)
+Posting = Union[Set[int], int]
+
+
+def iter_bits(bitmap: int) -> Iterator[int]:
+    """De nummers van de gezette bits, laagste eerst."""
+    # Via de binaire string: het zoeken naar enen gebeurt dan in C
+    bits = bin(bitmap)[:1:-1]
+    position = bits.find("1")
+    while position != -1:
+        yield position
+        position = bits.find("1", position + 1)
+
+
+def _cardinality(posting: Posting) -> int:
+    return posting.bit_count() if isinstance(posting, int) else len(posting)
+
+
+def _members(posting: Posting) -> Iterable[int]:
+    return iter_bits(posting) if isinstance(posting, int) else posting
+
+
+def _to_bitmap(docs: Iterable[int]) -> int:
+    bitmap = 0
+    for doc in docs:
+        bitmap |= 1 << doc
+    return bitmap
+
+
+def _and(a: Posting, b: Posting) -> Posting:
+    if isinstance(a, int) and isinstance(b, int):
+        return a & b
+    if isinstance(a, set) and isinstance(b, set):
+        return a & b
+    docs, bitmap = (a, b) if isinstance(a, set) else (b, a)
+    return {doc for doc in docs if bitmap >> doc & 1}
+
+
+def _or(a: Posting, b: Posting) -> Posting:
+    if isinstance(a, set) and isinstance(b, set):
+        return a | b
+    return (a if isinstance(a, int) else _to_bitmap(a)) | (b if isinstance(b, int) else _to_bitmap(b))
+
+
+def intersect(postings: Sequence[Posting]) -> Posting:
+    """Doorsnede van postings, kleinste eerst zodat het tussenresultaat klein blijft."""
+    ordered = sorted(postings, key=_cardinality)
+    result = ordered[0]
+    for posting in ordered[1:]:
+        if not result:
+            break
+        result = _and(result, posting)
+    return result
+
+
+def normalize_author(name: str) -> str:
+    return _SPACES.sub(" ", name).strip().lower()
+
+
+class FacetIndex:
+    """Postings per waarde van één facet."""
+
+    def __init__(self, dense_threshold: int):
+        """
+        Args:
+            dense_threshold: Vanaf dit aantal documenten wordt een set een bitmap.
+        """
+        self.dense_threshold = dense_threshold
+        self._postings: Dict[str, Posting] = {}
+
+    def add(self, value: str, doc: int) -> None:
+        posting = self._postings.get(value)
+        if posting is None:
+            self._postings[value] = {doc}
+        elif isinstance(posting, int):
+            self._postings[value] = posting | (1 << doc)
+        else:
+            posting.add(doc)
+            if len(posting) >= self.dense_threshold:
+                self._postings[value] = _to_bitmap(posting)
+
+    def remove(self, value: str, doc: int) -> None:
+        posting = self._postings.get(value)
+        if posting is None:
+            return
+        if isinstance(posting, int):
+            posting &= ~(1 << doc)
+            self._postings[value] = posting
+        else:
+            posting.discard(doc)
+        if not posting:
+            del self._postings[value]
+
+    def union(self, values: Iterable[str]) -> Optional[Posting]:
+        """Alle documenten met een van `values`; None als geen enkele waarde voorkomt."""
+        result = None
+        for value in values:
+            posting = self._postings.get(value)
+            if posting is not None:
+                result = posting if result is None else _or(result, posting)
+        return result
+
+    def values(self) -> List[str]:
+        return list(self._postings)
+
+    def counts(self) -> Dict[str, int]:
+        return {value: _cardinality(posting) for value, posting in self._postings.items()}
+
+
+class Facets(NamedTuple):
+    """Filters voor een zoekopdracht; binnen een facet OF, tussen facets EN."""
+
+    categories: Tuple[str, ...] = ()
+    authors: Tuple[str, ...] = ()
+    published_from: Optional[str] = None  # YYYY-MM, inclusief
+    published_to: Optional[str] = None    # YYYY-MM, inclusief
+
+    @property
+    def active(self) -> bool:
+        return bool(self.categories or self.authors or self.published_from or self.published_to)
+
+
+def _facet_values(name: str, values) -> Tuple[str, ...]:
+    # Een losse string (die het model soms stuurt) is één waarde, geen reeks tekens
+    if values is None:
+        return ()
+    if isinstance(values, str):
+        values = [values]
+    if not isinstance(values, (list, tuple)) or not all(isinstance(value, str) for value in values):
+        raise ValueError(f"Invalid {name}: expected a list of strings")
+    return tuple(value.strip() for value in values if value.strip())
+
+
+def parse_facets(categories: Optional[Sequence[str]] = None, authors: Optional[Sequence[str]] = None,
+                 published_from: Optional[str] = None, published_to: Optional[str] = None) -> Facets:
+    """
+    Controleer en normaliseer facet filters uit een tool call.
+
+    `categories` en `authors` zijn lijsten van strings; een losse string telt
+    als lijst van één. Raises ValueError bij ongeldige filters.
+    """
+    for month in (published_from, published_to):
+        if month and not (isinstance(month, str) and _MONTH.match(month)):
+            raise ValueError(f"Invalid month: {month} (expected YYYY-MM)")
+    categories = _facet_values("categories", categories)
+    for category in categories:
+        if not _CATEGORY.match(category):
+            raise ValueError(f"Invalid category: {category} (expected e.g. cs.LG)")
+    return Facets(
+        categories=categories,
+        authors=_facet_values("authors", authors),
+        published_from=published_from or None,
+        published_to=published_to or None,
+    )
+
+
+class PaperStore:
+    """
+    Papers met facet-indexen op categorie, auteur en publicatiemaand.
+
+    Thread-safe; bij meer dan `max_size` papers verdwijnt de paper die het
+    langst niet is gezien, en wordt zijn document nummer hergebruikt.
+    """
+
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        # Vanaf ~1/256 van de capaciteit is een bitmap kleiner en sneller dan een set
+        dense_threshold = max(64, max_size // 256)
+        self.categories = FacetIndex(dense_threshold)
+        self.authors = FacetIndex(dense_threshold)
+        self.months = FacetIndex(dense_threshold)
+        self._docs: Dict[int, Paper] = {}
+        self._ids: "OrderedDict[str, int]" = OrderedDict()
+        self._free: List[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def get(self, arxiv_id: str) -> Optional[Paper]:
+        with self._lock:
+            doc = self._ids.get(arxiv_id)
+            return None if doc is None else self._docs[doc]
+
+    def snapshot(self) -> List[Paper]:
+        """Alle papers op dit moment, voor indexen die apart worden opgebouwd."""
+        with self._lock:
+            return list(self._docs.values())
+
+    def add(self, papers: Iterable[Paper]) -> None:
+        """Voeg papers toe of werk ze bij naar een nieuwere versie."""
+        with self._lock:
+            for paper in papers:
+                doc = self._ids.get(paper.arxiv_id)
+                if doc is not None:
+                    self._ids.move_to_end(paper.arxiv_id)
+                    current = self._docs[doc]
+                    if paper.version <= current.version:
+                        continue
+                    self._unindex(doc, current)
+                else:
+                    if len(self._ids) >= self.max_size:
+                        self._evict()
+                    doc = self._free.pop() if self._free else len(self._docs)
+                    self._ids[paper.arxiv_id] = doc
+                self._docs[doc] = paper
+                self._index(doc, paper)
+
+    def _evict(self) -> None:
+        _, doc = self._ids.popitem(last=False)
+        self._unindex(doc, self._docs.pop(doc))
+        self._free.append(doc)
+
+    def _index(self, doc: int, paper: Paper) -> None:
+        for category in set(paper.categories):
+            self.categories.add(category, doc)
+        for author in {normalize_author(name) for name in paper.authors}:
+            self.authors.add(author, doc)
+        if _MONTH.match(paper.published[:7]):
+            self.months.add(paper.published[:7], doc)
+
+    def _unindex(self, doc: int, paper: Paper) -> None:
+        for category in set(paper.categories):
+            self.categories.remove(category, doc)
+        for author in {normalize_author(name) for name in paper.authors}:
+            self.authors.remove(author, doc)
+        self.months.remove(paper.published[:7], doc)
+
+    def match(self, facets: Facets) -> Posting:
+        """De documenten die aan alle filters voldoen (alle documenten zonder filters)."""
+        with self._lock:
+            postings = []
+            for index, values in ((self.categories, facets.categories),
+                                  (self.authors, [normalize_author(name) for name in facets.authors])):
+                if values:
+                    posting = index.union(values)
+                    if posting is None:
+                        return set()
+                    postings.append(posting)
+
+            if facets.published_from or facets.published_to:
+                low, high = facets.published_from or "0000-00", facets.published_to or "9999-99"
+                posting = self.months.union(month for month in self.months.values() if low <= month <= high)
+                if posting is None:
+                    return set()
+                postings.append(posting)
+
+            if not postings:
+                return set(self._docs)
+            result = intersect(postings)
+            # Een set kan een posting van de index zelf zijn: kopiëren buiten de lock
+            return set(result) if isinstance(result, set) else result
+
+    def count(self, facets: Facets) -> int:
+        return _cardinality(self.match(facets))
+
+    def search(self, query: str, facets: Facets, limit: int = 10) -> List[Paper]:
+        """
+        Papers die aan `facets` voldoen, gerangschikt op `query`.
+
+        Score: aantal zoektermen in de titel (dubbel) en de abstract; bij
+        gelijke score de nieuwste eerst. Papers zonder enkele zoekterm vallen af,
+        tenzij de query leeg is.
+        """
+        candidates = self.match(facets)
+        with self._lock:
+            papers = [self._docs[doc] for doc in _members(candidates) if doc in self._docs]
+
+        terms = set(_WORD.findall(query.lower()))
+        scored = []
+        for paper in papers:
+            title, summary = paper.title.lower(), paper.summary.lower()
+            score = sum(2 * (term in title) + (term in summary) for term in terms)
+            if score or not terms:
+                scored.append((score, paper.published, paper))
+        best = heapq.nlargest(limit, scored, key=lambda item: (item[0], item[1]))
+        return [paper for _, _, paper in best]
+
+
+def facet_query(query: str, facets: Facets) -> str:
+    """De Arxiv API zoekopdracht voor `query` met dezelfde filters als `facets`."""
+    parts = [f"({build_search_query(query)})"]
+    if facets.categories:
+        parts.append("(" + " OR ".join(f"cat:{category}" for category in facets.categories) + ")")
+    # Een Arxiv zoekterm tussen aanhalingstekens kent geen escapes
+    authors = [" ".join(author.replace('"', " ").split()) for author in facets.authors]
+    if any(authors):
+        parts.append("(" + " OR ".join(f'au:"{author}"' for author in authors if author) + ")")
+    if facets.published_from or facets.published_to:
+        low = (facets.published_from or "1991-01").replace("-", "") + "010000"
+        high = (facets.published_to or "9999-12").replace("-", "") + "312359"
+        parts.append(f"submittedDate:[{low} TO {high}]")
+    return " AND ".join(parts)
+
+
+def search_with_facets(query: str, max_results: int, facets: Facets,
+                       store: Optional[PaperStore] = None) -> List[Paper]:
+    """
+    Zoek met filters: eerst in de lokale store, alleen bij te weinig treffers ook op Arxiv.
+
+    De Arxiv resultaten (met dezelfde filters) en de lokale treffers worden
+    samengevoegd met reciprocal rank fusion.
+    """
+    from arxiv_fusion import ResultFusion
+
+    store = store or get_paper_store()
+    local = store.search(query, facets, max_results)
+    if len(local) >= max_results:
+        return local
+
+    remote = search_papers(facet_query(query, facets), max_results)
+    fusion = ResultFusion()
+    fusion.add(remote)
+    fusion.add(local)
+    return fusion.ranked(max_results)
+
+
+_store: Optional[PaperStore] = None
+_store_lock = threading.Lock()
+
+
+def get_paper_store() -> PaperStore:
+    """
+    De store van dit proces (`ARXIV_STORE_SIZE` papers, standaard 100000).
+
+    Een nieuwe store begint met de `ARXIV_STORE_WARM` (standaard 5000) nieuwste
+    papers uit de metadata database, die andere processen al hebben gevonden.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PaperStore(max_size=int(os.getenv("ARXIV_STORE_SIZE", "100000")))
+            warm = min(int(os.getenv("ARXIV_STORE_WARM", "5000")), _store.max_size)
+            if warm > 0:
+                import sqlite3
+                from metadata_db import get_metadata_db
+                try:
+                    # Oudste eerst, zodat de nieuwste het laatst uit de LRU gaan
+                    _store.add(reversed(get_metadata_db().papers_by_published(limit=warm)))
+                except sqlite3.Error as e:
+                    print(f"Warming the paper store failed: {e}", file=sys.stderr)
+        return _store
@@ -0,0 +1,235 @@
+"""
+Korte samenvattingen van abstracts, gedeeld tussen gesprekken.
+
+Na elke zoekopdracht leest het taalmodel in de tweede completion van
+`run_conversation` de volledige abstracts, ook van papers die het al vaak
+heeft gezien. De `Summarizer` vat papers zonder samenvatting op de achtergrond
+samen, veel papers per LLM aanroep, en bewaart het resultaat in de
+`SummaryStore` onder (arxiv id, versie). Tool resultaten bevatten daarna de
+korte samenvatting (`Paper.tldr`) in plaats van de abstract.
+
+De store staat in de gedeelde metadata database (zie `metadata_db.py`), zodat
+ook MCP servers die per gesprek starten elkaars samenvattingen hergebruiken.
+Aanzetten met `ARXIV_SUMMARIES=1` of `--summaries`; de servers hebben dan
+`OPENAI_API_KEY` nodig.
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from arxiv_client import Paper
+
+SUMMARY_MODEL = "gpt-4-turbo"
+
+SUMMARY_PROMPT = (
+    "You write short summaries of scientific abstracts for a research assistant. "
+    "For each paper in the JSON list, write one or two plain sentences (at most 50 words) "
+    "with the problem, the approach and the main result. "
+    'Reply with a JSON object of the form {"summaries": {"<id>": "<summary>"}}, '
+    "using the ids from the input."
+)
+
+Key = Tuple[str, int]
+
+
+def summaries_enabled() -> bool:
+    """Of samenvatten via `ARXIV_SUMMARIES` is aangezet."""
+    return os.getenv("ARXIV_SUMMARIES", "").lower() in ("1", "true", "yes")
+
+
+def _label(key: Key) -> str:
+    return f"{key[0]}v{key[1]}"
+
+
+class SummaryStore:
+    """
+    Samenvattingen per (arxiv id, versie), in de metadata database en de
+    `maxsize` laatst gebruikte ook in het geheugen (LRU).
+
+    Andere processen schrijven naar dezelfde database; wat hier niet in het
+    geheugen staat wordt eerst daar opgezocht.
+    """
+
+    def __init__(self, db=None, maxsize: int = 10000):
+        self.db = db
+        self.maxsize = maxsize
+        self._summaries: "OrderedDict[Key, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    def get(self, key: Key) -> Optional[str]:
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is not None:
+                self._summaries.move_to_end(key)
+            return summary
+
+    def _remember(self, summaries: Dict[Key, str]) -> None:
+        with self._lock:
+            for key, summary in summaries.items():
+                self._summaries[key] = summary
+                self._summaries.move_to_end(key)
+            while len(self._summaries) > self.maxsize:
+                self._summaries.popitem(last=False)
+
+    def missing(self, papers: Iterable[Paper]) -> List[Paper]:
+        """De papers zonder samenvatting, ook niet in de database."""
+        with self._lock:
+            missing = [paper for paper in papers if paper.key not in self._summaries]
+        if missing and self.db is not None:
+            found = self.db.get_summaries(paper.key for paper in missing)
+            self._remember(found)
+            missing = [paper for paper in missing if paper.key not in found]
+        return missing
+
+    def put(self, summaries: Dict[Key, str]) -> None:
+        if not summaries:
+            return
+        self._remember(summaries)
+        if self.db is not None:
+            self.db.put_summaries(summaries)
+
+
+def summarize_batch(openai_client, papers: Sequence[Paper], model: str = SUMMARY_MODEL) -> Dict[Key, str]:
+    """Vat `papers` samen in één chat completion (blokkerend)."""
+    keys = {_label(paper.key): paper.key for paper in papers}
+    items = [{"id": _label(paper.key), "title": paper.title, "abstract": paper.summary} for paper in papers]
+    response = openai_client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": json.dumps(items, ensure_ascii=False)},
+        ],
+        response_format={"type": "json_object"},
+    )
+    try:
+        summaries = json.loads(response.choices[0].message.content or "{}").get("summaries", {})
+    except (json.JSONDecodeError, AttributeError):
+        return {}
+    if not isinstance(summaries, dict):
+        return {}
+    # Alleen ids die we hebben gevraagd; het model verzint er soms bij
+    return {keys[label]: text.strip() for label, text in summaries.items()
+            if label in keys and isinstance(text, str) and text.strip()}
+
+
+class Summarizer:
+    """Vat papers zonder samenvatting in batches samen in een achtergrondthread."""
+
+    def __init__(self, store: SummaryStore, batch_size: int = 20, max_wait: float = 2.0,
+                 max_pending: int = 500, openai_client=None):
+        """
+        Args:
+            store: Waar de samenvattingen worden bewaard.
+            batch_size: Maximaal aantal papers per LLM aanroep.
+            max_wait: Hoe lang (in seconden) na de eerste paper wordt gewacht
+                op meer papers voordat een onvolle batch wordt verstuurd.
+            max_pending: Maximaal aantal papers in de wachtrij; de rest wordt
+                bij een volgende zoekopdracht opnieuw aangeboden.
+            openai_client: Standaard een client uit de environment.
+        """
+        self.store = store
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self._openai_client = openai_client
+        self._queue: "queue.Queue[Paper]" = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            from openai import OpenAI
+            from arxiv_replay import openai_http_client
+
+            self._openai_client = OpenAI(http_client=openai_http_client())
+        return self._openai_client
+
+    def attach(self, papers: Sequence[Paper]) -> int:
+        """
+        Zet `tldr` op de papers met een bekende samenvatting en plan de rest in.
+
+        Blokkeert op de metadata database; roep dit vanuit async code aan via
+        `asyncio.to_thread`.
+
+        Retourneert het aantal papers dat een samenvatting kreeg.
+        """
+        for paper in self.store.missing(papers):
+            self.schedule(paper)
+        attached = 0
+        for paper in papers:
+            summary = self.store.get(paper.key)
+            if summary:
+                paper.tldr = summary
+                attached += 1
+        return attached
+
+    def schedule(self, paper: Paper) -> bool:
+        with self._lock:
+            if paper.key in self._pending or len(self._pending) >= self.max_pending:
+                return False
+            self._pending.add(paper.key)
+            self._queue.put(paper)
+            self._ensure_worker()
+        return True
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="arxiv-summarizer", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self) -> List[Paper]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                # Een ander proces kan ze intussen al hebben samengevat
+                todo = self.store.missing(batch)
+                if todo:
+                    self.store.put(summarize_batch(self.openai_client, todo))
+            except Exception as e:
+                print(f"Summarizing {len(batch)} papers failed: {e}", file=sys.stderr)
+            finally:
+                with self._lock:
+                    self._pending.difference_update(paper.key for paper in batch)
+
+
+_summarizer: Optional[Summarizer] = None
+_summarizer_lock = threading.Lock()
+
+
+def get_summarizer() -> Summarizer:
+    """De summarizer van dit proces, met de store in de metadata database."""
+    from metadata_db import get_metadata_db
+
+    global _summarizer
+    with _summarizer_lock:
+        if _summarizer is None:
+            _summarizer = Summarizer(
+                SummaryStore(get_metadata_db(),
+                             maxsize=int(os.getenv("ARXIV_SUMMARY_CACHE", "10000"))),
+                batch_size=int(os.getenv("ARXIV_SUMMARY_BATCH", "20")),
+            )
+        return _summarizer
@@ -0,0 +1,199 @@
+"""
+Profileren van losse zoekvragen met cProfile.
+
+Profileren staat per verzoek aan: de web app met `?profile=1` of de header
+`X-Profile: 1` op `/api/search`, en de MCP servers voor tool calls die een
+`profile_id` meekrijgen (of voor alle tool calls met `ARXIV_PROFILE=1`).
+Zonder profile id kost het niets behalve één controle.
+
+In de web app mag alleen een client met de token uit `ARXIV_PROFILE_TOKEN`
+(header `X-Profile-Token`) profileren en profielen lezen; zonder die
+variabele staat het uit. Een geprofileerd verzoek slaat de antwoordcache over
+en is dus duur.
+
+Een verzoek kan meerdere profielen opleveren onder hetzelfde id: `agent`
+(`run_conversation` in de web app) en `server` (de tool call in de MCP server:
+ophalen en XML parsen). Ze staan als `.prof` bestanden in `ARXIV_PROFILE_DIR`
+en zijn te openen met `pstats`, snakeviz of via `/api/profiles/<id>`.
+"""
+
+import asyncio
+import glob
+import hmac
+import io
+import os
+import re
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, List, Optional, TypeVar
+
+# `cProfile` en `pstats` worden pas geïmporteerd als er geprofileerd wordt;
+# de MCP servers importeren deze module bij het starten.
+
+T = TypeVar("T")
+
+_PROFILE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_TRUE = ("1", "true", "yes", "on")
+
+# Sorteringen die `profile_summary` accepteert
+SORT_KEYS = ("cumulative", "tottime", "calls", "ncalls")
+
+
+def profile_dir() -> str:
+    """Map voor de profielen; gedeeld met de MCP servers via de environment."""
+    return os.getenv("ARXIV_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "arxiv-profiles")
+
+
+def profile_flag(value: Optional[str]) -> bool:
+    """Of een header of query parameter om profileren vraagt."""
+    return value is not None and value.strip().lower() in _TRUE
+
+
+def profiling_authorized(token: Optional[str]) -> bool:
+    """Of een web client met deze token mag profileren (alleen met `ARXIV_PROFILE_TOKEN`)."""
+    expected = os.getenv("ARXIV_PROFILE_TOKEN")
+    if not expected or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8"))
+
+
+def profile_all() -> bool:
+    """Of `ARXIV_PROFILE` profileren voor elke tool call aanzet."""
+    return profile_flag(os.getenv("ARXIV_PROFILE"))
+
+
+def new_profile_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def valid_profile_id(profile_id: str) -> bool:
+    """Ids en componentnamen komen uit URLs en berichten; alleen veilige tekens."""
+    return bool(_PROFILE_ID.match(profile_id or ""))
+
+
+def _prune(directory: str) -> None:
+    """Houd hooguit `ARXIV_PROFILE_KEEP` profielen; de oudste gaan eerst."""
+    keep = int(os.getenv("ARXIV_PROFILE_KEEP", "200"))
+    files = sorted(glob.glob(os.path.join(directory, "*.prof")), key=os.path.getmtime)
+    for path in files[:max(0, len(files) - keep)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def save_profile(profiler, profile_id: str, component: str) -> str:
+    """
+    Sla een profiel op als `<id>.<component>.prof`.
+
+    Meerdere tool calls binnen één verzoek krijgen elk een eigen bestand
+    (`server`, `server-2`, ...).
+    """
+    if not valid_profile_id(profile_id) or not valid_profile_id(component):
+        raise ValueError(f"Invalid profile id or component: {profile_id!r}, {component!r}")
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    name, n = component, 1
+    while True:
+        path = os.path.join(directory, f"{profile_id}.{name}.prof")
+        try:
+            # Exclusief aanmaken: gelijktijdige tool calls kiezen zo elk een eigen naam
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            n += 1
+            name = f"{component}-{n}"
+    profiler.dump_stats(path)
+    _prune(directory)
+    return path
+
+
+def _save_quietly(profiler, profile_id: str, component: str) -> None:
+    # Aangeroepen in `finally`: een fout bij het opslaan mag de eigenlijke exception niet verbergen
+    try:
+        save_profile(profiler, profile_id, component)
+    except (OSError, ValueError) as e:
+        print(f"Saving profile {profile_id}.{component} failed: {e}", file=sys.stderr)
+
+
+@contextmanager
+def profiled(profile_id: Optional[str], component: str):
+    """Profileer het blok in de huidige thread als er een `profile_id` is."""
+    if not profile_id:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _save_quietly(profiler, profile_id, component)
+
+
+def profiled_call(profile_id: Optional[str], component: str, func: Callable[..., T], *args) -> T:
+    """Roep `func(*args)` aan, geprofileerd als er een `profile_id` is."""
+    if not profile_id:
+        return func(*args)
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        _save_quietly(profiler, profile_id, component)
+
+
+async def profiled_to_thread(profile_id: Optional[str], component: str,
+                             func: Callable[..., T], *args) -> T:
+    """
+    Voer `func(*args)` uit in een worker thread, geprofileerd als er een `profile_id` is.
+
+    cProfile meet per thread, dus het profiel wordt in de worker thread zelf gemaakt.
+    """
+    return await asyncio.to_thread(profiled_call, profile_id, component, func, *args)
+
+
+def server_profile_id(requested: Optional[str]) -> Optional[str]:
+    """Het profile id voor een tool call in een MCP server, of None als niet geprofileerd wordt."""
+    if requested:
+        return requested if valid_profile_id(requested) else None
+    if profile_all():
+        profile_id = new_profile_id()
+        print(f"Profiling tool call as {profile_id} in {profile_dir()}", file=sys.stderr)
+        return profile_id
+    return None
+
+
+def list_profiles(profile_id: str) -> List[str]:
+    """De componenten waarvoor een profiel van `profile_id` bestaat."""
+    if not valid_profile_id(profile_id):
+        return []
+    prefix = os.path.join(profile_dir(), f"{profile_id}.")
+    return sorted(path[len(prefix):-len(".prof")] for path in glob.glob(f"{prefix}*.prof"))
+
+
+def profile_path(profile_id: str, component: str) -> Optional[str]:
+    """Pad naar een opgeslagen profiel, of None als het niet bestaat."""
+    if not valid_profile_id(profile_id) or not valid_profile_id(component):
+        return None
+    path = os.path.join(profile_dir(), f"{profile_id}.{component}.prof")
+    return path if os.path.exists(path) else None
+
+
+def profile_summary(profile_id: str, component: str, sort: str = "cumulative",
+                    limit: int = 25) -> Optional[str]:
+    """De `limit` duurste functies van een profiel als tekst (pstats formaat)."""
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unsupported sort key: {sort} (choose from {', '.join(SORT_KEYS)})")
+    path = profile_path(profile_id, component)
+    if path is None:
+        return None
+    import pstats
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Productie-launcher voor de web app met meerdere worker processen.
+
+    python serve_web.py --app simple --workers 4 --port 5000
+
+`mcp_web_app_*.py` met `app.run()` is één proces met één event loop en
+gebruikt dus één core. Deze launcher start `--workers` processen (standaard
+het aantal cores), elk met een eigen kopie van de app.
+
+- Het parent proces accepteert alle verbindingen en geeft elke verbinding via
+  een Unix socket (SCM_RIGHTS) door aan een worker. Zelf kijkt het alleen naar
+  de request regel (MSG_PEEK), zodat de worker het volledige request leest;
+  een verbinding gaat pas door als de hele request regel binnen is.
+- Socket.IO sessies zijn sticky: elke worker begint zijn Engine.IO session ids
+  met zijn nummer (`3.Xyz...`) en requests met `sid=3.` gaan naar worker 3.
+  Andere requests worden round-robin verdeeld.
+- Caches worden gedeeld via de metadata database (zie `metadata_db.py`): de
+  antwoordcache, en met `ARXIV_SHARED_CACHE=1` (hier standaard aan) ook de
+  Arxiv responses van alle MCP servers.
+- Bij SIGTERM of Ctrl-C krijgen nieuwe bezoekers 503, maar lopende zoekvragen
+  worden afgemaakt (hooguit `--drain-timeout` seconden) en hun Socket.IO
+  sessies blijven tot dan bereikbaar; daarna stoppen de workers.
+- Een worker die onverwacht stopt wordt opnieuw gestart.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import re
+import selectors
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Optional, Set, Tuple
+
+APPS = {
+    "simple": "mcp_web_app_simple",
+    "sdk": "mcp_web_app_sdk",
+}
+
+_SID = re.compile(rb"[?&]sid=(\d+)\.")
+
+# Zo lang (in seconden) mag een client doen over het sturen van zijn request regel
+HEADER_TIMEOUT = 10.0
+# Zoveel bytes van het request bekijkt het parent proces; een langere request regel gaat round-robin
+PEEK_SIZE = 2048
+# Zo vaak (in seconden) wordt een onvolledige request regel opnieuw bekeken
+PARTIAL_RECHECK = 0.05
+# Na de laatste zoekvraag: tijd voor Socket.IO clients om het resultaat op te halen
+DRAIN_GRACE = 2.0
+# Een worker die korter leefde is bij het starten gecrasht en wordt niet herstart
+MIN_UPTIME = 5.0
+
+SERVICE_UNAVAILABLE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: text/plain\r\nContent-Length: 20\r\n"
+    b"Retry-After: 5\r\nConnection: close\r\n\r\n"
+    b"Server shutting down"
+)
+
+
+def sticky_worker(request_head: bytes) -> Optional[int]:
+    """Het nummer van de worker met de Engine.IO sessie van dit request, als het er een heeft."""
+    line = request_head.split(b"\r\n", 1)[0]
+    match = _SID.search(line)
+    return int(match.group(1)) if match else None
+
+
+class InFlight:
+    """Telt lopende zoekvragen, zodat een worker kan wachten tot ze klaar zijn."""
+
+    def __init__(self):
+        self.count = 0
+        self._idle = threading.Condition()
+
+    def __enter__(self):
+        with self._idle:
+            self.count += 1
+
+    def __exit__(self, *exc_info):
+        with self._idle:
+            self.count -= 1
+            if self.count == 0:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float) -> bool:
+        with self._idle:
+            return self._idle.wait_for(lambda: self.count == 0, timeout)
+
+
+def prepare_app(module, index: int, in_flight: InFlight):
+    """
+    Maak de app van één worker klaar en retourneer de WSGI app.
+
+    Session ids krijgen het worker nummer mee (voor de sticky routing) en
+    zoekvragen worden geteld (voor het afronden bij het stoppen).
+    """
+    eio = module.sio.eio
+    generate_id = eio.generate_id
+    eio.generate_id = lambda: f"{index}.{generate_id()}"
+
+    run_query = module.run_query
+
+    def counted_run_query(*args, **kwargs):
+        with in_flight:
+            return run_query(*args, **kwargs)
+
+    # De request handlers zoeken `run_query` bij elke aanroep op in de module
+    module.run_query = counted_run_query
+    return module.app
+
+
+def _worker_server(app, listener: socket.socket):
+    from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+    class Handler(WSGIRequestHandler):
+        # Eén request per verbinding: een keep-alive verbinding zou anders
+        # requests van een andere sessie naar deze worker kunnen meenemen
+        protocol_version = "HTTP/1.0"
+
+    host, port = listener.getsockname()[:2]
+    # Met `fd` bindt werkzeug zelf geen socket; verbindingen komen van het parent proces
+    return ThreadedWSGIServer(host, port, app, handler=Handler, fd=listener.fileno())
+
+
+def run_worker(index: int, app_name: str, listener: socket.socket, channel: socket.socket,
+               drain_timeout: float) -> None:
+    """Draai één worker (in het child proces) tot SIGTERM en afronden."""
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    # Ctrl-C gaat naar de hele procesgroep; het parent proces stuurt SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    in_flight = InFlight()
+    module = importlib.import_module(APPS[app_name])
+    server = _worker_server(prepare_app(module, index, in_flight), listener)
+    print(f"Worker {index} (pid {os.getpid()}) ready", file=sys.stderr)
+
+    def receive():
+        while True:
+            try:
+                message, fds, _, _ = socket.recv_fds(channel, 1024, 1)
+            except OSError:
+                break
+            if not fds:
+                # Het parent proces is weg
+                break
+            conn = socket.socket(fileno=fds[0])
+            # O_NONBLOCK van het parent geldt ook voor deze kopie van de verbinding
+            conn.setblocking(True)
+            server.process_request(conn, tuple(json.loads(message)))
+        stopping.set()
+
+    threading.Thread(target=receive, name="receive-connections", daemon=True).start()
+    while not stopping.wait(1.0):
+        pass
+
+    if not in_flight.wait_idle(drain_timeout):
+        print(f"Worker {index}: {in_flight.count} queries still running after "
+              f"{drain_timeout} s, stopping anyway", file=sys.stderr)
+    time.sleep(DRAIN_GRACE)
+
+
+class Launcher:
+    """Het parent proces: accepteert verbindingen en verdeelt ze over de workers."""
+
+    def __init__(self, app_name: str, host: str, port: int, workers: int, drain_timeout: float):
+        self.app_name = app_name
+        self.host = host
+        self.port = port
+        self.worker_count = workers
+        self.drain_timeout = drain_timeout
+        self.listener: Optional[socket.socket] = None
+        self.selector = selectors.DefaultSelector()
+        # worker nummer -> (pid, kanaal, starttijd)
+        self.workers: Dict[int, Tuple[int, socket.socket, float]] = {}
+        # verbindingen waarvan de request regel nog niet binnen is -> aankomsttijd
+        self.pending: Dict[socket.socket, Tuple[tuple, float]] = {}
+        # verbindingen met een deel van de request regel; niet in de selector, die
+        # zou voor de al gelezen (gepeekte) bytes steeds opnieuw melden
+        self.partial: Set[socket.socket] = set()
+        self.draining = False
+        self.deadline = 0.0
+        self._next = 0
+
+    def start(self) -> None:
+        self.listener = socket.create_server((self.host, self.port), backlog=1024)
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        for index in range(self.worker_count):
+            self._spawn(index)
+        host, port = self.listener.getsockname()[:2]
+        print(f"Serving {APPS[self.app_name]} on http://{host}:{port} "
+              f"with {self.worker_count} workers", file=sys.stderr)
+
+    def _spawn(self, index: int) -> None:
+        parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                # Alleen de luistersocket en het eigen kanaal blijven open
+                parent_end.close()
+                for _, channel, _ in self.workers.values():
+                    channel.close()
+                for conn in self.pending:
+                    conn.close()
+                self.selector.close()
+                run_worker(index, self.app_name, self.listener, child_end, self.drain_timeout)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        child_end.close()
+        self.workers[index] = (pid, parent_end, time.monotonic())
+
+    def stop(self, *_) -> None:
+        """Begin met afronden: geen nieuwe bezoekers, lopende sessies mogen uitlopen."""
+        if self.draining:
+            return
+        print("Draining workers...", file=sys.stderr)
+        self.draining = True
+        self.deadline = time.monotonic() + self.drain_timeout + DRAIN_GRACE + 5
+        self._signal_workers(signal.SIGTERM)
+
+    def _signal_workers(self, signum: int) -> None:
+        for pid, _, _ in self.workers.values():
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def serve(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while self.workers:
+            timeout = PARTIAL_RECHECK if self.partial else 0.5
+            for key, _ in self.selector.select(timeout=timeout):
+                if key.fileobj is self.listener:
+                    self._accept()
+                else:
+                    self._route(key.fileobj)
+            for conn in list(self.partial):
+                self._route(conn)
+            self._expire()
+            self._reap()
+            if self.draining and time.monotonic() > self.deadline:
+                self._signal_workers(signal.SIGKILL)
+        self.listener.close()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, addr = self.listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            conn.setblocking(False)
+            self.pending[conn] = (addr, time.monotonic())
+            self.selector.register(conn, selectors.EVENT_READ)
+
+    def _route(self, conn: socket.socket) -> None:
+        try:
+            head = conn.recv(PEEK_SIZE, socket.MSG_PEEK)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            head = b""
+        if head and b"\r\n" not in head and len(head) < PEEK_SIZE:
+            # Wacht op de rest van de request regel (of tot HEADER_TIMEOUT)
+            if conn not in self.partial:
+                self.selector.unregister(conn)
+                self.partial.add(conn)
+            return
+        addr = self._forget(conn)
+        try:
+            if not head:
+                return
+            index = sticky_worker(head)
+            if index not in self.workers:
+                if self.draining:
+                    try:
+                        conn.send(SERVICE_UNAVAILABLE)
+                    except OSError:
+                        pass
+                    return
+                index = self._round_robin()
+            _, channel, _ = self.workers[index]
+            socket.send_fds(channel, [json.dumps(list(addr[:2])).encode()], [conn.fileno()])
+        except OSError as e:
+            print(f"Handing a connection to a worker failed: {e}", file=sys.stderr)
+        finally:
+            # De worker heeft nu zijn eigen kopie van de verbinding
+            conn.close()
+
+    def _round_robin(self) -> int:
+        indices = sorted(self.workers)
+        self._next = (self._next + 1) % len(indices)
+        return indices[self._next]
+
+    def _forget(self, conn: socket.socket) -> tuple:
+        """Haal een verbinding uit de wachtende verbindingen; retourneert het adres."""
+        if conn in self.partial:
+            self.partial.discard(conn)
+        else:
+            self.selector.unregister(conn)
+        addr, _ = self.pending.pop(conn)
+        return addr
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for conn, (_, arrived) in list(self.pending.items()):
+            if now - arrived > HEADER_TIMEOUT:
+                self._forget(conn)
+                conn.close()
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            for index, (worker_pid, channel, started) in list(self.workers.items()):
+                if worker_pid != pid:
+                    continue
+                channel.close()
+                del self.workers[index]
+                if self.draining:
+                    break
+                code = os.waitstatus_to_exitcode(status)
+                if time.monotonic() - started < MIN_UPTIME:
+                    print(f"Worker {index} failed at startup (exit code {code}); not restarting",
+                          file=sys.stderr)
+                else:
+                    print(f"Worker {index} exited (exit code {code}); restarting", file=sys.stderr)
+                    self._spawn(index)
+                break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Web app met meerdere worker processen")
+    parser.add_argument("--app", choices=sorted(APPS), default="simple", help="Welke web app")
+    parser.add_argument("--host", default="127.0.0.1", help="Adres om op te luisteren")
+    parser.add_argument("--port", type=int, default=5000, help="Poort om op te luisteren")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Aantal worker processen (standaard het aantal cores)")
+    parser.add_argument("--drain-timeout", type=float, default=30.0,
+                        help="Maximale wachttijd (in seconden) voor lopende zoekvragen bij het stoppen")
+    args = parser.parse_args()
+
+    # Workers en hun MCP servers delen de Arxiv responses, tenzij expliciet uitgezet
+    os.environ.setdefault("ARXIV_SHARED_CACHE", "1")
+
+    launcher = Launcher(args.app, args.host, args.port, args.workers, args.drain_timeout)
+    launcher.start()
+    launcher.serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Lokale stand-ins voor de Arxiv API en de OpenAI API.
+
+Voor load tests zonder netwerk, API key of rate limits: één HTTP server die
+`/api/query` beantwoordt met een synthetische Atom feed en
+`/v1/chat/completions` met een voorspelbaar model, dat eerst de zoektool
+aanroept en daarna een kort antwoord geeft. Beide met instelbare latency.
+
+    python stub_services.py --port 8900 --arxiv-latency 0.3 --openai-latency 0.8
+
+    export ARXIV_API_URL=http://127.0.0.1:8900/api/query
+    export OPENAI_BASE_URL=http://127.0.0.1:8900/v1
+    export OPENAI_API_KEY=stub
+    export ARXIV_RATE_LIMIT=1000 ARXIV_RATE_BURST=1000
+    export ARXIV_ANSWER_TTL=0
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+CATEGORIES = ["cs.LG", "cs.AI", "quant-ph", "stat.ML", "cs.CL", "physics.comp-ph"]
+ABSTRACT = ("We study the problem of {topic} and propose a simple method that "
+            "improves on strong baselines across several benchmarks. ") * 6
+# Zoveel resultaten heeft elke query in de stub (opensearch:totalResults)
+TOTAL_RESULTS = 200
+
+
+def stub_feed(query: str, start: int = 0, max_results: int = 3) -> bytes:
+    """Een deterministische Atom feed voor `query`; dezelfde query geeft dezelfde papers."""
+    seed = int(hashlib.sha1(query.encode("utf-8")).hexdigest()[:8], 16)
+    topic = escape(query.split(":", 1)[-1].strip('"') or "science")
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom" '
+             'xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">',
+             f"<opensearch:totalResults>{TOTAL_RESULTS}</opensearch:totalResults>"]
+    for i in range(start, min(start + max_results, TOTAL_RESULTS)):
+        number = (seed + i * 7919) % 100000
+        category = CATEGORIES[(seed + i) % len(CATEGORIES)]
+        authors = "".join(f"<author><name>Author {chr(65 + (seed + i + j) % 26)}. Stub{(seed + j) % 97}</name></author>"
+                          for j in range(3))
+        parts.append(
+            f"<entry><id>http://arxiv.org/abs/2401.{number:05d}v1</id>"
+            f"<published>2024-{1 + i % 12:02d}-{1 + i % 28:02d}T00:00:00Z</published>"
+            f"<title>On {topic}, part {i + 1}</title>"
+            f"<summary>{ABSTRACT.format(topic=topic)}</summary>{authors}"
+            f'<category term="{category}"/>'
+            f'<link title="pdf" href="http://arxiv.org/pdf/2401.{number:05d}v1"/></entry>')
+    parts.append("</feed>")
+    return "".join(parts).encode("utf-8")
+
+
+def _last_user_message(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user" and isinstance(message.get("content"), str):
+            return message["content"]
+    return ""
+
+
+def _search_tool(tools: List[Dict[str, Any]]) -> Optional[str]:
+    names = [tool.get("function", {}).get("name", "") for tool in tools]
+    for name in names:
+        if "search" in name:
+            return name
+    return names[0] if names else None
+
+
+def _stub_json(question: str) -> Dict[str, Any]:
+    try:
+        papers = json.loads(question)
+    except ValueError:
+        return {"queries": []}
+    if not isinstance(papers, list):
+        return {"queries": []}
+    return {"summaries": {paper["id"]: paper.get("abstract", "").split(". ")[0] + "."
+                          for paper in papers if isinstance(paper, dict) and "id" in paper}}
+
+
+def stub_completion(request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Een chat completion zoals het echte model die ongeveer zou geven.
+
+    Met tools en nog geen tool resultaat: roep de zoektool aan met de vraag
+    van de gebruiker. Met `response_format`: de eerste zin van elke abstract
+    voor een lijst papers (samenvattingen), anders een leeg JSON object
+    (vervolgvragen). Anders: een kort antwoord op basis van de tool resultaten.
+    """
+    messages = request.get("messages", [])
+    question = _last_user_message(messages)
+    message: Dict[str, Any] = {"role": "assistant", "content": None}
+    finish_reason = "stop"
+
+    tool = _search_tool(request.get("tools") or [])
+    if request.get("response_format"):
+        message["content"] = json.dumps(_stub_json(question))
+    elif tool and not any(m.get("role") == "tool" for m in messages):
+        message["tool_calls"] = [{
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "function",
+            "function": {"name": tool, "arguments": json.dumps({"query": question})},
+        }]
+        finish_reason = "tool_calls"
+    else:
+        results = sum(len(m.get("content") or "") for m in messages if m.get("role") == "tool")
+        message["content"] = f"Stub answer to '{question}' based on {results} characters of search results."
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "stub"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _delay(self, latency: float) -> None:
+        # Spreiding rond het gemiddelde, zodat de verdeling niet kunstmatig vlak is
+        if latency > 0:
+            time.sleep(random.uniform(0.5, 1.5) * latency)
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path != "/api/query":
+            self._send(404, b"Not found", "text/plain")
+            return
+        params = parse_qs(parts.query)
+        self._delay(self.server.arxiv_latency)
+        feed = stub_feed(params.get("search_query", [""])[0],
+                         int(params.get("start", ["0"])[0]),
+                         int(params.get("max_results", ["3"])[0]))
+        self._send(200, feed, "application/atom+xml; charset=utf-8")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if urlsplit(self.path).path.rstrip("/") != "/v1/chat/completions":
+            self._send(404, b'{"error": {"message": "Not found"}}', "application/json")
+            return
+        self._delay(self.server.openai_latency)
+        response = stub_completion(json.loads(body or b"{}"))
+        self._send(200, json.dumps(response).encode("utf-8"), "application/json")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, arxiv_latency: float = 0.0,
+                      openai_latency: float = 0.0, verbose: bool = False) -> ThreadingHTTPServer:
+    """Start de stub server in een achtergrondthread; `port=0` kiest een vrije poort."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.arxiv_latency = arxiv_latency
+    server.openai_latency = openai_latency
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, name="stub-services", daemon=True).start()
+    return server
+
+
+def stub_environment(server: ThreadingHTTPServer) -> Dict[str, str]:
+    """De environment variables die agent, MCP servers en web app naar de stubs laten wijzen."""
+    host, port = server.server_address[:2]
+    return {
+        "ARXIV_API_URL": f"http://{host}:{port}/api/query",
+        "OPENAI_BASE_URL": f"http://{host}:{port}/v1",
+        "OPENAI_API_KEY": "stub",
+        # De stub kent geen rate limit; de client-side limiter zou anders de meting bepalen
+        "ARXIV_RATE_LIMIT": "1000",
+        "ARXIV_RATE_BURST": "1000",
+        # Herhaalde vragen uit de query mix moeten de agent raken, niet de antwoordcache
+        "ARXIV_ANSWER_TTL": "0",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokale stand-ins voor Arxiv en OpenAI")
+    parser.add_argument("--host", default="127.0.0.1", help="Adres om op te luisteren")
+    parser.add_argument("--port", type=int, default=8900, help="Poort om op te luisteren")
+    parser.add_argument("--arxiv-latency", type=float, default=0.3,
+                        help="Gemiddelde responstijd van de Arxiv stub in seconden")
+    parser.add_argument("--openai-latency", type=float, default=0.8,
+                        help="Gemiddelde responstijd van de OpenAI stub in seconden")
+    parser.add_argument("--verbose", action="store_true", help="Log elk request")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.host, args.port, args.arxiv_latency,
+                               args.openai_latency, args.verbose)
+    print(f"Stub services listening on http://{args.host}:{server.server_address[1]}")
+    for name, value in stub_environment(server).items():
+        print(f"export {name}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Tests voor het parsen en formatteren van Arxiv feeds in arxiv_client.py."""
+
+import arxiv_client
+from arxiv_client import Paper, ResponseCache, clean_text, format_papers, parse_feed
+
+FEED = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>ArXiv Query</title>
+  <entry>
+    <id>http://arxiv.org/abs/2301.01234v2</id>
+    <published>2023-01-03T18:00:00Z</published>
+    <title>Graph   Neural
+      Networks</title>
+    <summary>  We study
+      graphs.  </summary>
+    <author><name>Ada Lovelace</name></author>
+    <author><name> Alan  Turing </name></author>
+    <link href="http://arxiv.org/abs/2301.01234v2" rel="alternate" type="text/html"/>
+    <link title="pdf" href="http://arxiv.org/pdf/2301.01234v2" rel="related" type="application/pdf"/>
+    <category term="cs.LG" scheme="http://arxiv.org/schemas/atom"/>
+    <category term="stat.ML" scheme="http://arxiv.org/schemas/atom"/>
+  </entry>
+  <entry>
+    <id>http://arxiv.org/abs/hep-th/9901001</id>
+    <published>1999-01-01T00:00:00Z</published>
+    <title>Old style id</title>
+    <summary>Strings.</summary>
+  </entry>
+</feed>
+"""
+
+
+def test_parse_feed_fields():
+    first, second = parse_feed(FEED)
+    assert first.key == ("2301.01234", 2)
+    assert first.title == "Graph Neural Networks"
+    assert first.summary == "We study graphs."
+    assert first.authors == ("Ada Lovelace", "Alan Turing")
+    assert first.categories == ("cs.LG", "stat.ML")
+    assert first.published == "2023-01-03T18:00:00Z"
+    assert first.pdf_url == "http://arxiv.org/pdf/2301.01234v2"
+    # Zonder versie in het id is het versie 1
+    assert second.key == ("hep-th/9901001", 1)
+    assert second.authors == () and second.pdf_url == ""
+
+
+def test_parse_feed_interns_authors():
+    first = parse_feed(FEED)[0]
+    again = parse_feed(FEED)[0]
+    assert first.authors[0] is again.authors[0]
+
+
+def test_paper_has_no_instance_dict():
+    paper = Paper("2301.00001", 1, "Title", "Summary")
+    assert not hasattr(paper, "__dict__")
+
+
+def test_clean_text():
+    assert clean_text(None) == ""
+    assert clean_text(" a \n\t b  ") == "a b"
+
+
+def test_format_papers():
+    papers = parse_feed(FEED)
+    text = format_papers(papers)
+    assert text == ("Paper 1: Graph Neural Networks\nAbstract: We study graphs.\n\n"
+                    "Paper 2: Old style id\nAbstract: Strings.")
+    assert format_papers([]) == ""
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(maxsize=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.put("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1" and cache.get("c") == b"3"
+
+
+def test_response_cache_expires_entries():
+    cache = ResponseCache(ttl=-1)
+    cache.put("a", b"1")
+    assert cache.get("a") is None
+
+
+class _StreamedResponse:
+    """Een `requests` response die de body in kleine stukken geeft."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), 50):
+            yield self.body[start:start + 50]
+
+
+def test_fetch_feed_page_parses_while_streaming_and_caches(monkeypatch):
+    response = _StreamedResponse(FEED)
+    calls = []
+
+    def get(url, params, timeout, stream):
+        calls.append(stream)
+        return response
+
+    monkeypatch.setattr(arxiv_client, "get_session", lambda: type("Session", (), {"get": staticmethod(get)}))
+    monkeypatch.setattr(arxiv_client, "response_cache", ResponseCache())
+    monkeypatch.setattr(arxiv_client, "shared_response_cache", lambda: None)
+    params = arxiv_client.build_params("graphs", 2)
+
+    papers, _ = arxiv_client.fetch_feed_page(params, throttle=False)
+    assert [paper.arxiv_id for paper in papers] == ["2301.01234", "hep-th/9901001"]
+    assert calls == [True] and response.closed
+    # Gecachet als payload van feed_codec; de tweede keer zonder request
+    assert arxiv_client.fetch_feed(params) == arxiv_client.response_cache.get(arxiv_client.cache_key(params))
+    assert parse_feed(arxiv_client.fetch_feed(params))[0].title == "Graph Neural Networks"
+    assert arxiv_client.fetch_feed_page(params)[0][1].title == "Old style id"
+    assert calls == [True]
@@ -0,0 +1,63 @@
+"""Tests voor reciprocal rank fusion in arxiv_fusion.py."""
+
+from arxiv_client import Paper
+from arxiv_fusion import MERGED_RESULT_NOTE, RRF_K, ResultFusion, assign_fused_results
+
+
+def _paper(arxiv_id: str, version: int = 1) -> Paper:
+    return Paper(arxiv_id, version, f"Title {arxiv_id}", "Summary")
+
+
+def _ids(papers):
+    return [paper.arxiv_id for paper in papers]
+
+
+def test_papers_in_several_lists_rank_first():
+    fusion = ResultFusion()
+    fusion.add([_paper("a"), _paper("b"), _paper("c")])
+    fusion.add([_paper("c"), _paper("d")])
+    # c: 1/63 + 1/61 > a: 1/61
+    assert _ids(fusion.ranked()) == ["c", "a", "b", "d"]
+    assert len(fusion) == 4
+
+
+def test_ties_keep_first_seen_order():
+    fusion = ResultFusion()
+    fusion.add([_paper("a")])
+    fusion.add([_paper("b")])
+    assert _ids(fusion.ranked()) == ["a", "b"]
+
+
+def test_weights_and_limit():
+    fusion = ResultFusion(k=RRF_K)
+    fusion.add([_paper("a")])
+    fusion.add([_paper("b")], weight=2.0)
+    assert _ids(fusion.ranked(limit=1)) == ["b"]
+
+
+def test_newest_version_is_kept():
+    fusion = ResultFusion()
+    fusion.add([_paper("a", 2)])
+    fusion.add([_paper("a", 1)])
+    fusion.add([_paper("a", 3)])
+    (paper,) = fusion.ranked()
+    assert paper.version == 3
+
+
+def test_assign_fused_results_fills_empty_messages():
+    fusion = ResultFusion()
+    fusion.add([_paper("a")])
+    fusion.add([_paper("a"), _paper("b")])
+    messages = [
+        {"role": "tool", "tool_call_id": "1", "content": None},
+        {"role": "tool", "tool_call_id": "2", "content": "Error: failed"},
+        {"role": "tool", "tool_call_id": "3", "content": None},
+    ]
+    assign_fused_results(messages, fusion, lambda papers: ",".join(_ids(papers)))
+    assert [message["content"] for message in messages] == ["a,b", "Error: failed", MERGED_RESULT_NOTE]
+
+
+def test_assign_fused_results_without_empty_messages():
+    messages = [{"role": "tool", "tool_call_id": "1", "content": "No papers found"}]
+    assign_fused_results(messages, ResultFusion(), lambda papers: "unused")
+    assert messages[0]["content"] == "No papers found"
@@ -0,0 +1,95 @@
+"""Tests voor pagina's en cursors in arxiv_paging.py."""
+
+import pytest
+
+import arxiv_paging
+from arxiv_client import Paper
+from arxiv_paging import (FIRST_PAGE, Page, decode_cursor, encode_cursor, format_more, format_more_info,
+                          page_info, parse_max_results, query_terms, relevance, search_page)
+
+
+def _paper(arxiv_id: str, title: str = "Graph neural networks") -> Paper:
+    return Paper(arxiv_id, 1, title, "An abstract.")
+
+
+@pytest.fixture
+def arxiv(monkeypatch):
+    """Een nep Arxiv met 20 resultaten; houdt de requests bij als (start, max_results)."""
+    requests = []
+    titles = {}
+
+    def fetch_page(params):
+        start, size = params["start"], params["max_results"]
+        requests.append((start, size))
+        papers = [_paper(str(i), titles.get(i, "Graph neural networks")) for i in range(start, min(start + size, 20))]
+        return papers, 20
+
+    monkeypatch.setattr(arxiv_paging, "fetch_feed_page", fetch_page)
+    return requests, titles
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("quantum ëntanglement", 13, 10)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("quantum ëntanglement", 13, 10)
+
+
+@pytest.mark.parametrize("cursor", [
+    "", "not base64!", "e30", encode_cursor("", 0, 3), encode_cursor("q", -1, 3),
+    encode_cursor("q", 0, 0), "x" * 5000, None,
+])
+def test_invalid_cursors(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("value, expected", [(5, 5), ("5", 5), (" 12 ", 12)])
+def test_parse_max_results(value, expected):
+    assert parse_max_results(value) == expected
+
+
+@pytest.mark.parametrize("value", [0, -3, "-3", "five", 2.5, True, None])
+def test_parse_max_results_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_max_results(value)
+
+
+def test_relevance_ignores_field_names_and_operators():
+    terms = query_terms("ti:graph AND abs:neural")
+    assert terms == {"graph", "neural"}
+    assert relevance(_paper("1"), terms) == 1.0
+    assert relevance(_paper("1", "Graph theory"), terms) == 0.5
+    assert relevance(_paper("1"), set()) == 0.0
+
+
+def test_relevant_first_page_is_followed_by_one_request(arxiv):
+    requests, _ = arxiv
+    page = search_page("graph neural", 10)
+    assert [paper.arxiv_id for paper in page.papers] == [str(i) for i in range(10)]
+    assert requests == [(0, FIRST_PAGE), (FIRST_PAGE, 10 - FIRST_PAGE)]
+    assert decode_cursor(page.next_cursor) == ("graph neural", 10, 10)
+
+
+def test_search_stops_after_an_irrelevant_first_page(arxiv):
+    requests, titles = arxiv
+    titles[FIRST_PAGE - 1] = "Protein folding"
+    page = search_page("graph neural", 10)
+    assert len(page.papers) == FIRST_PAGE
+    assert requests == [(0, FIRST_PAGE)]
+    assert decode_cursor(page.next_cursor) == ("graph neural", FIRST_PAGE, 10)
+
+
+def test_cursor_fetches_the_next_page_in_one_request(arxiv):
+    requests, _ = arxiv
+    page = arxiv_paging.continue_search(encode_cursor("graph neural", 15, 10))
+    assert [paper.arxiv_id for paper in page.papers] == [str(i) for i in range(15, 20)]
+    assert requests == [(15, 10)]
+    assert page.next_cursor is None
+
+
+def test_format_more():
+    page = Page([_paper("a"), _paper("b")], 3, 40, "abc")
+    assert format_more(page) == 'Showing results 4-5 of 40. For more, call search_arxiv_papers with cursor="abc".'
+    assert format_more_info(page.papers, page_info(page)) == format_more(page)
+    assert format_more(page._replace(next_cursor=None)) == ""
+    assert format_more_info(page.papers, {}) == ""
@@ -0,0 +1,77 @@
+"""Tests voor het plannen van zoekopdrachten in arxiv_prefetch.py."""
+
+from types import SimpleNamespace
+
+import pytest
+
+import arxiv_client
+import arxiv_prefetch
+from arxiv_client import Paper, ResponseCache
+from arxiv_prefetch import (PRIORITY_AUTHOR, PRIORITY_CATEGORY, PRIORITY_FOLLOWUP, Prefetcher,
+                            prefetch_enabled, suggest_followup_queries)
+
+
+@pytest.fixture
+def prefetcher(monkeypatch):
+    """Een prefetcher zonder achtergrondthread en met een lege response cache."""
+    monkeypatch.setattr(arxiv_client, "response_cache", ResponseCache())
+    monkeypatch.setattr(Prefetcher, "_ensure_worker", lambda self: None)
+    return Prefetcher(max_results=3, max_pending=4)
+
+
+def _queued(prefetcher):
+    items = []
+    while not prefetcher._queue.empty():
+        priority, _, _, params = prefetcher._queue.get_nowait()
+        items.append((priority, params["search_query"]))
+    return items
+
+
+def _client(content):
+    message = SimpleNamespace(content=content)
+    response = SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    create = lambda **kwargs: response
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def test_schedule_skips_duplicates_and_cached_queries(prefetcher):
+    assert prefetcher.schedule("quantum computing")
+    assert not prefetcher.schedule("quantum computing")
+    params = arxiv_client.build_params("protein folding", 3)
+    arxiv_client.response_cache.put(arxiv_client.cache_key(params), b"feed")
+    assert not prefetcher.schedule("protein folding")
+    assert _queued(prefetcher) == [(PRIORITY_FOLLOWUP, "all:quantum computing")]
+
+
+def test_schedule_respects_max_pending(prefetcher):
+    assert all(prefetcher.schedule(f"query {i}") for i in range(4))
+    assert not prefetcher.schedule("one too many")
+
+
+def test_schedule_related_queues_categories_and_first_authors(prefetcher):
+    papers = [
+        Paper("1", 1, "A", "", ("Ada Lovelace", "Alan Turing"), ("cs.LG", "stat.ML")),
+        Paper("2", 1, "B", "", ("Grace Hopper",), ("cs.LG",)),
+        Paper("3", 1, "C", "", (), ()),
+    ]
+    prefetcher.schedule_related(papers)
+    assert sorted(_queued(prefetcher)) == [
+        (PRIORITY_CATEGORY, "cat:cs.LG"),
+        (PRIORITY_AUTHOR, 'au:"Ada Lovelace"'),
+        (PRIORITY_AUTHOR, 'au:"Grace Hopper"'),
+    ]
+
+
+def test_suggest_followup_queries():
+    client = _client('{"queries": ["graph transformers", "", 3, "GNN benchmarks", "more"]}')
+    assert suggest_followup_queries(client, "q", "a", limit=2) == ["graph transformers", "GNN benchmarks"]
+    assert suggest_followup_queries(_client("not json"), "q", "a") == []
+
+
+def test_prefetch_enabled(monkeypatch):
+    monkeypatch.setattr(arxiv_prefetch, "_prefetcher", None)
+    monkeypatch.delenv("ARXIV_PREFETCH", raising=False)
+    assert not prefetch_enabled()
+    monkeypatch.setenv("ARXIV_PREFETCH", "true")
+    assert prefetch_enabled()
+    assert arxiv_prefetch.get_prefetcher() is arxiv_prefetch.get_prefetcher()
@@ -0,0 +1,53 @@
+"""Tests voor het opnemen en afspelen van cassettes in arxiv_replay.py."""
+
+import gzip
+
+import pytest
+import requests
+
+from arxiv_replay import Cassette, entry_body, load_entries, request_key, requests_adapter
+
+URL = "http://export.arxiv.org/api/query?start=0&search_query=all:qubits"
+
+
+def test_request_key_ignores_parameter_order():
+    assert request_key("get", URL) == request_key(
+        "GET", "http://export.arxiv.org/api/query?search_query=all:qubits&start=0")
+    assert request_key("POST", URL, b"a") != request_key("POST", URL, b"b")
+
+
+def test_replay_returns_recordings_in_order_and_repeats(tmp_path):
+    recorder = Cassette(str(tmp_path), mode="record")
+    key = request_key("GET", URL)
+    recorder.record("arxiv", key, 200, {"Content-Type": "text/xml"}, b"first", 0.5)
+    recorder.record("arxiv", key, 200, {}, b"\xff\xfe binary", 0.1)
+
+    player = Cassette(str(tmp_path), speed=0)
+    bodies = [entry_body(player.lookup("arxiv", key)) for _ in range(3)]
+    assert bodies == [b"first", b"\xff\xfe binary", b"first"]
+    assert player.lookup("openai", key) is None
+
+
+def test_load_entries_keeps_lines_before_a_broken_file(tmp_path):
+    Cassette(str(tmp_path), mode="record").record("arxiv", "k", 200, {}, b"ok", 0)
+    with gzip.open(tmp_path / "broken.jsonl.gz", "wt") as f:
+        f.write("not json\n")
+    assert [entry["key"] for entry in load_entries(str(tmp_path))] == ["k"]
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        Cassette("unused", mode="rewind")
+
+
+def test_requests_adapter_replays_responses(tmp_path):
+    Cassette(str(tmp_path), mode="record").record(
+        "arxiv", request_key("GET", URL), 200, {"Content-Type": "text/xml"}, b"<feed/>", 0)
+    session = requests.Session()
+    session.mount("http://", requests_adapter(Cassette(str(tmp_path), speed=0)))
+    response = session.get(URL)
+    assert response.status_code == 200
+    assert response.content == b"<feed/>"
+    assert response.headers["Content-Type"] == "text/xml"
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session.get("http://export.arxiv.org/api/query?search_query=all:other")
@@ -0,0 +1,81 @@
+"""Tests voor de compressie van feeds en abstracts in feed_codec.py."""
+
+import pytest
+
+import feed_codec
+from feed_codec import (ZLIB_TAG, ZSTD_TAG, codec_name, decode, decode_text, encode, encode_text,
+                        is_encoded, open_payload, readable)
+
+ENTRY = (
+    "  <entry>\n"
+    "    <id>http://arxiv.org/abs/2401.{:05d}v1</id>\n"
+    "    <title>On graph neural networks, part {}</title>\n"
+    "    <summary>  We study the problem of learning representations and propose a method.</summary>\n"
+    "    <category term=\"cs.LG\" scheme=\"http://arxiv.org/schemas/atom\"/>\n"
+    "  </entry>\n"
+)
+FEED = ("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<feed xmlns=\"http://www.w3.org/2005/Atom\">\n"
+        + "".join(ENTRY.format(i, i) for i in range(200)) + "</feed>\n").encode("utf-8")
+
+
+@pytest.fixture(autouse=True)
+def default_codec(monkeypatch):
+    monkeypatch.delenv("ARXIV_CODEC", raising=False)
+
+
+def test_zlib_round_trip_is_smaller():
+    payload = encode(FEED, "zlib")
+    assert payload[0] == ZLIB_TAG and is_encoded(payload)
+    assert len(payload) < len(FEED) // 10
+    assert decode(payload) == FEED
+
+
+def test_zstd_round_trip():
+    pytest.importorskip("zstandard")
+    payload = encode(FEED, "zstd")
+    assert payload[0] == ZSTD_TAG
+    assert decode(payload) == FEED
+    assert open_payload(payload).read() == FEED
+
+
+def test_short_data_and_none_codec_stay_raw():
+    assert encode(b"<feed/>", "zlib") == b"<feed/>"
+    assert encode(FEED, "none") is FEED
+
+
+def test_legacy_raw_xml_reads_unchanged():
+    assert not is_encoded(FEED)
+    assert decode(FEED) == FEED
+    assert open_payload(FEED).read() == FEED
+    assert readable(FEED) and readable(b"")
+
+
+def test_open_payload_streams_in_chunks(monkeypatch):
+    monkeypatch.setattr(feed_codec, "CHUNK_SIZE", 7)
+    stream = open_payload(encode(FEED, "zlib"))
+    parts = iter(lambda: stream.read(100), b"")
+    assert b"".join(parts) == FEED
+
+
+def test_zstd_payload_without_zstandard(monkeypatch):
+    monkeypatch.setattr(feed_codec, "zstandard", None)
+    payload = bytes((ZSTD_TAG,)) + b"\x00" * 10
+    assert not readable(payload)
+    with pytest.raises(ValueError):
+        decode(payload)
+    assert codec_name() == "zlib"
+
+
+def test_encode_text_always_uses_zlib():
+    text = FEED.decode("utf-8")
+    encoded = encode_text(text)
+    assert isinstance(encoded, bytes) and encoded[0] == ZLIB_TAG
+    assert decode_text(encoded) == text
+    assert encode_text("short") == "short"
+    assert decode_text("plain text") == "plain text"
+
+
+def test_unknown_codec(monkeypatch):
+    monkeypatch.setenv("ARXIV_CODEC", "lz4")
+    with pytest.raises(ValueError):
+        codec_name()
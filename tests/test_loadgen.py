@@ -0,0 +1,92 @@
+"""Tests voor de vragen, percentielen en Socket.IO verbindingen van loadgen.py."""
+
+import asyncio
+
+import pytest
+
+import loadgen
+from loadgen import LoadError, QueryMix, load_queries, percentile
+
+
+def test_load_queries_weights_and_plain_lines(tmp_path):
+    path = tmp_path / "queries.txt"
+    path.write_text("# comment\n\n3\tdark matter\nplain query\n42\n2\t\nx\ty\n", encoding="utf-8")
+    queries, weights = load_queries(str(path))
+    # Een getal zonder vraag, of een gewicht zonder vraag, is zelf de vraag
+    assert queries == ["dark matter", "plain query", "42", "2", "x\ty"]
+    assert weights == [3.0, 1.0, 1.0, 1.0, 1.0]
+
+
+def test_load_queries_default_and_empty(tmp_path):
+    queries, weights = load_queries(None)
+    assert queries == loadgen.DEFAULT_QUERIES and weights == [1.0] * len(queries)
+    path = tmp_path / "empty.txt"
+    path.write_text("# nothing\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_queries(str(path))
+
+
+def test_percentile_nearest_rank():
+    values = sorted([5.0, 1.0, 3.0, 2.0, 4.0])
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 99) == 5.0
+    assert percentile([], 50) == 0.0
+
+
+def test_query_mix_is_reproducible():
+    draws = [[QueryMix(["a", "b", "c"], [1, 2, 3], seed=7).next() for _ in range(20)]
+             for _ in range(2)]
+    assert draws[0] == draws[1]
+
+
+class _FakeClient:
+    def __init__(self, session):
+        self.session = session
+
+    async def emit(self, event, data):
+        if self.session.reply is not None:
+            self.session.pending.set_result(self.session.reply)
+
+    async def disconnect(self):
+        self.session.disconnected = True
+
+
+class _FakeSession:
+    # Wat de volgende verbindingen doen: True = verbinden lukt
+    connects = []
+
+    def __init__(self, url):
+        self.url = url
+        self.pending = None
+        self.reply = {"result": "ok"}
+        self.disconnected = False
+        self.client = _FakeClient(self)
+
+    async def connect(self):
+        if not self.connects.pop(0):
+            raise ConnectionError("refused")
+
+
+def test_socketio_target_discards_timed_out_sessions(monkeypatch):
+    monkeypatch.setattr(loadgen, "_SocketIOSession", _FakeSession)
+    # Eén verbinding bij de start, daarna mislukt het opnieuw verbinden één keer
+    _FakeSession.connects = [True, False, True]
+
+    async def scenario():
+        target = loadgen.SocketIOTarget("http://test", timeout=0.01, connections=1)
+        await target.start()
+        (first,) = target._sessions
+        first.reply = None
+        with pytest.raises(LoadError) as timeout:
+            await target.search("slow")
+        assert timeout.value.kind == "timeout" and first.disconnected
+        # De kapotte verbinding is niet terug in de pool; opnieuw verbinden mislukt
+        with pytest.raises(LoadError) as refused:
+            await target.search("next")
+        assert refused.value.kind == "connection"
+        # De volgende vraag krijgt een nieuwe, werkende verbinding
+        await target.search("again")
+        assert len(target._sessions) == 1 and target._sessions[0] is not first
+        await target.close()
+
+    asyncio.run(scenario())
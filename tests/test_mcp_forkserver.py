@@ -0,0 +1,64 @@
+"""Tests voor de fork-server in mcp_forkserver.py."""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from mcp_forkserver import connect_forked_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork") or not hasattr(socket, "AF_UNIX"),
+                                reason="de fork-server vraagt fork() en Unix sockets")
+
+
+@pytest.fixture
+def forkserver(tmp_path):
+    """Een fork-server voor de simple server; retourneert het pad van de socket."""
+    socket_path = str(tmp_path / "mcp.sock")
+    process = subprocess.Popen(
+        [sys.executable, "mcp_forkserver.py", "--server", "simple", "--socket", socket_path],
+        cwd=ROOT, stderr=subprocess.DEVNULL,
+        env={**os.environ, "ARXIV_DB": str(tmp_path / "metadata.db")},
+    )
+    try:
+        deadline = time.monotonic() + 15
+        while not os.path.exists(socket_path):
+            if process.poll() is not None or time.monotonic() > deadline:
+                pytest.fail("fork-server did not start")
+            time.sleep(0.05)
+        yield socket_path
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def test_worker_answers_capabilities(forkserver):
+    worker = connect_forked_server(forkserver)
+    try:
+        worker.stdin.write(json.dumps({"type": "capabilities"}) + "\n")
+        worker.stdin.flush()
+        response = json.loads(worker.stdout.readline())
+    finally:
+        worker.terminate()
+    names = [tool["function"]["name"] for tool in response["capabilities"]["tools"]]
+    assert "search_arxiv_papers" in names
+    assert worker.poll() == 0
+
+
+def test_connections_are_served_side_by_side(forkserver):
+    workers = [connect_forked_server(forkserver) for _ in range(2)]
+    try:
+        for worker in workers:
+            worker.stdin.write(json.dumps({"type": "unknown"}) + "\n")
+            worker.stdin.flush()
+        for worker in workers:
+            assert json.loads(worker.stdout.readline())["type"] == "error"
+    finally:
+        for worker in workers:
+            worker.terminate()
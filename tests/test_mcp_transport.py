@@ -0,0 +1,93 @@
+"""Tests voor de frames en serializers van mcp_transport.py."""
+
+import asyncio
+import socket
+
+import pytest
+
+from mcp_transport import (FRAME_HEADER, MAX_FRAME_SIZE, FramedConnection, get_serializer,
+                           read_frame, write_frame)
+
+
+class _Writer:
+    def __init__(self):
+        self.chunks = []
+
+    def writelines(self, chunks):
+        self.chunks.extend(chunks)
+
+
+def _reader(data: bytes, eof: bool = True) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    if eof:
+        reader.feed_eof()
+    return reader
+
+
+def test_write_frame_prefixes_length():
+    writer = _Writer()
+    write_frame(writer, b"hello")
+    assert b"".join(writer.chunks) == b"\x00\x00\x00\x05hello"
+
+
+def test_read_frame_round_trip():
+    async def read_all():
+        writer = _Writer()
+        write_frame(writer, b"first")
+        write_frame(writer, b"")
+        write_frame(writer, b"second")
+        reader = _reader(b"".join(writer.chunks))
+        return [await read_frame(reader) for _ in range(4)]
+
+    assert asyncio.run(read_all()) == [b"first", b"", b"second", None]
+
+
+async def _read_one(data: bytes):
+    return await read_frame(_reader(data))
+
+
+def test_read_frame_returns_none_on_partial_header():
+    assert asyncio.run(_read_one(b"\x00\x00")) is None
+
+
+def test_read_frame_rejects_oversized_frames():
+    header = FRAME_HEADER.pack(MAX_FRAME_SIZE + 1)
+    with pytest.raises(ValueError, match="Frame too large"):
+        asyncio.run(_read_one(header))
+
+
+def test_get_serializer_json_round_trip():
+    serializer = get_serializer("json")
+    message = {"type": "tool_call", "tool_call": {"name": "x", "parameters": {"n": 1}}}
+    assert serializer.loads(serializer.dumps(message)) == message
+
+
+def test_get_serializer_unknown_name():
+    with pytest.raises(ValueError, match="Unknown serializer"):
+        get_serializer("pickle")
+
+
+def test_framed_connection_request_over_socketpair():
+    async def exchange():
+        left, right = socket.socketpair()
+        client = FramedConnection(*await asyncio.open_unix_connection(sock=left),
+                                  get_serializer("json"))
+        server = FramedConnection(*await asyncio.open_unix_connection(sock=right),
+                                  get_serializer("json"))
+
+        async def answer():
+            message = await server.receive()
+            await server.send({"type": "reply", "echo": message})
+
+        task = asyncio.create_task(answer())
+        response = await client.request({"type": "ping"})
+        await task
+        client.close()
+        closed = await server.receive()
+        server.close()
+        return response, closed
+
+    response, closed = asyncio.run(exchange())
+    assert response == {"type": "reply", "echo": {"type": "ping"}}
+    assert closed is None
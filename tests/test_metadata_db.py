@@ -0,0 +1,100 @@
+"""Tests voor de gedeelde SQLite database in metadata_db.py."""
+
+import asyncio
+
+import pytest
+
+import metadata_db
+from arxiv_client import Paper
+from metadata_db import AnswerCache, AsyncMetadataDB, MetadataDB
+
+
+def _paper(arxiv_id: str, version: int = 1, categories=("cs.LG",),
+           published: str = "2024-01-15T00:00:00Z", summary: str = "An abstract.") -> Paper:
+    return Paper(arxiv_id, version, f"Title {arxiv_id}", summary, ("Ada Lovelace",),
+                 tuple(categories), published, f"http://arxiv.org/pdf/{arxiv_id}v{version}")
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = MetadataDB(str(tmp_path / "metadata.db"), pool_size=2)
+    yield db
+    db.close()
+
+
+def test_upsert_and_get(db):
+    assert db.upsert_papers([_paper("a"), _paper("b", summary="Ünïcode abstract")]) == 2
+    paper = db.get_paper("b")
+    assert paper.to_dict() == _paper("b", summary="Ünïcode abstract").to_dict()
+    assert db.get_paper("missing") is None
+    assert sorted(db.get_papers(["a", "b", "missing"])) == ["a", "b"]
+
+
+def test_older_versions_never_overwrite_newer(db):
+    db.upsert_papers([_paper("a", version=2, summary="New")])
+    assert db.upsert_papers([_paper("a", version=1, summary="Old")]) == 0
+    assert db.get_paper("a").summary == "New"
+    assert db.upsert_papers([_paper("a", version=3, categories=("cs.CL",))]) == 1
+    assert db.papers_by_category("cs.LG") == []
+    assert [paper.arxiv_id for paper in db.papers_by_category("cs.CL")] == ["a"]
+
+
+def test_lookups_by_category_and_date(db):
+    db.upsert_papers([
+        _paper("a", published="2023-06-01T00:00:00Z"),
+        _paper("b", published="2024-01-15T00:00:00Z", categories=("cs.LG", "stat.ML")),
+        _paper("c", published="2024-03-01T00:00:00Z", categories=("stat.ML",)),
+    ])
+    assert [paper.arxiv_id for paper in db.papers_by_category("cs.LG")] == ["b", "a"]
+    assert [paper.arxiv_id for paper in db.papers_by_category("stat.ML", "2024-02")] == ["c"]
+    assert [paper.arxiv_id for paper in db.papers_by_published("2024", "2024-01")] == ["b"]
+    assert [paper.arxiv_id for paper in db.papers_by_published(limit=2)] == ["c", "b"]
+
+
+def test_summaries(db):
+    db.put_summaries({("a", 1): "Short", ("a", 2): "Newer"})
+    assert db.get_summaries([("a", 1), ("a", 3)]) == {("a", 1): "Short"}
+
+
+def test_cache_expires(db):
+    db.cache_put("ns", "key", {"value": 1}, ttl=60)
+    db.cache_put("ns", "old", "gone", ttl=-1)
+    assert db.cache_get("ns", "key") == {"value": 1}
+    assert db.cache_get("ns", "old") is None
+    assert db.cache_get("other", "key") is None
+
+
+def test_answer_cache_normalises_questions(db):
+    cache = AnswerCache(db, ttl=60)
+    cache.put("What is  RLHF?", "An answer")
+    assert cache.get("what is rlhf?") == "An answer"
+    assert AnswerCache(db, ttl=0).get("what is rlhf?") is None
+
+
+def test_async_wrapper_runs_the_same_methods(db):
+    async_db = AsyncMetadataDB(db)
+
+    async def run():
+        await async_db.upsert_papers([_paper("a")])
+        return await async_db.get_paper("a")
+
+    assert asyncio.run(run()).arxiv_id == "a"
+
+
+def test_save_papers_can_be_turned_off(db, monkeypatch):
+    monkeypatch.setattr(metadata_db, "_db", db)
+    monkeypatch.setenv("ARXIV_SAVE_PAPERS", "0")
+    metadata_db.save_papers([_paper("a")])
+    assert db.get_paper("a") is None
+    monkeypatch.delenv("ARXIV_SAVE_PAPERS")
+    metadata_db.save_papers([_paper("a")])
+    assert db.get_paper("a") is not None
+
+
+def test_a_second_connection_sees_committed_writes(db):
+    other = MetadataDB(db.path)
+    try:
+        db.upsert_papers([_paper("a")])
+        assert other.get_paper("a") is not None
+    finally:
+        other.close()
@@ -0,0 +1,59 @@
+"""Tests voor de graaf van verwante papers in paper_graph.py."""
+
+import pytest
+
+from arxiv_client import Paper
+from paper_graph import RelatedGraph, RelatedIndex, normalize_arxiv_id, salient_terms
+from paper_store import PaperStore
+
+PAPERS = [
+    Paper("1", 1, "Quantum error correction codes", "Surface codes protect qubits.",
+          ("Ada Lovelace",), ("quant-ph",), "2024-01-01"),
+    Paper("2", 1, "Decoding surface codes", "Fast decoders for surface codes and qubits.",
+          ("Alan Turing",), ("quant-ph",), "2024-02-01"),
+    Paper("3", 1, "Protein folding", "Deep networks predict protein structure.",
+          ("Ada Lovelace",), ("q-bio.BM",), "2024-03-01"),
+    Paper("4", 1, "Galaxy rotation curves", "Dark matter halos around galaxies.",
+          ("Grace Hopper",), ("astro-ph.GA",), "2024-04-01"),
+]
+
+
+def _ids(neighbours):
+    return [paper.arxiv_id for paper, _ in neighbours]
+
+
+@pytest.mark.parametrize("value", [
+    "2301.01234", "2301.01234v2", "arXiv:2301.01234", "http://arxiv.org/abs/2301.01234v3",
+    "https://arxiv.org/pdf/2301.01234v1.pdf",
+])
+def test_normalize_arxiv_id(value):
+    assert normalize_arxiv_id(value) == "2301.01234"
+
+
+def test_salient_terms_skip_stopwords_and_short_words():
+    terms = salient_terms(PAPERS[0])
+    assert {"quantum", "error", "correction", "codes"} <= set(terms)
+    assert "of" not in terms
+
+
+def test_neighbours_share_content_or_authors():
+    graph = RelatedGraph.build(PAPERS, k=3)
+    assert len(graph) == 4
+    neighbours = graph.neighbours(PAPERS[0], 3)
+    # Een gedeelde auteur weegt zwaarder dan gedeelde termen; zonder overlap geen buur
+    assert _ids(neighbours) == ["3", "2"]
+    assert _ids(graph.neighbours(PAPERS[0], 1)) == ["3"]
+
+
+def test_unknown_papers_are_computed_on_lookup():
+    graph = RelatedGraph.build(PAPERS[:3], k=3)
+    late = Paper("5", 1, "Surface code decoders", "Decoders for qubits.", (), ("quant-ph",), "2024-05-01")
+    assert _ids(graph.neighbours(late, 1)) == ["2"]
+
+
+def test_related_index_over_store():
+    store = PaperStore(max_size=100)
+    store.add(PAPERS)
+    index = RelatedIndex(store, k=3)
+    assert index.related("unknown") is None
+    assert _ids(index.related("2", limit=1)) == ["1"]
@@ -0,0 +1,114 @@
+"""Tests voor de facet filters en postings in paper_store.py."""
+
+import pytest
+
+from arxiv_client import Paper
+from paper_store import Facets, PaperStore, facet_query, intersect, iter_bits, parse_facets
+
+
+def _paper(arxiv_id: str, categories=("cs.LG",), authors=("Ada Lovelace",),
+           published: str = "2024-01-15T00:00:00Z", title: str = "Neural networks",
+           version: int = 1) -> Paper:
+    return Paper(arxiv_id, version, title, "An abstract about learning.", tuple(authors),
+                 tuple(categories), published)
+
+
+def _ids(papers):
+    return sorted(paper.arxiv_id for paper in papers)
+
+
+def test_iter_bits_yields_set_bits_lowest_first():
+    assert list(iter_bits(0)) == []
+    assert list(iter_bits(0b101001)) == [0, 3, 5]
+    assert list(iter_bits(1 << 200)) == [200]
+
+
+def test_intersect_mixes_sets_and_bitmaps():
+    assert intersect([{1, 2, 3}, 0b1100]) == {2, 3}
+    assert intersect([0b1110, 0b0111]) == 0b0110
+    assert intersect([{1}, {2}, 0b111]) == set()
+
+
+def test_parse_facets_normalises_lists():
+    facets = parse_facets([" cs.LG ", ""], ["Ada  Lovelace"], "2024-01", None)
+    assert facets == Facets(("cs.LG",), ("Ada  Lovelace",), "2024-01", None)
+    assert facets.active
+    assert not parse_facets().active
+
+
+def test_parse_facets_accepts_a_single_string():
+    facets = parse_facets(categories="cs.LG", authors="Ada Lovelace")
+    assert facets.categories == ("cs.LG",)
+    assert facets.authors == ("Ada Lovelace",)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"categories": 5},
+    {"categories": ["cs.LG", 3]},
+    {"authors": {"name": "Ada"}},
+    {"categories": ["cs.LG OR all:x"]},
+    {"published_from": "2024-13"},
+    {"published_to": "2024"},
+])
+def test_parse_facets_rejects_invalid_filters(kwargs):
+    with pytest.raises(ValueError):
+        parse_facets(**kwargs)
+
+
+def test_match_intersects_facets():
+    store = PaperStore(max_size=100)
+    store.add([
+        _paper("a", categories=("cs.LG", "stat.ML")),
+        _paper("b", categories=("cs.CL",), authors=("Alan Turing",)),
+        _paper("c", published="2023-06-01T00:00:00Z"),
+    ])
+    assert store.count(parse_facets(categories=["cs.LG"])) == 2
+    assert store.count(parse_facets(authors=["alan  TURING"])) == 1
+    assert store.count(parse_facets(categories=["cs.LG"], published_from="2024-01")) == 1
+    assert store.count(parse_facets(categories=["math.AG"])) == 0
+    assert store.count(Facets((), (), None, None)) == 3
+
+
+def test_dense_postings_become_bitmaps():
+    store = PaperStore(max_size=100)
+    store.add([_paper(str(i)) for i in range(70)])
+    assert isinstance(store.categories._postings["cs.LG"], int)
+    assert store.count(parse_facets(categories=["cs.LG"])) == 70
+
+
+def test_eviction_and_new_versions_update_the_index():
+    store = PaperStore(max_size=2)
+    store.add([_paper("a"), _paper("b", categories=("cs.CL",))])
+    store.add([_paper("a", categories=("cs.CL",), version=2)])
+    assert store.count(parse_facets(categories=["cs.LG"])) == 0
+    # a is net gezien, dus b is de oudste en verdwijnt
+    store.add([_paper("c", categories=("math.AG",))])
+    assert len(store) == 2
+    assert store.count(parse_facets(categories=["cs.CL"])) == 1
+    assert store.count(parse_facets(categories=["math.AG"])) == 1
+
+
+def test_search_ranks_by_matching_terms():
+    store = PaperStore(max_size=100)
+    store.add([
+        _paper("a", title="Graph theory"),
+        _paper("b", title="Neural networks for graphs"),
+        _paper("c", title="Unrelated", published="2020-01-01T00:00:00Z"),
+    ])
+    facets = parse_facets(categories=["cs.LG"])
+    # "graph" staat in beide titels; bij gelijke score de nieuwste eerst
+    assert _ids(store.search("neural", facets)) == ["b"]
+    assert [paper.arxiv_id for paper in store.search("neural graph", facets)] == ["b", "a"]
+    assert _ids(store.search("", facets, limit=10)) == ["a", "b", "c"]
+
+
+def test_facet_query_adds_arxiv_filters():
+    facets = parse_facets(["cs.LG", "stat.ML"], ["Ada Lovelace"], "2024-01", "2024-03")
+    assert facet_query("transformers", facets) == (
+        '(all:transformers) AND (cat:cs.LG OR cat:stat.ML) AND (au:"Ada Lovelace") '
+        "AND submittedDate:[202401010000 TO 202403312359]")
+
+
+def test_facet_query_strips_quotes_from_authors():
+    facets = parse_facets(authors=['Ada "Countess" Lovelace', '"'])
+    assert facet_query("x", facets) == '(all:x) AND (au:"Ada Countess Lovelace")'
@@ -0,0 +1,76 @@
+"""Tests voor de samenvattingen in paper_summaries.py."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from arxiv_client import Paper
+from metadata_db import MetadataDB
+from paper_summaries import Summarizer, SummaryStore, summarize_batch
+
+PAPERS = [Paper("2401.00001", 1, "Surface codes", "A long abstract."),
+          Paper("2401.00002", 2, "Protein folding", "Another long abstract.")]
+
+
+class FakeClient:
+    """Een nep OpenAI client die steeds `content` antwoordt en de vragen bijhoudt."""
+
+    def __init__(self, content):
+        self.content = content
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))])
+
+
+def test_summarize_batch_keeps_only_requested_ids():
+    client = FakeClient(json.dumps({"summaries": {
+        "2401.00001v1": " Codes protect qubits. ", "2401.00002v2": "", "9999.99999v1": "Invented"}}))
+    assert summarize_batch(client, PAPERS) == {("2401.00001", 1): "Codes protect qubits."}
+    items = json.loads(client.requests[0]["messages"][1]["content"])
+    assert [item["id"] for item in items] == ["2401.00001v1", "2401.00002v2"]
+
+
+@pytest.mark.parametrize("content", ["not json", '{"summaries": ["a"]}', None])
+def test_summarize_batch_ignores_malformed_replies(content):
+    assert summarize_batch(FakeClient(content), PAPERS) == {}
+
+
+def test_store_reports_missing_papers():
+    store = SummaryStore()
+    store.put({("2401.00001", 1): "Short"})
+    assert store.get(("2401.00001", 1)) == "Short"
+    # Een nieuwe versie heeft een eigen samenvatting nodig
+    missing = store.missing(PAPERS + [Paper("2401.00001", 2, "Surface codes", "")])
+    assert [paper.key for paper in missing] == [("2401.00002", 2), ("2401.00001", 2)]
+
+
+def test_attach_sets_known_summaries_and_schedules_the_rest(monkeypatch):
+    monkeypatch.setattr(Summarizer, "_ensure_worker", lambda self: None)
+    store = SummaryStore()
+    store.put({("2401.00001", 1): "Short"})
+    summarizer = Summarizer(store, max_pending=10, openai_client=FakeClient("{}"))
+    papers = [Paper("2401.00001", 1, "Surface codes", "A long abstract."),
+              Paper("2401.00002", 2, "Protein folding", "Another long abstract.")]
+    assert summarizer.attach(papers) == 1
+    assert papers[0].tldr == "Short"
+    assert not papers[1].tldr
+    assert summarizer._queue.get_nowait().key == ("2401.00002", 2)
+    # Al ingepland: niet nog eens
+    assert not summarizer.schedule(papers[1])
+
+
+def test_store_reads_other_processes_summaries_from_the_database(tmp_path):
+    db = MetadataDB(str(tmp_path / "metadata.db"))
+    try:
+        SummaryStore(db).put({("2401.00001", 1): "Short", ("2401.00002", 2): "Folding"})
+        store = SummaryStore(db, maxsize=1)
+        assert store.missing(PAPERS) == []
+        # Alleen de laatst gebruikte blijft in het geheugen; de rest staat in de database
+        assert len(store) == 1
+        assert store.missing(PAPERS) == []
+    finally:
+        db.close()
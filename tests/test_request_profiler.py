@@ -0,0 +1,56 @@
+"""Tests voor de toegang tot en het opslaan van profielen in request_profiler.py."""
+
+import pytest
+
+import request_profiler
+from request_profiler import (list_profiles, profiled, profiled_call, profiling_authorized,
+                              valid_profile_id)
+
+
+def test_profiling_needs_the_configured_token(monkeypatch):
+    monkeypatch.delenv("ARXIV_PROFILE_TOKEN", raising=False)
+    assert not profiling_authorized("anything")
+    monkeypatch.setenv("ARXIV_PROFILE_TOKEN", "secret")
+    assert profiling_authorized("secret")
+    assert not profiling_authorized("wrong")
+    assert not profiling_authorized(None)
+    assert not profiling_authorized("")
+
+
+def test_valid_profile_id():
+    assert valid_profile_id("20240101-120000-abcdef12")
+    assert not valid_profile_id("../etc/passwd")
+    assert not valid_profile_id("")
+
+
+def test_profiled_saves_one_file_per_component(tmp_path, monkeypatch):
+    monkeypatch.setenv("ARXIV_PROFILE_DIR", str(tmp_path))
+    with profiled("req1", "agent"):
+        sum(range(100))
+    assert profiled_call("req1", "server", sum, range(10)) == 45
+    assert profiled_call("req1", "server", sum, range(10)) == 45
+    assert list_profiles("req1") == ["agent", "server", "server-2"]
+
+
+def test_failed_save_does_not_hide_the_original_error(tmp_path, monkeypatch):
+    # Een bestand waar de profielmap moet komen: opslaan geeft een OSError
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+    monkeypatch.setenv("ARXIV_PROFILE_DIR", str(blocker / "profiles"))
+    with pytest.raises(KeyError):
+        with profiled("req2", "agent"):
+            raise KeyError("original")
+    with pytest.raises(ZeroDivisionError):
+        profiled_call("req2", "server", lambda: 1 / 0)
+    # Zonder fout in het blok gaat het resultaat gewoon terug
+    assert profiled_call("req2", "server", sum, [1, 2]) == 3
+
+
+def test_without_profile_id_nothing_is_profiled(tmp_path, monkeypatch):
+    monkeypatch.setenv("ARXIV_PROFILE_DIR", str(tmp_path))
+    monkeypatch.delenv("ARXIV_PROFILE", raising=False)
+    with profiled(None, "agent"):
+        pass
+    assert profiled_call(None, "server", sum, [1]) == 1
+    assert list(tmp_path.iterdir()) == []
+    assert request_profiler.server_profile_id(None) is None
@@ -0,0 +1,72 @@
+"""Tests voor het verdelen van verbindingen in serve_web.py."""
+
+import json
+import selectors
+import socket
+import threading
+import time
+
+import pytest
+
+from serve_web import InFlight, Launcher, sticky_worker
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "send_fds"), reason="vraagt SCM_RIGHTS")
+
+
+@pytest.mark.parametrize("head, expected", [
+    (b"GET /socket.io/?EIO=4&transport=polling&sid=3.AbC HTTP/1.1\r\n", 3),
+    (b"POST /socket.io/?sid=12.x&EIO=4 HTTP/1.1\r\nHost: a\r\n", 12),
+    (b"GET /socket.io/?EIO=4&transport=polling HTTP/1.1\r\n", None),
+    (b"GET /?q=x HTTP/1.1\r\nCookie: sid=3.abc\r\n", None),
+])
+def test_sticky_worker(head, expected):
+    assert sticky_worker(head) == expected
+
+
+def test_in_flight_waits_until_idle():
+    in_flight = InFlight()
+    in_flight.__enter__()
+    assert not in_flight.wait_idle(0.01)
+    threading.Timer(0.05, in_flight.__exit__).start()
+    assert in_flight.wait_idle(5)
+    assert in_flight.count == 0
+
+
+@pytest.fixture
+def launcher():
+    """Een launcher met twee nep workers; retourneert (launcher, kanalen per worker)."""
+    launcher = Launcher("simple", "127.0.0.1", 0, 2, 1.0)
+    channels = {}
+    for index in range(2):
+        parent_end, worker_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        launcher.workers[index] = (0, parent_end, time.monotonic())
+        channels[index] = worker_end
+    yield launcher, channels
+    for _, parent_end, _ in launcher.workers.values():
+        parent_end.close()
+    for worker_end in channels.values():
+        worker_end.close()
+
+
+def _connect(launcher):
+    client, conn = socket.socketpair()
+    conn.setblocking(False)
+    launcher.pending[conn] = (("127.0.0.1", 5000), time.monotonic())
+    launcher.selector.register(conn, selectors.EVENT_READ)
+    return client, conn
+
+
+def test_route_waits_for_the_full_request_line(launcher):
+    launcher, channels = launcher
+    client, conn = _connect(launcher)
+    with client:
+        client.sendall(b"GET /socket.io/?EIO=4&sid=1")
+        launcher._route(conn)
+        assert conn in launcher.partial
+        client.sendall(b".abc HTTP/1.1\r\n\r\n")
+        launcher._route(conn)
+        assert not launcher.pending and not launcher.partial
+        message, fds, _, _ = socket.recv_fds(channels[1], 1024, 1)
+        assert json.loads(message) == ["127.0.0.1", 5000]
+        with socket.socket(fileno=fds[0]) as handed_over:
+            assert handed_over.recv(1024).startswith(b"GET /socket.io/?EIO=4&sid=1.abc")
@@ -0,0 +1,74 @@
+"""Tests voor de gedeelde routes van de web apps in web_common.py."""
+
+import json
+
+import pytest
+from flask import Flask
+
+import web_common
+from arxiv_client import Paper
+from paper_store import PaperStore
+
+PAPER = Paper("2401.00001", 1, "Surface codes", "A long abstract.", ("Ada Lovelace",), ("quant-ph",))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Een app met de blueprint en een agent die één paper vindt; retourneert (client, aanroepen)."""
+    monkeypatch.setattr(web_common, "recent_papers", PaperStore(max_size=10))
+    calls = []
+
+    def run_query(query, profile_id, on_papers=None):
+        calls.append((query, profile_id))
+        if query == "fail":
+            raise RuntimeError("Arxiv unreachable")
+        _, collect = web_common.paper_collector(on_papers)
+        collect([PAPER])
+        return "An answer"
+
+    app = Flask(__name__)
+    app.register_blueprint(web_common.papers_blueprint(run_query))
+    return app.test_client(), calls
+
+
+def _events(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_stream_sends_papers_then_the_answer(client):
+    client, calls = client
+    events = _events(client.post("/api/search/stream", json={"query": "surface codes"}))
+    assert [event["type"] for event in events] == ["papers", "answer"]
+    assert "summary" not in events[0]["papers"][0]
+    assert events[1]["result"] == "An answer"
+    assert calls == [("surface codes", None)]
+    # De abstract komt daarna uit de recente papers
+    paper = client.get("/api/papers/2401.00001").get_json()["paper"]
+    assert paper["summary"] == "A long abstract."
+
+
+def test_stream_reports_errors(client):
+    client, _ = client
+    assert _events(client.post("/api/search/stream", json={"query": "fail"})) == [
+        {"type": "error", "error": "Arxiv unreachable"}]
+    assert client.post("/api/search/stream", json={}).status_code == 400
+
+
+def test_profiling_needs_the_token(client, monkeypatch):
+    client, calls = client
+    monkeypatch.setenv("ARXIV_PROFILE_TOKEN", "secret")
+    client.post("/api/search/stream?profile=1", json={"query": "a"})
+    client.post("/api/search/stream?profile=1", json={"query": "b"}, headers={"X-Profile-Token": "secret"})
+    assert calls[0][1] is None
+    assert calls[1][1] is not None
+
+
+def test_unknown_paper(client, monkeypatch):
+    client, _ = client
+
+    class EmptyDB:
+        def get_paper(self, arxiv_id):
+            return None
+
+    monkeypatch.setattr(web_common, "get_metadata_db", lambda: EmptyDB())
+    assert client.get("/api/papers/9999.99999").status_code == 404
@@ -0,0 +1,128 @@
+"""
+Gedeelde onderdelen van de twee web apps (`mcp_web_app_simple.py` en
+`mcp_web_app_sdk.py`).
+
+De apps verschillen alleen in de agent. Het streamen van een zoekvraag
+(`/api/search/stream`), het ophalen van één paper met abstract
+(`/api/papers/<id>`) en de papers voor de frontend staan hier, in een
+blueprint die elke app registreert met zijn eigen `run_query`.
+"""
+
+import json
+import queue
+import threading
+import traceback
+from typing import Callable, Dict, List, Optional
+
+from flask import Blueprint, Response, jsonify, request
+
+from arxiv_client import Paper
+from metadata_db import get_metadata_db
+from paper_store import PaperStore
+from request_profiler import new_profile_id, profile_flag, profiling_authorized
+
+# Papers uit recente zoekvragen, voor het ophalen van abstracts door de frontend
+recent_papers = PaperStore(max_size=5000)
+
+
+def paper_collector(on_papers: Optional[Callable[[List[Paper]], None]] = None):
+    """
+    Een `on_papers` callback voor de agent die de papers verzamelt en onthoudt,
+    en ze doorgeeft aan `on_papers`. Retourneert (lijst, callback).
+    """
+    found = []
+
+    def collect(papers):
+        found.extend(papers)
+        recent_papers.add(papers)
+        if on_papers is not None:
+            on_papers(papers)
+
+    return found, collect
+
+
+def paper_card(paper: Paper) -> Dict:
+    """Een paper voor de frontend, zonder abstract; die wordt pas bij het openklappen opgehaald."""
+    card = paper.to_dict()
+    del card['summary']
+    return card
+
+
+def profile_fields(profile_id: Optional[str]) -> Dict:
+    """Velden voor een antwoord over het profiel van een verzoek."""
+    if not profile_id:
+        return {}
+    return {'profile_id': profile_id, 'profile_url': f'/api/profiles/{profile_id}'}
+
+
+def profiling_allowed() -> bool:
+    """Of dit verzoek de token uit `ARXIV_PROFILE_TOKEN` meestuurt (header `X-Profile-Token`)."""
+    return profiling_authorized(request.headers.get('X-Profile-Token'))
+
+
+def request_profile_id() -> Optional[str]:
+    """
+    Een nieuw profile id als het verzoek `?profile=1` of `X-Profile: 1` heeft
+    en mag profileren; anders wordt het gewoon uitgevoerd.
+    """
+    wanted = profile_flag(request.args.get('profile')) or profile_flag(request.headers.get('X-Profile'))
+    return new_profile_id() if wanted and profiling_allowed() else None
+
+
+def papers_blueprint(run_query: Callable[..., str]) -> Blueprint:
+    """
+    De routes voor streamen en papers, met `run_query(query, profile_id, on_papers=...)`
+    van de app.
+    """
+    blueprint = Blueprint('papers', __name__)
+
+    @blueprint.route('/api/search/stream', methods=['POST'])
+    def search_stream():
+        """
+        Als /api/search, maar het antwoord is een stroom JSON regels (NDJSON):
+        `{"type": "papers", "papers": [...]}` zodra de agent papers heeft,
+        daarna `{"type": "answer", "result": ...}` of `{"type": "error", "error": ...}`.
+        """
+        data = request.json or {}
+        query = data.get('query', '')
+        if not query:
+            return jsonify({'success': False, 'error': 'Missing query parameter'}), 400
+        profile_id = request_profile_id()
+
+        events = queue.Queue()
+
+        def run_search():
+            try:
+                response = run_query(query, profile_id, on_papers=lambda papers: events.put(
+                    {'type': 'papers', 'papers': [paper_card(paper) for paper in papers]}))
+                events.put({'type': 'answer', 'result': response, **profile_fields(profile_id)})
+            except Exception as e:
+                print(f"Error processing query: {e}")
+                traceback.print_exc()
+                events.put({'type': 'error', 'error': str(e), **profile_fields(profile_id)})
+            finally:
+                events.put(None)
+
+        threading.Thread(target=run_search, daemon=True).start()
+
+        def generate():
+            while True:
+                event = events.get()
+                if event is None:
+                    return
+                yield json.dumps(event) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'})
+
+    @blueprint.route('/api/papers/<path:arxiv_id>')
+    def get_paper_details(arxiv_id):
+        """Eén paper met abstract, uit een recente zoekvraag of de metadata database."""
+        paper = recent_papers.get(arxiv_id) or get_metadata_db().get_paper(arxiv_id)
+        if paper is None:
+            return jsonify({'success': False, 'error': 'Paper not found'}), 404
+        response = jsonify({'success': True, 'paper': paper.to_dict()})
+        response.headers['Cache-Control'] = 'private, max-age=3600'
+        return response
+
+    return blueprint